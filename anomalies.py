@@ -0,0 +1,270 @@
+"""Vectorized anomaly detection over smart meter readings.
+
+detect_anomalies scores an in-memory frame: readings are sorted once by meter and time, then
+scored in batches of whole meters so every per-meter statistic is complete. It holds a float64
+copy of each metric column and the sort order for the whole frame. For tables that do not fit
+in memory, detect_anomalies_in_batches scores a stream of frames ordered by meter (such as a
+warehouse cursor), carrying each meter's rows across batch boundaries, so memory stays bounded
+by one batch plus the longest meter's history. Each detector is a handful of whole-array NumPy
+operations over a batch:
+
+- consumption_spike: z-score of energy consumption against the meter's trailing window
+- seasonal_residual: robust (MAD) z-score of consumption minus the meter's hour-of-day median
+- voltage_sag / low_power_factor: robust z-score below the meter's own median
+- outage: any reported outage event
+
+Run ``python anomalies.py`` for a throughput benchmark on synthetic readings.
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+ANOMALY_COLUMNS = ["meter_id", "timestamp", "detector", "metric", "value", "expected", "score"]
+# Trailing readings per meter for the rolling z-score, and the fewest it needs to score
+ROLLING_WINDOW = 48
+ROLLING_MIN_PERIODS = 12
+ROLLING_Z_THRESHOLD = 4.0
+# Iglewicz-Hoaglin cut-off for the modified (median/MAD) z-score
+ROBUST_Z_THRESHOLD = 3.5
+BATCH_ROWS = 1_000_000
+
+
+def group_median(codes, values, n_groups):
+    """Median of values per integer group code, ignoring NaN (NaN for empty groups)"""
+    # pandas' grouped median partitions each group in C, well ahead of a full lexsort
+    medians = pd.Series(values).groupby(codes).median()
+    return medians.reindex(np.arange(n_groups)).to_numpy(dtype=np.float64)
+
+
+def robust_z(codes, values, n_groups):
+    """Modified z-score of each value against its group's median and MAD, plus the medians"""
+    medians = group_median(codes, values, n_groups)
+    deviations = values - medians[codes]
+    mad = group_median(codes, np.abs(deviations), n_groups)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        scores = 0.6745 * deviations / mad[codes]
+    # A meter whose readings barely vary (MAD 0) has no robust scale; leave it unscored
+    scores[~np.isfinite(scores)] = np.nan
+    return scores, medians[codes]
+
+
+def rolling_z(codes, values, n_groups, window=ROLLING_WINDOW, min_periods=ROLLING_MIN_PERIODS):
+    """z-score of each value against the previous `window` readings of the same meter.
+
+    Values must be sorted by meter then time. Window sums come from prefix sums that exclude
+    the current reading, so each meter's first readings are scored only once min_periods exist.
+    """
+    present = ~np.isnan(values)
+    counts = np.bincount(codes[present], minlength=n_groups)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = np.bincount(codes[present], weights=values[present], minlength=n_groups) / counts
+    # Centre on the meter mean so the squared prefix sums keep their precision
+    centred = np.where(present, values - means[codes], 0.0)
+    prefix = np.concatenate(([0.0], np.cumsum(centred)))
+    prefix_sq = np.concatenate(([0.0], np.cumsum(centred * centred)))
+    prefix_n = np.concatenate(([0], np.cumsum(present)))
+    positions = np.arange(len(values))
+    meter_starts = np.concatenate(([0], np.cumsum(np.bincount(codes, minlength=n_groups))[:-1]))
+    window_starts = np.maximum(meter_starts[codes], positions - window)
+    n = prefix_n[positions] - prefix_n[window_starts]
+    total = prefix[positions] - prefix[window_starts]
+    total_sq = prefix_sq[positions] - prefix_sq[window_starts]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = total / n
+        std = np.sqrt(np.maximum(total_sq - total * mean, 0.0) / (n - 1))
+        scores = (centred - mean) / std
+    scores[(n < min_periods) | ~present | ~np.isfinite(scores)] = np.nan
+    return scores, mean + means[codes]
+
+
+def flagged(rows, detector, metric, values, expected, scores, threshold, side="both"):
+    """Rows of one detector whose score crosses the threshold, as a partial anomaly frame"""
+    if side == "low":
+        hits = scores <= -threshold
+    elif side == "high":
+        hits = scores >= threshold
+    else:
+        hits = np.abs(scores) >= threshold
+    hits &= ~np.isnan(scores)
+    return {"row": rows[hits], "detector": detector, "metric": metric,
+            "value": values[hits], "expected": expected[hits], "score": scores[hits]}
+
+
+def score_batch(batch, rows, codes, n_groups, hours):
+    """Run every detector whose columns are present over one batch of whole meters"""
+    results = []
+    if "energy_consumption_kwh" in batch:
+        consumption = batch["energy_consumption_kwh"]
+        scores, expected = rolling_z(codes, consumption, n_groups)
+        results.append(flagged(rows, "consumption_spike", "energy_consumption_kwh", consumption, expected,
+                               scores, ROLLING_Z_THRESHOLD, "high"))
+        profile = group_median(codes * 24 + hours, consumption, n_groups * 24)[codes * 24 + hours]
+        scores, _ = robust_z(codes, consumption - profile, n_groups)
+        results.append(flagged(rows, "seasonal_residual", "energy_consumption_kwh", consumption, profile,
+                               scores, ROBUST_Z_THRESHOLD))
+    for detector, metric in [("voltage_sag", "voltage_level"), ("low_power_factor", "power_factor")]:
+        if metric in batch:
+            scores, expected = robust_z(codes, batch[metric], n_groups)
+            results.append(flagged(rows, detector, metric, batch[metric], expected, scores, ROBUST_Z_THRESHOLD, "low"))
+    if "outage_events" in batch:
+        outages = batch["outage_events"]
+        results.append(flagged(rows, "outage", "outage_events", outages, np.zeros_like(outages),
+                               np.where(outages > 0, outages, np.nan), 1, "high"))
+    return results
+
+
+def meter_batches(codes, batch_rows):
+    """[start, stop) row ranges of sorted codes, each holding whole meters.
+
+    Meters are grouped by which batch_rows block they start in, so a batch holds at most
+    batch_rows rows plus the tail of its last meter.
+    """
+    meter_starts = np.concatenate(([0], np.flatnonzero(np.diff(codes)) + 1))
+    blocks = meter_starts // max(int(batch_rows), 1)
+    cuts = meter_starts[np.concatenate(([True], np.diff(blocks) > 0))]
+    return list(zip(cuts, np.append(cuts[1:], len(codes))))
+
+
+def detect_anomalies(frame, meter_column="meter_id", time_column="timestamp", batch_rows=BATCH_ROWS):
+    """Anomalies from every available detector, one row per flagged (reading, detector), worst first"""
+    metrics = [col for col in ["energy_consumption_kwh", "voltage_level", "power_factor", "outage_events"]
+               if col in frame.columns]
+    if frame.empty or not metrics or meter_column not in frame.columns or time_column not in frame.columns:
+        return pd.DataFrame(columns=ANOMALY_COLUMNS)
+    times = pd.to_datetime(frame[time_column]).to_numpy(dtype="datetime64[ns]")
+    meter_codes, meters = pd.factorize(frame[meter_column], sort=True)
+    keep = (meter_codes >= 0) & ~np.isnat(times)
+    # One int64 sort key (meter, time rank) sorts far faster than a two-key lexsort
+    time_codes, distinct_times = pd.factorize(times[keep], sort=True)
+    order = np.flatnonzero(keep)[np.argsort(meter_codes[keep].astype(np.int64) * len(distinct_times) + time_codes)]
+    codes = meter_codes[order]
+    columns = {col: pd.to_numeric(frame[col], errors="coerce").to_numpy(dtype=np.float64) for col in metrics}
+
+    parts = []
+    for start, stop in meter_batches(codes, batch_rows):
+        rows = order[start:stop]
+        first = codes[start]
+        batch_codes = codes[start:stop] - first
+        hours = (times[rows].astype("datetime64[h]").astype(np.int64) % 24).astype(np.int64)
+        batch = {col: values[rows] for col, values in columns.items()}
+        parts.extend(score_batch(batch, rows, batch_codes, int(batch_codes[-1]) + 1, hours))
+
+    parts = [part for part in parts if len(part["row"])]
+    if not parts:
+        return pd.DataFrame(columns=ANOMALY_COLUMNS)
+    rows = np.concatenate([part["row"] for part in parts])
+    anomalies = pd.DataFrame({
+        "meter_id": meters[meter_codes[rows]],
+        "timestamp": times[rows],
+        "detector": np.concatenate([np.repeat(part["detector"], len(part["row"])) for part in parts]),
+        "metric": np.concatenate([np.repeat(part["metric"], len(part["row"])) for part in parts]),
+        "value": np.concatenate([part["value"] for part in parts]),
+        "expected": np.concatenate([part["expected"] for part in parts]),
+        "score": np.concatenate([part["score"] for part in parts]),
+    })
+    for col in ["service_territory", "customer_type"]:
+        if col in frame.columns:
+            anomalies[col] = frame[col].to_numpy()[rows]
+    anomalies["detector"] = anomalies["detector"].astype("category")
+    order = np.argsort(-np.abs(anomalies["score"].to_numpy()), kind="stable")
+    return anomalies.iloc[order].reset_index(drop=True)
+
+
+def detect_anomalies_in_batches(batches, meter_column="meter_id", time_column="timestamp", batch_rows=BATCH_ROWS):
+    """Anomalies over an iterable of reading frames ordered by meter; returns (anomalies, readings scored).
+
+    The last meter of a batch may continue into the next batch, so its rows are carried forward
+    and scored together with the rest of that meter; every other meter is scored as soon as its
+    batch arrives and then dropped. Only the flagged rows are kept across batches.
+    """
+    parts, carried, readings = [], None, 0
+    for batch in batches:
+        if batch.empty:
+            continue
+        if carried is not None:
+            batch = pd.concat([carried, batch], ignore_index=True)
+        meters = batch[meter_column]
+        open_meter = (meters == meters.iloc[-1]).to_numpy()
+        carried = batch[open_meter]
+        complete = batch[~open_meter]
+        if len(complete):
+            parts.append(detect_anomalies(complete, meter_column, time_column, batch_rows))
+            readings += len(complete)
+    if carried is not None:
+        parts.append(detect_anomalies(carried, meter_column, time_column, batch_rows))
+        readings += len(carried)
+    parts = [part for part in parts if not part.empty]
+    if not parts:
+        return pd.DataFrame(columns=ANOMALY_COLUMNS), readings
+    anomalies = pd.concat(parts, ignore_index=True)
+    anomalies["detector"] = anomalies["detector"].astype("category")
+    order = np.argsort(-np.abs(anomalies["score"].to_numpy()), kind="stable")
+    return anomalies.iloc[order].reset_index(drop=True), readings
+
+
+def summarize_anomalies(anomalies, n_readings, top_meters=5):
+    """Per-detector counts, affected meters and worst score, for tables and prompts"""
+    if anomalies.empty:
+        return pd.DataFrame(columns=["detector", "anomalies", "meters", "pct_of_readings", "worst_score", "top_meters"])
+    grouped = anomalies.groupby("detector", observed=True)
+    summary = pd.DataFrame({
+        "anomalies": grouped.size(),
+        "meters": grouped["meter_id"].nunique(),
+        "worst_score": grouped["score"].apply(lambda scores: scores.abs().max()),
+        "top_meters": grouped["meter_id"].apply(lambda ids: ", ".join(map(str, ids.value_counts().head(top_meters).index))),
+    })
+    summary.insert(2, "pct_of_readings", summary["anomalies"] / max(n_readings, 1) * 100)
+    return summary.sort_values("anomalies", ascending=False).reset_index()
+
+
+def synthetic_readings(n_meters=1000, n_periods=24 * 28, anomaly_rate=0.001, seed=0):
+    """Hourly readings with daily seasonality and injected spikes, voltage sags, power factor dips and outages.
+
+    Returns (readings, injected) where injected marks the rows that were made anomalous.
+    """
+    rng = np.random.default_rng(seed)
+    hours = np.arange(n_periods)
+    base = rng.uniform(5, 50, (n_meters, 1))
+    daily = 1 + 0.4 * np.sin(2 * np.pi * (hours - rng.integers(0, 24, (n_meters, 1))) / 24)
+    consumption = base * daily + rng.normal(0, 1, (n_meters, n_periods))
+    voltage = rng.normal(240, 1.5, (n_meters, n_periods))
+    power_factor = np.clip(rng.normal(0.95, 0.01, (n_meters, n_periods)), 0, 1)
+    outages = np.zeros((n_meters, n_periods))
+    injected = rng.random((n_meters, n_periods)) < anomaly_rate
+    kind = rng.integers(0, 4, (n_meters, n_periods))
+    consumption[injected & (kind == 0)] *= 4
+    voltage[injected & (kind == 1)] -= 25
+    power_factor[injected & (kind == 2)] -= 0.2
+    outages[injected & (kind == 3)] = 1
+    return pd.DataFrame({
+        "meter_id": np.repeat([f"M{i:06d}" for i in range(n_meters)], n_periods),
+        "timestamp": np.tile(pd.date_range("2024-01-01", periods=n_periods, freq="h"), n_meters),
+        "energy_consumption_kwh": consumption.ravel(),
+        "voltage_level": voltage.ravel(),
+        "power_factor": power_factor.ravel(),
+        "outage_events": outages.ravel(),
+    }), injected.ravel()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark anomaly detection throughput on synthetic meter data")
+    parser.add_argument("--meters", type=int, default=2000)
+    parser.add_argument("--periods", type=int, default=24 * 28, help="hourly readings per meter")
+    parser.add_argument("--batch-rows", type=int, default=BATCH_ROWS)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    readings, injected = synthetic_readings(args.meters, args.periods, seed=args.seed)
+    readings = readings.sample(frac=1, random_state=args.seed)
+    injected = injected[readings.index.to_numpy()]
+    readings = readings.reset_index(drop=True)
+    started = time.perf_counter()
+    anomalies = detect_anomalies(readings, batch_rows=args.batch_rows)
+    seconds = time.perf_counter() - started
+    found = anomalies.merge(readings.reset_index()[["index", "meter_id", "timestamp"]], on=["meter_id", "timestamp"])
+    recall = np.isin(np.flatnonzero(injected), found["index"].to_numpy()).mean() if injected.any() else float("nan")
+    print(f"{len(readings):,} readings from {args.meters:,} meters scored in {seconds:.2f}s "
+          f"({len(readings) / seconds / 1e6:.2f}M readings/s); recall of injected anomalies {recall:.1%}")
+    print(summarize_anomalies(anomalies, len(readings)).to_string(index=False, float_format=lambda value: f"{value:,.2f}"))
@@ -1,13 +1,47 @@
 import os
+import atexit
 import streamlit as st
 import pandas as pd
+import numpy as np
 import altair as alt
 import time
 import json
 import re
+import sys
 import requests
+import random
+import threading
+import hashlib
+import tempfile
+import queue
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from io import StringIO
+from email.utils import parsedate_to_datetime
+from requests.adapters import HTTPAdapter
 from datetime import datetime
 from databricks import sql
+from databricks.sql import exc as sql_errors
+
+import forecasting
+import anomalies
+import profiling
+import explorer
+import peaks
+from explorer import quote_identifier
+
+# Copy-on-write lets every session share the cached dataset: slices and column selections are
+# views, and a copy is only made if a session modifies them (always on from pandas 3.0)
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Arrow fetch and Parquet snapshots are optional; both fall back gracefully
+    pa = None
+    pq = None
 
 st.set_page_config(
     page_title="demandpredict_–_ai_driven_demand_forecasting_and_management",
@@ -140,6 +174,59 @@ DATABRICKS_HOST = os.environ.get("DATABRICKS_HOST", "")
 DATABRICKS_HTTP_PATH = os.environ.get("DATABRICKS_SQL_HTTP_PATH", "")
 DATABRICKS_TOKEN = os.environ.get("DATABRICKS_TOKEN", "")
 
+# Connection pool settings (shared by every session in this app process)
+DATABRICKS_POOL_SIZE = int(os.environ.get("DATABRICKS_POOL_SIZE", "4"))
+DATABRICKS_POOL_TIMEOUT = float(os.environ.get("DATABRICKS_POOL_TIMEOUT", "30"))
+DATABRICKS_POOL_IDLE_SECONDS = float(os.environ.get("DATABRICKS_POOL_IDLE_SECONDS", "600"))
+DATABRICKS_POOL_MAX_LIFETIME = float(os.environ.get("DATABRICKS_POOL_MAX_LIFETIME", "3600"))
+DATABRICKS_POOL_HEALTH_CHECK_SECONDS = float(os.environ.get("DATABRICKS_POOL_HEALTH_CHECK_SECONDS", "60"))
+
+# Result fetch mode: "arrow" (columnar Arrow batches, needs pyarrow) or "rows" (fetchall tuples)
+QUERY_FETCH_MODE = os.environ.get("QUERY_FETCH_MODE", "arrow").strip().lower()
+
+# Streaming aggregation settings (AGGREGATION_MODE=streaming): rows per fetched batch and
+# the bounded per-column state kept while scanning the full table
+STREAM_BATCH_ROWS = int(os.environ.get("STREAM_BATCH_ROWS", "100000"))
+STREAM_SAMPLE_SIZE = int(os.environ.get("STREAM_SAMPLE_SIZE", "20000"))
+STREAM_TOPK_CAPACITY = int(os.environ.get("STREAM_TOPK_CAPACITY", "5000"))
+# Readings scored for anomalies: "table" streams the full table in STREAM_BATCH_ROWS batches ordered
+# by meter, "loaded" scores only the rows loaded into the dashboard
+ANOMALY_SCOPE = os.environ.get("ANOMALY_SCOPE", "table").strip().lower()
+
+# How long the Unity Catalog column types are cached before DESCRIBE TABLE runs again
+SCHEMA_CACHE_SECONDS = int(os.environ.get("SCHEMA_CACHE_SECONDS", "3600"))
+
+# Query result cache settings (process-wide tier shared by sessions, plus a small per-session tier)
+QUERY_CACHE_TTL_SECONDS = float(os.environ.get("QUERY_CACHE_TTL_SECONDS", "300"))
+QUERY_CACHE_MAX_ENTRIES = int(os.environ.get("QUERY_CACHE_MAX_ENTRIES", "64"))
+QUERY_CACHE_MAX_MB = float(os.environ.get("QUERY_CACHE_MAX_MB", "512"))
+SESSION_CACHE_MAX_ENTRIES = int(os.environ.get("SESSION_CACHE_MAX_ENTRIES", "16"))
+# Data Explorer pages kept per session (the next page is prefetched in the background)
+EXPLORER_PAGE_CACHE_PAGES = int(os.environ.get("EXPLORER_PAGE_CACHE_PAGES", "8"))
+WATERMARK_CHECK_SECONDS = float(os.environ.get("WATERMARK_CHECK_SECONDS", "30"))
+
+# How the dashboard dataset is loaded: "sample" (first 1000 rows, cached) or "incremental"
+# (full table once, then only rows with a newer `_fivetran_synced` merged in on each refresh)
+DATA_LOAD_MODE = os.environ.get("DATA_LOAD_MODE", "sample").strip().lower()
+
+# Local Parquet snapshot of the typed dataset, used for an instant first paint after a restart
+SNAPSHOT_ENABLED = os.environ.get("SNAPSHOT_ENABLED", "true").strip().lower() in ("1", "true", "yes")
+SNAPSHOT_DIR = os.environ.get("SNAPSHOT_DIR", os.path.join(tempfile.gettempdir(), "demandpredict_snapshots"))
+# First wait before retrying an unreachable warehouse; doubles per failure up to the maximum
+SNAPSHOT_RECONCILE_BACKOFF_SECONDS = float(os.environ.get("SNAPSHOT_RECONCILE_BACKOFF_SECONDS", "30"))
+SNAPSHOT_RECONCILE_MAX_BACKOFF_SECONDS = float(os.environ.get("SNAPSHOT_RECONCILE_MAX_BACKOFF_SECONDS", "600"))
+# How often a page still showing the snapshot checks whether the refresh has landed
+SNAPSHOT_POLL_SECONDS = float(os.environ.get("SNAPSHOT_POLL_SECONDS", "5"))
+
+# Optional Delta table (catalog.schema.table) where computed metrics snapshots are persisted and reused
+METRICS_SUMMARY_TABLE = os.environ.get("METRICS_SUMMARY_TABLE", "").strip()
+# Optional Delta table written by batch_forecast.py; its latest run is shown next to the built-in forecast
+FORECAST_TABLE = os.environ.get("FORECAST_TABLE", "").strip()
+
+# Where summary statistics are computed: "pushdown" (Databricks SQL over the full table),
+# "streaming" (full table scanned in bounded-memory batches) or "local" (pandas over the loaded sample)
+AGGREGATION_MODE = os.environ.get("AGGREGATION_MODE", "pushdown").strip().lower()
+
 # Unity Catalog settings
 UC_CATALOG = os.environ.get("UC_CATALOG")
 UC_SCHEMA  = os.environ.get("UC_SCHEMA")
@@ -175,6 +262,8 @@ if 'insights_history' not in st.session_state:
     st.session_state.insights_history = []
 if 'data_cache' not in st.session_state:
     st.session_state.data_cache = {}
+if 'explorer_pages' not in st.session_state:
+    st.session_state.explorer_pages = {}
 
 focus_areas = ["Overall Performance", "Optimization Opportunities", "Financial Impact", "Strategic Recommendations"]
 for area in focus_areas:
@@ -195,166 +284,1814 @@ ENDPOINT_URLS = {
 }
 ENDPOINT_URLS = {name: url for name, url in ENDPOINT_URLS.items() if name and url}
 
+# Serving endpoint HTTP client settings (one pooled keep-alive session per endpoint URL)
+SERVING_MAX_CONCURRENCY = int(os.environ.get("SERVING_MAX_CONCURRENCY", "4"))
+SERVING_MAX_RETRIES = int(os.environ.get("SERVING_MAX_RETRIES", "4"))
+SERVING_BACKOFF_BASE = float(os.environ.get("SERVING_BACKOFF_BASE", "1.0"))
+SERVING_BACKOFF_MAX = float(os.environ.get("SERVING_BACKOFF_MAX", "30"))
+SERVING_TIMEOUT = float(os.environ.get("SERVING_TIMEOUT", "120"))
+# Overall time budget for one request including every retry wait; a longer Retry-After ends the retries
+SERVING_RETRY_DEADLINE = float(os.environ.get("SERVING_RETRY_DEADLINE", "300"))
+# Stream report tokens as they are generated (server-sent events) instead of waiting for the full completion
+SERVING_STREAMING = os.environ.get("SERVING_STREAMING", "true").strip().lower() in ("1", "true", "yes")
+# Routing across endpoints: an "Auto" model choice sends each request to the least-loaded healthy endpoint
+# and hedges to a second one when the first is slower than its SERVING_HEDGE_PERCENTILE latency (0 disables hedging)
+SERVING_HEDGE_PERCENTILE = float(os.environ.get("SERVING_HEDGE_PERCENTILE", "95"))
+SERVING_HEDGE_MIN_SAMPLES = int(os.environ.get("SERVING_HEDGE_MIN_SAMPLES", "5"))
+SERVING_UNHEALTHY_ERROR_RATE = float(os.environ.get("SERVING_UNHEALTHY_ERROR_RATE", "0.5"))
+AUTO_ENDPOINT = "Auto (least-loaded endpoint)"
+# Generation settings sent with every report request (part of the response cache key)
+LLM_TEMPERATURE = 0.3
+LLM_MAX_TOKENS = 2400
+# Response cache keyed on the rendered prompt, endpoint and generation settings; set LLM_CACHE_DIR to persist it
+LLM_CACHE_ENABLED = os.environ.get("LLM_CACHE_ENABLED", "true").strip().lower() in ("1", "true", "yes")
+LLM_CACHE_TTL_SECONDS = float(os.environ.get("LLM_CACHE_TTL_SECONDS", "3600"))
+LLM_CACHE_MAX_ENTRIES = int(os.environ.get("LLM_CACHE_MAX_ENTRIES", "256"))
+LLM_CACHE_DIR = os.environ.get("LLM_CACHE_DIR", "").strip()
+if len(ENDPOINT_URLS) > 1:
+    MODELS = [AUTO_ENDPOINT] + MODELS
+
 # Parametrized system prompt to avoid hard-coding domain
 SYSTEM_PROMPT = os.environ.get(
     "SYSTEM_PROMPT",
 )
 
 # --- Databricks SQL helpers ---
+def open_connection():
+    """Create a new Databricks SQL connection; raises instead of reporting, so it is safe off the script thread"""
+    missing = [k for k, v in {
+        "DATABRICKS_HOST": DATABRICKS_HOST,
+        "DATABRICKS_SQL_HTTP_PATH/DATABRICKS_HTTP_PATH": DATABRICKS_HTTP_PATH,
+        "DATABRICKS_TOKEN": DATABRICKS_TOKEN
+    }.items() if not v]
+    if missing:
+        raise ValueError("Missing required Databricks configuration: " + ", ".join(missing))
+
+    return sql.connect(
+        server_hostname=DATABRICKS_HOST,
+        http_path=DATABRICKS_HTTP_PATH,
+        access_token=DATABRICKS_TOKEN
+    )
+
 def get_connection():
     """Create a new Databricks SQL connection (with friendly errors)."""
     try:
-        missing = [k for k, v in {
-            "DATABRICKS_HOST": DATABRICKS_HOST,
-            "DATABRICKS_SQL_HTTP_PATH/DATABRICKS_HTTP_PATH": DATABRICKS_HTTP_PATH,
-            "DATABRICKS_TOKEN": DATABRICKS_TOKEN
-        }.items() if not v]
-        if missing:
-            st.error("Missing required Databricks configuration: " + ", ".join(missing))
-            return None
-
-        return sql.connect(
-            server_hostname=DATABRICKS_HOST,
-            http_path=DATABRICKS_HTTP_PATH,
-            access_token=DATABRICKS_TOKEN
-        )
+        return open_connection()
+    except ValueError as e:
+        st.error(str(e))
+        return None
     except Exception as e:
         st.error(f"❌ Error connecting to Databricks: {str(e)}")
         return None
 
-def execute_query(query, params=None):
-    """Execute a SQL query on Databricks with proper error handling."""
-    try:
-        connection = get_connection()
-        if not connection:
-            return pd.DataFrame()
+# Exceptions that always mean the connection behind them is gone
+SESSION_EXPIRED_ERRORS = tuple(
+    getattr(sql_errors, name) for name in ("SessionAlreadyClosedError", "CursorAlreadyClosedError")
+    if hasattr(sql_errors, name)
+) + (ConnectionResetError, BrokenPipeError)
+# Databricks error classes (and the Thrift message) for a session the server no longer knows
+SESSION_EXPIRED_ERROR_CODES = ("INVALID_HANDLE.SESSION_NOT_FOUND", "INVALID_HANDLE.SESSION_CLOSED", "Invalid SessionHandle")
+# HTTP statuses on a connector request error that mean the token was rejected
+SESSION_EXPIRED_HTTP_CODES = {401, 403}
+
+def is_session_expired_error(error):
+    """Return True if the error means the connection must be replaced rather than reused"""
+    if isinstance(error, SESSION_EXPIRED_ERRORS) or isinstance(error.__cause__, SESSION_EXPIRED_ERRORS):
+        return True
+    if not isinstance(error, sql_errors.Error):
+        return False
+    context = getattr(error, "context", None)
+    if isinstance(context, dict) and context.get("http-code") in SESSION_EXPIRED_HTTP_CODES:
+        return True
+    return any(code in str(error) for code in SESSION_EXPIRED_ERROR_CODES)
+
+class ConnectionPool:
+    """Bounded, thread-safe pool of Databricks SQL connections shared across sessions"""
+
+    def __init__(self, factory, max_size=4, wait_timeout=30.0, idle_timeout=600.0,
+                 max_lifetime=3600.0, health_check_interval=60.0):
+        self._factory = factory
+        self._max_size = max(1, max_size)
+        self._wait_timeout = wait_timeout
+        self._idle_timeout = idle_timeout
+        self._max_lifetime = max_lifetime
+        self._health_check_interval = health_check_interval
+        self._idle = []  # [(connection, created_at, last_used)], most recently used last
+        self._created_at = {}  # id(connection) -> creation time for checked-out connections
+        self._size = 0
+        self._cond = threading.Condition()
+        self._stats = {
+            "hits": 0, "misses": 0, "waits": 0, "wait_time_total": 0.0, "wait_time_max": 0.0,
+            "timeouts": 0, "evictions": 0, "reconnects": 0, "health_check_failures": 0
+        }
 
+    def _close_quietly(self, connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def _evict_idle_locked(self, now):
+        """Drop idle connections past their idle timeout or maximum lifetime"""
+        keep = []
+        for connection, created_at, last_used in self._idle:
+            if now - last_used > self._idle_timeout or now - created_at > self._max_lifetime:
+                self._close_quietly(connection)
+                self._size -= 1
+                self._stats["evictions"] += 1
+            else:
+                keep.append((connection, created_at, last_used))
+        if len(keep) != len(self._idle):
+            self._idle = keep
+            self._cond.notify_all()
+
+    def _is_healthy(self, connection, last_used, now):
+        """Check a pooled connection; only pings the warehouse if it sat idle for a while"""
+        if getattr(connection, "open", True) is False:
+            return False
+        if now - last_used < self._health_check_interval:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+                cursor.fetchall()
+            return True
+        except Exception:
+            return False
+
+    def acquire(self, factory=None):
+        """Check out a connection, creating one if the pool has room, else waiting for one.
+
+        factory overrides the pool's connection factory for this checkout; its errors propagate.
+        """
+        start = time.monotonic()
+        waited = False
+        pooled = None
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                self._evict_idle_locked(now)
+                if self._idle:
+                    pooled = self._idle.pop()
+                    self._stats["hits"] += 1
+                    break
+                if self._size < self._max_size:
+                    self._size += 1
+                    self._stats["misses"] += 1
+                    break
+                remaining = self._wait_timeout - (now - start)
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    raise TimeoutError(
+                        f"Timed out after {self._wait_timeout:g}s waiting for a Databricks connection "
+                        f"(pool size {self._max_size})"
+                    )
+                waited = True
+                self._cond.wait(remaining)
+            if waited:
+                wait_time = time.monotonic() - start
+                self._stats["waits"] += 1
+                self._stats["wait_time_total"] += wait_time
+                self._stats["wait_time_max"] = max(self._stats["wait_time_max"], wait_time)
+
+        if pooled is not None:
+            connection, created_at, last_used = pooled
+            if self._is_healthy(connection, last_used, time.monotonic()):
+                with self._cond:
+                    self._created_at[id(connection)] = created_at
+                return connection
+            self._close_quietly(connection)
+            with self._cond:
+                self._stats["health_check_failures"] += 1
+                self._stats["reconnects"] += 1
+
+        connection = None
+        try:
+            connection = (factory or self._factory)()
+        finally:
+            if connection is None:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+        if connection is None:
+            return None
+        with self._cond:
+            self._created_at[id(connection)] = time.monotonic()
+        return connection
+
+    def release(self, connection, discard=False):
+        """Return a connection to the pool, or close it if it is broken or too old"""
+        if connection is None:
+            return
+        now = time.monotonic()
+        with self._cond:
+            created_at = self._created_at.pop(id(connection), now)
+            if discard or now - created_at > self._max_lifetime:
+                self._close_quietly(connection)
+                self._size -= 1
+                if discard:
+                    self._stats["reconnects"] += 1
+            else:
+                self._idle.append((connection, created_at, now))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self, factory=None):
+        """Context manager around acquire/release; expired sessions are discarded, not reused"""
+        connection = self.acquire(factory)
+        discard = False
+        try:
+            yield connection
+        except Exception as e:
+            discard = is_session_expired_error(e)
+            raise
+        finally:
+            # Also runs when a streaming consumer abandons its generator early
+            self.release(connection, discard=discard)
+
+    def close_all(self):
+        """Close every idle connection (checked-out connections are closed on release)"""
+        with self._cond:
+            for connection, _, _ in self._idle:
+                self._close_quietly(connection)
+                self._size -= 1
+            self._idle = []
+            self._cond.notify_all()
+
+    def stats(self):
+        """Snapshot of pool occupancy and hit/miss/wait counters for sizing the pool"""
+        with self._cond:
+            stats = dict(self._stats)
+            stats["max_size"] = self._max_size
+            stats["open_connections"] = self._size
+            stats["idle_connections"] = len(self._idle)
+            stats["in_use_connections"] = self._size - len(self._idle)
+        checkouts = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / checkouts if checkouts else 0.0
+        stats["avg_wait_ms"] = stats["wait_time_total"] / stats["waits"] * 1000 if stats["waits"] else 0.0
+        stats["max_wait_ms"] = stats["wait_time_max"] * 1000
+        return stats
+
+@st.cache_resource
+def get_connection_pool():
+    """Process-wide connection pool shared by all Streamlit sessions, closed when the server exits"""
+    pool = ConnectionPool(
+        get_connection,
+        max_size=DATABRICKS_POOL_SIZE,
+        wait_timeout=DATABRICKS_POOL_TIMEOUT,
+        idle_timeout=DATABRICKS_POOL_IDLE_SECONDS,
+        max_lifetime=DATABRICKS_POOL_MAX_LIFETIME,
+        health_check_interval=DATABRICKS_POOL_HEALTH_CHECK_SECONDS
+    )
+    atexit.register(pool.close_all)
+    return pool
+
+def arrow_fetch_enabled():
+    """Arrow fetch needs pyarrow installed and QUERY_FETCH_MODE=arrow"""
+    return QUERY_FETCH_MODE == "arrow" and pa is not None
+
+def arrow_table_to_frame(table):
+    """Convert an Arrow table to pandas, releasing Arrow buffers column by column as they convert"""
+    return table.to_pandas(split_blocks=True, self_destruct=True, date_as_object=False)
+
+def fetch_dataframe(cursor):
+    """Fetch a cursor's full result as a DataFrame with warehouse-typed columns where possible"""
+    if arrow_fetch_enabled() and hasattr(cursor, "fetchall_arrow"):
+        return arrow_table_to_frame(cursor.fetchall_arrow())
+    result = cursor.fetchall()
+    columns = [desc[0] for desc in cursor.description]
+    return pd.DataFrame(result, columns=columns)
+
+def iter_query_batches(query, params=None, batch_size=None):
+    """Yield a query's result as DataFrames of at most batch_size rows (Arrow batches when available)"""
+    batch_size = batch_size or STREAM_BATCH_ROWS
+    with get_connection_pool().connection() as connection:
+        if not connection:
+            return
         with connection.cursor() as cursor:
             if params:
                 cursor.execute(query, params)
             else:
                 cursor.execute(query)
-            result = cursor.fetchall()
+            use_arrow = arrow_fetch_enabled() and hasattr(cursor, "fetchmany_arrow")
             columns = [desc[0] for desc in cursor.description]
+            while True:
+                if use_arrow:
+                    table = cursor.fetchmany_arrow(batch_size)
+                    if table.num_rows == 0:
+                        break
+                    yield arrow_table_to_frame(table)
+                else:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    yield pd.DataFrame(rows, columns=columns)
 
-        connection.close()
-        return pd.DataFrame(result, columns=columns)
+def execute_statement(statement, params=None):
+    """Run a statement that returns no rows (DDL/DML) on a pooled connection"""
+    try:
+        with get_connection_pool().connection() as connection:
+            if not connection:
+                return False
+            with connection.cursor() as cursor:
+                if params:
+                    cursor.execute(statement, params)
+                else:
+                    cursor.execute(statement)
+        return True
     except Exception as e:
-        st.error(f"Query failed: {str(e)}")
-        return pd.DataFrame()
+        st.warning(f"Statement failed: {str(e)}")
+        return False
 
-# --- LLM endpoint caller ---
-def call_serving_endpoint(prompt, endpoint_name):
-    """Call Databricks LLM serving endpoint (requires SYSTEM_PROMPT set in .env)."""
+def execute_query(query, params=None):
+    """Execute a SQL query on Databricks using a pooled connection, retrying once on session expiry."""
+    pool = get_connection_pool()
+    for attempt in range(2):
+        try:
+            with pool.connection() as connection:
+                if not connection:
+                    return pd.DataFrame()
+
+                with connection.cursor() as cursor:
+                    if params:
+                        cursor.execute(query, params)
+                    else:
+                        cursor.execute(query)
+                    return fetch_dataframe(cursor)
+        except Exception as e:
+            if attempt == 0 and is_session_expired_error(e):
+                # The pool already discarded the dead connection; retry on a fresh one
+                continue
+            st.error(f"Query failed: {str(e)}")
+            return pd.DataFrame()
+    return pd.DataFrame()
+
+# --- Serving endpoint HTTP client ---
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+# Upper edges (seconds) of the per-endpoint latency histogram buckets
+LATENCY_BUCKETS = [0.5, 1, 2, 5, 10, 20, 30, 60, 120, float("inf")]
+
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP-date), or None"""
+    if not value:
+        return None
     try:
-        endpoint_url = ENDPOINT_URLS.get(endpoint_name)
-        if not endpoint_url:
-            st.error(f"URL for endpoint '{endpoint_name}' not found. Check env vars in app.yaml.")
-            return None
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max(0.0, (retry_at - datetime.now(tz=retry_at.tzinfo)).total_seconds())
+    except Exception:
+        return None
 
-        if not (isinstance(SYSTEM_PROMPT, str) and SYSTEM_PROMPT.strip()):
-            st.error("❌ SYSTEM_PROMPT is missing or empty in your .env")
+def sorted_percentile(values, percentile):
+    """Nearest-rank percentile of an already sorted list; None when empty"""
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(len(values) * percentile / 100))]
+
+class ServingEndpointClient:
+    """Keep-alive HTTP session for one serving endpoint with bounded concurrency, retries and metrics"""
+
+    def __init__(self, url, max_concurrency=4, max_retries=4, backoff_base=1.0, backoff_max=30.0, timeout=120.0,
+                 deadline=300.0):
+        self.url = url
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.deadline = deadline
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._recent_latencies = deque(maxlen=500)
+        self._recent_ttft = deque(maxlen=500)
+        self._recent_outcomes = deque(maxlen=50)
+        self._stats = {
+            "requests": 0, "successes": 0, "failures": 0, "retries": 0, "in_flight": 0,
+            "errors": {}, "latency_buckets": [0] * len(LATENCY_BUCKETS), "latency_total": 0.0
+        }
+
+    def _record(self, latency=None, error=None, success=None):
+        with self._lock:
+            if latency is not None:
+                self._stats["requests"] += 1
+                self._stats["latency_total"] += latency
+                self._recent_latencies.append(latency)
+                bucket = next(i for i, edge in enumerate(LATENCY_BUCKETS) if latency <= edge)
+                self._stats["latency_buckets"][bucket] += 1
+            if error is not None:
+                self._stats["errors"][error] = self._stats["errors"].get(error, 0) + 1
+            if success is True:
+                self._stats["successes"] += 1
+            elif success is False:
+                self._stats["failures"] += 1
+            if success is not None:
+                self._recent_outcomes.append(success)
+
+    def _retry_delay(self, attempt, deadline, retry_after=None):
+        """Wait before the next attempt, or None when no retry is left or it would pass the deadline.
+
+        backoff_max caps only the full-jitter exponential delay; the server's Retry-After is a
+        lower bound that only the request's overall deadline can cut short.
+        """
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        if attempt >= self.max_retries or time.monotonic() + delay > deadline:
             return None
+        return delay
 
-        headers = {
-            "Authorization": f"Bearer {DATABRICKS_TOKEN}",
-            "Content-Type": "application/json",
-        }
+    def _backoff(self, delay):
+        with self._lock:
+            self._stats["retries"] += 1
+        time.sleep(delay)
+
+    def record_first_token(self, seconds):
+        """Time from sending a streaming request to receiving its first content token"""
+        with self._lock:
+            self._recent_ttft.append(seconds)
 
-        payload = {
-            "messages": [
-                {"role": "system", "content": SYSTEM_PROMPT.strip()},
-                {"role": "user", "content": str(prompt)},
-            ],
-            "temperature": 0.3,
-            "max_tokens": 2400,
+    def _acquire_slot(self):
+        self._semaphore.acquire()
+        with self._lock:
+            self._stats["in_flight"] += 1
+
+    def _release_slot(self):
+        with self._lock:
+            self._stats["in_flight"] -= 1
+        self._semaphore.release()
+
+    def _post(self, payload, headers, stream=False, hold_slot=False):
+        """POST with retries; returns (final response, start of its attempt).
+
+        With hold_slot the final response keeps its concurrency slot and its latency is not
+        recorded yet; the caller must hand both back through _finish.
+        """
+        deadline = time.monotonic() + self.deadline
+        for attempt in range(self.max_retries + 1):
+            start = time.monotonic()
+            self._acquire_slot()
+            try:
+                response = self.session.post(
+                    self.url, headers=headers, json=payload, timeout=self.timeout, stream=stream
+                )
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self._release_slot()
+                self._record(latency=time.monotonic() - start, error=type(e).__name__)
+                delay = self._retry_delay(attempt, deadline)
+                if delay is not None:
+                    self._backoff(delay)
+                    continue
+                self._record(success=False)
+                raise
+            delay = None
+            if response.status_code in RETRYABLE_STATUS_CODES:
+                delay = self._retry_delay(attempt, deadline, parse_retry_after(response.headers.get("Retry-After")))
+            if delay is not None or not hold_slot:
+                self._finish(start)
+            if response.status_code in RETRYABLE_STATUS_CODES:
+                self._record(error=f"HTTP {response.status_code}")
+                if delay is not None:
+                    response.close()
+                    self._backoff(delay)
+                    continue
+            elif response.status_code >= 400:
+                self._record(error=f"HTTP {response.status_code}")
+            self._record(success=response.status_code == 200)
+            return response, start
+
+    def _finish(self, start):
+        """Release a request's concurrency slot and record its latency"""
+        self._release_slot()
+        self._record(latency=time.monotonic() - start)
+
+    def post(self, payload, headers):
+        """POST with retries on 429/5xx and connection errors; returns the final response"""
+        return self._post(payload, headers)[0]
+
+    @contextmanager
+    def stream(self, payload, headers):
+        """Streamed POST (same retries as post); the response is open inside the block.
+
+        The concurrency slot stays held and latency keeps counting until the block exits,
+        so in_flight, the latency histogram and routing load cover the whole generation.
+        """
+        response, start = self._post(payload, headers, stream=True, hold_slot=True)
+        try:
+            with response:
+                yield response
+        finally:
+            self._finish(start)
+
+    def stats(self):
+        """Snapshot of request counters, error counts and the latency histogram"""
+        with self._lock:
+            stats = {key: (dict(value) if isinstance(value, dict) else list(value) if isinstance(value, list) else value)
+                     for key, value in self._stats.items()}
+            recent = sorted(self._recent_latencies)
+            recent_ttft = sorted(self._recent_ttft)
+        stats["latency_histogram"] = {
+            (f"<= {edge:g}s" if edge != float("inf") else f"> {LATENCY_BUCKETS[-2]:g}s"): count
+            for edge, count in zip(LATENCY_BUCKETS, stats.pop("latency_buckets"))
+        }
+        stats["avg_latency_s"] = stats["latency_total"] / stats["requests"] if stats["requests"] else 0.0
+        stats["p50_latency_s"] = sorted_percentile(recent, 50) or 0.0
+        stats["p95_latency_s"] = sorted_percentile(recent, 95) or 0.0
+        stats["streamed_requests"] = len(recent_ttft)
+        stats["p50_ttft_s"] = sorted_percentile(recent_ttft, 50) or 0.0
+        stats["p95_ttft_s"] = sorted_percentile(recent_ttft, 95) or 0.0
+        stats.update(self.load())
+        return stats
+
+    def load(self):
+        """Routing view of the endpoint: in-flight requests, recent error rate and p50 latency"""
+        with self._lock:
+            outcomes = list(self._recent_outcomes)
+            in_flight = self._stats["in_flight"]
+            recent = sorted(self._recent_latencies)
+        error_rate = outcomes.count(False) / len(outcomes) if outcomes else 0.0
+        return {
+            "in_flight": in_flight,
+            "error_rate": error_rate,
+            "healthy": len(outcomes) < 3 or error_rate < SERVING_UNHEALTHY_ERROR_RATE,
+            # Expected wait if one more request is sent now; untried endpoints score 0 so they get explored
+            "load_score": (in_flight + 1) * (sorted_percentile(recent, 50) or 0.0)
         }
 
-        response = requests.post(endpoint_url, headers=headers, json=payload, timeout=120)
-        if response.status_code == 200:
-            result = response.json()
-            return result["choices"][0]["message"]["content"]
-        else:
-            st.error(f"Error from serving endpoint: {response.status_code} - {response.text}")
+    def latency_percentile(self, percentile, first_token=False):
+        """Recent total latency (or time to first token) at percentile; None until enough samples"""
+        with self._lock:
+            samples = sorted(self._recent_ttft if first_token else self._recent_latencies)
+        if len(samples) < SERVING_HEDGE_MIN_SAMPLES:
             return None
+        return sorted_percentile(samples, percentile)
+
+@st.cache_resource
+def get_endpoint_client_registry():
+    """Process-wide map of endpoint URL -> ServingEndpointClient"""
+    return {"clients": {}, "lock": threading.Lock()}
+
+def get_endpoint_client(endpoint_url, registry=None):
+    """Shared client for an endpoint URL, created on first use (pass registry off the script thread)"""
+    registry = registry or get_endpoint_client_registry()
+    with registry["lock"]:
+        client = registry["clients"].get(endpoint_url)
+        if client is None:
+            client = ServingEndpointClient(
+                endpoint_url,
+                max_concurrency=SERVING_MAX_CONCURRENCY,
+                max_retries=SERVING_MAX_RETRIES,
+                backoff_base=SERVING_BACKOFF_BASE,
+                backoff_max=SERVING_BACKOFF_MAX,
+                timeout=SERVING_TIMEOUT,
+                deadline=SERVING_RETRY_DEADLINE
+            )
+            registry["clients"][endpoint_url] = client
+        return client
 
+# --- LLM endpoint caller ---
+def message_text(content):
+    """Text of a chat message/delta content, which may be a string or a list of content parts"""
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return ""
+
+def iter_sse_deltas(response):
+    """Yield content deltas from an OpenAI-style server-sent-events chat completion stream"""
+    # SSE is UTF-8 by definition; requests leaves encoding unset for text/event-stream
+    response.encoding = response.encoding or "utf-8"
+    for line in response.iter_lines(decode_unicode=True):
+        if not line or not line.startswith("data:"):
+            continue
+        data = line[len("data:"):].strip()
+        if data == "[DONE]":
+            break
+        choices = json.loads(data).get("choices") or []
+        if choices:
+            delta = choices[0].get("delta") or choices[0].get("message") or {}
+            text = message_text(delta.get("content"))
+            if text:
+                yield text
+
+class ServingEndpointError(Exception):
+    """Serving endpoint call that could not produce a completion"""
+
+def serving_resources():
+    """Process-wide serving objects, resolved on the script thread and passed to worker threads"""
+    return {
+        "routing": get_routing_stats(),
+        "clients": get_endpoint_client_registry(),
+        "cache": get_completion_cache() if LLM_CACHE_ENABLED else None
+    }
+
+def request_completion(prompt, endpoint_name, on_token=None, serving=None):
+    """Chat completion text for prompt; raises ServingEndpointError and never touches the UI.
+
+    Worker threads must pass serving (from serving_resources() on the script thread) so they
+    never call st.cache_resource getters themselves. Responses are served from the completion
+    cache when the same prompt was already sent to the same endpoint. With on_token and
+    SERVING_STREAMING enabled the completion is streamed and on_token is called with the text
+    received so far after every chunk.
+    """
+    serving = serving or serving_resources()
+    cache = serving["cache"]
+    key = completion_cache_key(prompt, endpoint_name)
+    if cache is not None:
+        text = cache.get(key)
+        if text is not None:
+            if on_token:
+                on_token(text)
+            return text
+
+    if endpoint_name == AUTO_ENDPOINT:
+        text = route_completion(prompt, on_token, serving)
+    else:
+        text = endpoint_completion(prompt, endpoint_name, on_token, serving["clients"])
+    if cache is not None and text:
+        cache.put(key, text)
+    return text
+
+def endpoint_completion(prompt, endpoint_name, on_token=None, registry=None):
+    """One completion request to a named serving endpoint (no caching or routing)"""
+    endpoint_url = ENDPOINT_URLS.get(endpoint_name)
+    if not endpoint_url:
+        raise ServingEndpointError(f"URL for endpoint '{endpoint_name}' not found. Check env vars in app.yaml.")
+
+    if not (isinstance(SYSTEM_PROMPT, str) and SYSTEM_PROMPT.strip()):
+        raise ServingEndpointError("SYSTEM_PROMPT is missing or empty in your .env")
+
+    headers = {
+        "Authorization": f"Bearer {DATABRICKS_TOKEN}",
+        "Content-Type": "application/json",
+    }
+
+    payload = {
+        "messages": [
+            {"role": "system", "content": SYSTEM_PROMPT.strip()},
+            {"role": "user", "content": str(prompt)},
+        ],
+        "temperature": LLM_TEMPERATURE,
+        "max_tokens": LLM_MAX_TOKENS,
+    }
+
+    client = get_endpoint_client(endpoint_url, registry)
+    stream = bool(on_token) and SERVING_STREAMING
+    if stream:
+        payload["stream"] = True
+
+    if not stream:
+        response = client.post(payload, headers)
+        if response.status_code != 200:
+            raise ServingEndpointError(f"Error from serving endpoint: {response.status_code} - {response.text}")
+        return message_text(response.json()["choices"][0]["message"]["content"])
+
+    start = time.monotonic()
+    with client.stream(payload, headers) as response:
+        if response.status_code != 200:
+            raise ServingEndpointError(f"Error from serving endpoint: {response.status_code} - {response.text}")
+        if "text/event-stream" not in response.headers.get("Content-Type", ""):
+            # Endpoint answered with a regular (non-streamed) completion
+            return message_text(response.json()["choices"][0]["message"]["content"])
+        text = ""
+        for delta in iter_sse_deltas(response):
+            if not text:
+                client.record_first_token(time.monotonic() - start)
+            text += delta
+            on_token(text)
+        return text
+
+def rank_endpoints(registry=None):
+    """Configured endpoint names, healthy and least loaded first"""
+    candidates = []
+    for name, url in ENDPOINT_URLS.items():
+        load = get_endpoint_client(url, registry).load()
+        candidates.append((not load["healthy"], load["load_score"], random.random(), name))
+    return [name for *_, name in sorted(candidates)]
+
+class HedgeLost(Exception):
+    """Raised inside the losing attempt of a hedged request to stop its stream"""
+
+def route_completion(prompt, on_token=None, serving=None):
+    """Send prompt to the least-loaded healthy endpoint, failing over on error and hedging to the
+    next endpoint when the first has not produced output within its SERVING_HEDGE_PERCENTILE latency.
+
+    Whichever attempt produces output first wins; its tokens are relayed to on_token on the
+    calling thread and the other attempt is abandoned.
+    """
+    serving = serving or serving_resources()
+    registry = serving["clients"]
+    ranked = rank_endpoints(registry)
+    if not ranked:
+        raise ServingEndpointError("No serving endpoints configured.")
+    if len(ranked) == 1:
+        return endpoint_completion(prompt, ranked[0], on_token, registry)
+
+    streaming = bool(on_token) and SERVING_STREAMING
+    hedge_delay = None
+    if SERVING_HEDGE_PERCENTILE > 0:
+        hedge_delay = get_endpoint_client(ENDPOINT_URLS[ranked[0]], registry).latency_percentile(
+            SERVING_HEDGE_PERCENTILE, first_token=streaming
+        )
+
+    events = queue.Queue()
+    winner = []
+    winner_lock = threading.Lock()
+
+    def claim(name):
+        with winner_lock:
+            if not winner:
+                winner.append(name)
+            return winner[0] == name
+
+    def attempt(name):
+        def relay(text):
+            if not claim(name):
+                raise HedgeLost()
+            events.put(("token", name, text))
+        try:
+            events.put(("done", name, endpoint_completion(prompt, name, relay if on_token else None, registry)))
+        except Exception as e:
+            events.put(("error", name, e))
+
+    executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="endpoint-route")
+    launched, errors = [ranked[0]], {}
+    executor.submit(attempt, ranked[0])
+    deadline = time.monotonic() + hedge_delay if hedge_delay is not None else None
+    stats = serving["routing"]
+    try:
+        while True:
+            waiting = deadline is not None and len(launched) == 1 and not winner
+            try:
+                kind, name, value = events.get(timeout=max(0.0, deadline - time.monotonic()) if waiting else None)
+            except queue.Empty:
+                # Primary is slower than usual: hedge to the next-best endpoint
+                launched.append(ranked[1])
+                executor.submit(attempt, ranked[1])
+                stats.record("hedged")
+                continue
+            if kind == "token":
+                if winner and winner[0] == name:
+                    on_token(value)
+            elif kind == "done":
+                if claim(name):
+                    stats.record("wins", name)
+                    return value
+            elif winner and winner[0] == name:
+                raise value
+            elif not isinstance(value, HedgeLost):
+                errors[name] = value
+                if len(launched) == 1:
+                    # Primary failed before producing output: fail over to the next endpoint
+                    launched.append(ranked[1])
+                    executor.submit(attempt, ranked[1])
+                    stats.record("failovers")
+                elif len(errors) == len(launched):
+                    raise ServingEndpointError(
+                        "All routed endpoints failed: " + "; ".join(f"{n}: {e}" for n, e in errors.items())
+                    )
+    finally:
+        executor.shutdown(wait=False)
+
+class RoutingStats:
+    """Counters for routed requests, updated from concurrent requests under one lock"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {"hedged": 0, "failovers": 0, "wins": {}}
+
+    def record(self, event, endpoint_name=None):
+        """Count a hedge or failover, or a win for endpoint_name"""
+        with self._lock:
+            if endpoint_name is None:
+                self._counts[event] += 1
+            else:
+                self._counts[event][endpoint_name] = self._counts[event].get(endpoint_name, 0) + 1
+
+    def stats(self):
+        with self._lock:
+            return {key: dict(value) if isinstance(value, dict) else value for key, value in self._counts.items()}
+
+@st.cache_resource
+def get_routing_stats():
+    """Process-wide counters for routed requests"""
+    return RoutingStats()
+
+def call_serving_endpoint(prompt, endpoint_name, on_token=None):
+    """Call Databricks LLM serving endpoint (requires SYSTEM_PROMPT set in .env), reporting errors in the UI"""
+    try:
+        return request_completion(prompt, endpoint_name, on_token)
+    except ServingEndpointError as e:
+        st.error(f"❌ {e}")
+        return None
     except Exception as e:
         st.error(f"❌ Databricks serving endpoint error: {str(e)}")
         return None
 
-def safe_convert_boolean(series, column_name):
-    """Safely convert boolean columns that may be stored as concatenated strings"""
-    if series.empty:
-        return series
-    
+# --- Query result cache ---
+def normalize_sql(query):
+    """Collapse whitespace and trailing semicolons so equivalent SQL shares a cache key"""
+    return re.sub(r"\s+", " ", str(query)).strip().rstrip(";").strip()
+
+def make_cache_key(query, params=None, watermark=None, variant=""):
+    """Content key from normalized SQL, bound parameters, data watermark and post-processing step"""
+    payload = json.dumps(
+        {"sql": normalize_sql(query), "params": params, "watermark": watermark, "variant": variant},
+        sort_keys=True, default=str
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def frame_nbytes(df):
+    """Approximate in-memory size of a cached DataFrame"""
     try:
-        # Handle different boolean storage formats
-        if series.dtype == 'object':
-            # Check if it's a string column that looks like concatenated booleans
-            sample_val = str(series.iloc[0]).lower() if not pd.isna(series.iloc[0]) else ""
-            
-            if 'true' in sample_val and 'false' in sample_val and len(sample_val) > 10:
-                # This is likely a concatenated boolean string, extract the first boolean value
-                return series.astype(str).str.lower().str.extract(r'(true|false)')[0].map({'true': True, 'false': False, None: False})
-            else:
-                # Normal string boolean conversion
-                return series.astype(str).str.lower().map({'true': True, 'false': False, '1': True, '0': False, 'yes': True, 'no': False}).fillna(False)
-        elif series.dtype in ['int64', 'float64']:
-            # Convert numeric to boolean (1/0 to True/False)
-            return series.fillna(0).astype(bool)
-        else:
-            # Already boolean or other type
-            return series.fillna(False).astype(bool)
+        return int(df.memory_usage(index=True, deep=True).sum())
+    except Exception:
+        return 0
+
+def value_nbytes(value):
+    """Approximate in-memory size of a cached value, counting the frames and arrays inside dicts and lists"""
+    if isinstance(value, pd.DataFrame):
+        return frame_nbytes(value)
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=True))
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(value_nbytes(key) + value_nbytes(item) for key, item in value.items())
+    if isinstance(value, (list, tuple, set)):
+        return sum(value_nbytes(item) for item in value)
+    return sys.getsizeof(value)
+
+class QueryResultCache:
+    """Size-bounded LRU cache of query results with a TTL and watermark-based invalidation"""
+
+    def __init__(self, max_entries=64, max_bytes=None, ttl=300.0, store=None):
+        self._max_entries = max(1, max_entries)
+        self._max_bytes = max_bytes
+        self._ttl = ttl
+        # key -> (value, stored_at, watermark, nbytes); dict order is the LRU order
+        self._store = store if store is not None else OrderedDict()
+        self._bytes = sum(entry[3] for entry in self._store.values())
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    def _drop(self, key):
+        entry = self._store.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[3]
+
+    def get(self, key):
+        """Return a cached value, or None if missing or expired"""
+        with self._lock:
+            entry = self._store.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            if self._ttl is not None and time.monotonic() - entry[1] > self._ttl:
+                self._drop(key)
+                self._stats["expirations"] += 1
+                self._stats["misses"] += 1
+                return None
+            # Mark as most recently used
+            self._store[key] = self._store.pop(key)
+            self._stats["hits"] += 1
+            return entry[0]
+
+    def put(self, key, value, watermark=None, age=0.0):
+        """Store a value, evicting least recently used entries past the size limits.
+
+        age is how long the value has already been cached elsewhere; it counts against the TTL.
+        """
+        nbytes = value_nbytes(value)
+        with self._lock:
+            self._drop(key)
+            self._store[key] = (value, time.monotonic() - max(age, 0.0), watermark, nbytes)
+            self._bytes += nbytes
+            while len(self._store) > 1 and (
+                len(self._store) > self._max_entries
+                or (self._max_bytes is not None and self._bytes > self._max_bytes)
+            ):
+                self._drop(next(iter(self._store)))
+                self._stats["evictions"] += 1
+
+    def invalidate_watermark(self, watermark):
+        """Drop every entry cached against a different data watermark"""
+        with self._lock:
+            stale = [key for key, entry in self._store.items() if entry[2] != watermark]
+            for key in stale:
+                self._drop(key)
+            self._stats["invalidations"] += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._store.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Snapshot of cache occupancy and hit/miss counters"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._store)
+            stats["max_entries"] = self._max_entries
+            stats["size_mb"] = self._bytes / 1024 / 1024
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+@st.cache_resource
+def get_query_cache():
+    """Process-wide query result cache shared by all Streamlit sessions"""
+    return QueryResultCache(
+        max_entries=QUERY_CACHE_MAX_ENTRIES,
+        max_bytes=int(QUERY_CACHE_MAX_MB * 1024 * 1024),
+        ttl=QUERY_CACHE_TTL_SECONDS
+    )
+
+class CompletionCache(QueryResultCache):
+    """LLM response cache: the in-memory TTL/LRU tier, optionally persisted as JSON files in a directory"""
+
+    def __init__(self, directory=None, **kwargs):
+        super().__init__(**kwargs)
+        self.directory = directory or None
+        self._stats["disk_hits"] = 0
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key):
+        value = super().get(key)
+        if value is not None or not self.directory:
+            return value
+        try:
+            with open(self._path(key), encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        age = time.time() - entry.get("created", 0)
+        if self._ttl is not None and age > self._ttl:
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+            return None
+        # Carry the file's age into memory so the entry still expires TTL after it was first created
+        super().put(key, entry["text"], age=age)
+        with self._lock:
+            # Count the disk hit as a hit rather than the memory miss recorded above
+            self._stats["misses"] -= 1
+            self._stats["hits"] += 1
+            self._stats["disk_hits"] += 1
+        return entry["text"]
+
+    def put(self, key, value, watermark=None):
+        super().put(key, value, watermark)
+        if not self.directory:
+            return
+        try:
+            path = self._path(key)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"text": value, "created": time.time()}, f)
+            os.replace(tmp_path, path)
+            # Keep the directory within the same entry limit, oldest files first
+            files = [os.path.join(self.directory, name) for name in os.listdir(self.directory) if name.endswith(".json")]
+            if len(files) > self._max_entries:
+                files.sort(key=os.path.getmtime)
+                for stale in files[:len(files) - self._max_entries]:
+                    os.remove(stale)
+        except OSError:
+            pass
+
+def completion_cache_key(prompt, endpoint_name):
+    """Content key from the system prompt, rendered user prompt, endpoint and generation settings"""
+    payload = json.dumps({
+        "system": (SYSTEM_PROMPT or "").strip(),
+        "prompt": str(prompt),
+        "endpoint": endpoint_name,
+        "temperature": LLM_TEMPERATURE,
+        "max_tokens": LLM_MAX_TOKENS
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+@st.cache_resource
+def get_completion_cache():
+    """Process-wide LLM response cache shared by all Streamlit sessions"""
+    return CompletionCache(directory=LLM_CACHE_DIR, max_entries=LLM_CACHE_MAX_ENTRIES, ttl=LLM_CACHE_TTL_SECONDS)
+
+@st.cache_resource
+def get_watermark_state():
+    """Process-wide record of the table's last seen `_fivetran_synced` high-water mark"""
+    return {"value": None, "checked_at": None, "lock": threading.Lock()}
+
+def get_table_watermark():
+    """Max `_fivetran_synced` of the table, re-checked at most every WATERMARK_CHECK_SECONDS"""
+    state = get_watermark_state()
+    with state["lock"]:
+        now = time.monotonic()
+        if state["checked_at"] is not None and now - state["checked_at"] < WATERMARK_CHECK_SECONDS:
+            return state["value"]
+        state["checked_at"] = now
+        result = execute_query(f"SELECT max(`_fivetran_synced`) AS watermark FROM {table_name}")
+        if result.empty or pd.isna(result.iloc[0, 0]):
+            # Failed or empty read: keep the last known watermark rather than flushing every cache
+            return state["value"]
+        watermark = str(result.iloc[0, 0])
+        if watermark != state["value"]:
+            # New Fivetran sync landed: everything cached against the old watermark is stale
+            get_query_cache().invalidate_watermark(watermark)
+            st.session_state.data_cache.clear()
+        state["value"] = watermark
+        return watermark
+
+def cached_query(query, params=None, postprocess=None):
+    """execute_query behind the session and process-wide caches.
+
+    The optional postprocess step runs once before caching; cached frames are shared
+    between sessions and must be treated as read-only.
+    """
+    watermark = get_table_watermark()
+    variant = getattr(postprocess, "__name__", "") if postprocess else ""
+    key = make_cache_key(query, params, watermark, variant)
+
+    session_cache = QueryResultCache(
+        max_entries=SESSION_CACHE_MAX_ENTRIES, ttl=QUERY_CACHE_TTL_SECONDS, store=st.session_state.data_cache
+    )
+    df = session_cache.get(key)
+    if df is not None:
+        return df
+
+    process_cache = get_query_cache()
+    df = process_cache.get(key)
+    if df is None:
+        df = execute_query(query, params)
+        if df.empty:
+            return df
+        if postprocess:
+            df = postprocess(df)
+        process_cache.put(key, df, watermark)
+    session_cache.put(key, df, watermark)
+    return df
+
+# --- Schema-driven type coercion ---
+# Column roles used when the Unity Catalog schema is unavailable or ambiguous
+BOOLEAN_COLUMNS = ['_fivetran_deleted']
+NUMERIC_COLUMNS = [
+    'energy_consumption_kwh', 'peak_demand_kw', 'voltage_level', 'power_factor',
+    'temperature_fahrenheit', 'humidity_percent', 'wind_speed_mph', 'billing_cycle_day',
+    'outage_events', 'social_media_sentiment', 'customer_complaints', 'predicted_demand_mw'
+]
+DATE_COLUMNS = ['timestamp', '_fivetran_synced']
+# Repetitive text columns stored as dictionary-encoded categoricals
+CATEGORY_COLUMNS = ['meter_id', 'customer_id', 'customer_type', 'service_territory', 'weather_condition', 'rate_schedule']
+# Other text columns are dictionary-encoded too when at most this fraction of their values is distinct
+CATEGORY_MAX_DISTINCT_RATIO = 0.5
+
+UC_INTEGER_TYPES = ("tinyint", "smallint", "int", "integer", "bigint", "byte", "short", "long")
+UC_FLOAT_TYPES = ("float", "double", "real", "decimal")
+
+# float32 is used only when it round-trips every value to within this absolute tolerance
+# (half of the 3-decimal display precision used across the dashboard)
+FLOAT32_TOLERANCE = 5e-4
+
+@st.cache_data(ttl=SCHEMA_CACHE_SECONDS, show_spinner=False)
+def get_table_schema():
+    """Unity Catalog column types (lowercase name -> lowercase type), read once and cached"""
+    result = execute_query(f"DESCRIBE TABLE {table_name}")
+    schema = {}
+    if result.empty:
+        return schema
+    for name, data_type in zip(result.iloc[:, 0], result.iloc[:, 1]):
+        # DESCRIBE appends partitioning details after a blank row / '#' header
+        if not name or str(name).startswith('#'):
+            break
+        schema[str(name).lower()] = str(data_type).lower()
+    return schema
+
+def column_target_type(column, uc_type=None):
+    """Target dtype family for one column from its UC type, falling back to the known column roles"""
+    uc_type = (uc_type or "").split("(")[0].strip()
+    if column in BOOLEAN_COLUMNS or uc_type == "boolean":
+        return "boolean"
+    if column in DATE_COLUMNS or uc_type in ("timestamp", "timestamp_ntz", "date"):
+        return "datetime"
+    if column in CATEGORY_COLUMNS:
+        return "category"
+    if uc_type in UC_INTEGER_TYPES:
+        return "integer"
+    if column in NUMERIC_COLUMNS or uc_type in UC_FLOAT_TYPES:
+        return "float"
+    return None
+
+def build_column_plan(columns, schema):
+    """Map each column to its target dtype family; columns without a target are left untouched"""
+    plan = {}
+    for col in columns:
+        target = column_target_type(col, schema.get(col))
+        if target:
+            plan[col] = target
+    return plan
+
+def coerce_boolean(series):
+    """Vectorized boolean parsing into a nullable boolean column.
+
+    Handles real booleans, 1/0 numerics and text, including values stored as concatenated
+    boolean strings (the first true/false token wins). Anything else becomes <NA>.
+    """
+    if pd.api.types.is_bool_dtype(series):
+        return series.astype("boolean")
+    if pd.api.types.is_numeric_dtype(series):
+        return series.ne(0).astype("boolean").mask(series.isna())
+    text = series.astype("string").str.lower()
+    # Whole-value matches only, so "unknown", "none" or "10" do not pick up a token inside them
+    token = text.str.extract(r"^\s*(true|false|yes|no|1|0)\s*$", expand=False)
+    concatenated = text.str.extract(r"^\s*(true|false)(?:true|false)+\s*$", expand=False)
+    token = token.fillna(concatenated)
+    return token.map({"true": True, "yes": True, "1": True, "false": False, "no": False, "0": False}).astype("boolean")
+
+def coerce_numeric(series, target, fill_zero):
+    """Numeric conversion with compact dtypes (downcast integers, float32 where it is lossless enough)"""
+    values = series if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series) \
+        else pd.to_numeric(series, errors='coerce')
+    if fill_zero:
+        values = values.fillna(0)
+    if values.empty:
+        return values
+    if target == "integer" and not values.hasnans:
+        return pd.to_numeric(values, downcast="integer")
+    values = values.astype("float64")
+    compact = values.astype("float32")
+    if (compact.astype("float64") - values).abs().max() <= FLOAT32_TOLERANCE:
+        return compact
+    return values
+
+def coerce_columns(df, plan):
+    """Convert all planned columns in one pass and assemble the result once"""
+    converted = {}
+    for col in df.columns:
+        target = plan.get(col)
+        series = df[col]
+        try:
+            if target == "boolean":
+                series = coerce_boolean(series)
+            elif target == "datetime":
+                if not pd.api.types.is_datetime64_any_dtype(series):
+                    series = pd.to_datetime(series, errors='coerce')
+            elif target == "category":
+                if not isinstance(series.dtype, pd.CategoricalDtype):
+                    series = series.astype("category")
+            elif target in ("integer", "float"):
+                # Dashboard metrics treat unparseable or missing values as 0
+                series = coerce_numeric(series, target, fill_zero=col in NUMERIC_COLUMNS)
+            elif target is None and len(series) > 1 and pd.api.types.infer_dtype(series, skipna=True) == "string":
+                if series.nunique(dropna=True) <= CATEGORY_MAX_DISTINCT_RATIO * len(series):
+                    series = series.astype("category")
+        except Exception as e:
+            st.warning(f"Type conversion warning for {col}: {str(e)}")
+        converted[col] = series
+    return pd.DataFrame(converted, index=df.index)
+
+def dataset_memory_report(df):
+    """Bytes held per column (including string payloads and category dictionaries)"""
+    usage = df.memory_usage(index=False, deep=True)
+    report = pd.DataFrame({
+        "dtype": df.dtypes.astype(str),
+        "bytes": usage,
+        "bytes_per_row": (usage / max(len(df), 1)).round(1)
+    })
+    return report.sort_values("bytes", ascending=False)
+
+# --- Parquet snapshot (fast cold start) ---
+SNAPSHOT_METADATA_KEY = b"demandpredict_snapshot"
+
+def snapshots_enabled():
+    return SNAPSHOT_ENABLED and pq is not None
+
+def snapshot_path():
+    """One snapshot file per table and load mode"""
+    digest = hashlib.sha256(f"{table_name}|{DATA_LOAD_MODE}".encode("utf-8")).hexdigest()[:16]
+    return os.path.join(SNAPSHOT_DIR, f"snapshot_{digest}.parquet")
+
+def write_snapshot(df, watermark):
+    """Atomically write the typed dataset to Parquet, tagged with table name and watermark"""
+    meta = {
+        "table": table_name,
+        "load_mode": DATA_LOAD_MODE,
+        "watermark": watermark,
+        "rows": len(df),
+        "written_at": datetime.now().isoformat(timespec="seconds")
+    }
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    table = table.replace_schema_metadata({
+        **(table.schema.metadata or {}),
+        SNAPSHOT_METADATA_KEY: json.dumps(meta).encode("utf-8")
+    })
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    path = snapshot_path()
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    pq.write_table(table, tmp_path, compression="zstd")
+    os.replace(tmp_path, path)
+    return meta
+
+def read_snapshot():
+    """Memory-map the snapshot for this table; returns (DataFrame, metadata) or None"""
+    path = snapshot_path()
+    if not os.path.exists(path):
+        return None
+    try:
+        table = pq.read_table(path, memory_map=True)
+        meta = json.loads((table.schema.metadata or {}).get(SNAPSHOT_METADATA_KEY, b"{}"))
+        if meta.get("table") != table_name or meta.get("load_mode") != DATA_LOAD_MODE:
+            return None
+        return arrow_table_to_frame(table), meta
     except Exception as e:
-        st.warning(f"Boolean conversion warning for {column_name}: {str(e)}")
-        return pd.Series([False] * len(series), index=series.index)
+        st.warning(f"Ignoring unreadable data snapshot: {str(e)}")
+        return None
 
-def safe_numeric_conversion(series, column_name):
-    """Safely convert numeric columns with error handling"""
+@st.cache_resource
+def get_snapshot_state():
+    """Process-wide snapshot status: whether this process has reconciled with the warehouse yet"""
+    return {"reconciled": False, "meta": None, "failures": 0, "retry_at": 0.0, "lock": threading.Lock()}
+
+def save_snapshot_if_changed(df):
+    """Rewrite the snapshot when the warehouse data has moved past the snapshot's watermark"""
+    if not snapshots_enabled() or df.empty:
+        return
+    state = get_snapshot_state()
+    watermark = get_table_watermark()
+    if state["meta"] is not None and state["meta"].get("watermark") == watermark:
+        return
     try:
-        return pd.to_numeric(series, errors='coerce').fillna(0)
+        state["meta"] = write_snapshot(df, watermark)
     except Exception as e:
-        st.warning(f"Numeric conversion warning for {column_name}: {str(e)}")
-        return pd.Series([0.0] * len(series), index=series.index)
+        st.warning(f"Could not write data snapshot: {str(e)}")
 
 def load_data():
-    """Load data from Unity Catalog with proper data type handling"""
+    """Load data, serving the on-disk snapshot until this process has reconciled with the warehouse"""
+    if snapshots_enabled():
+        state = get_snapshot_state()
+        if not state["reconciled"]:
+            snapshot = read_snapshot()
+            if snapshot is not None:
+                df, state["meta"] = snapshot
+                st.session_state.serving_snapshot = True
+                return df
+            state["reconciled"] = True
+    st.session_state.serving_snapshot = False
+    df = load_data_from_warehouse()
+    save_snapshot_if_changed(df)
+    return df
+
+def reconcile_snapshot():
+    """Refresh from the warehouse after the page has rendered from a snapshot (one session per process does it).
+
+    Returns True once the process has reconciled, whichever session did the work, so every
+    session still showing the snapshot knows to rerun.
+    """
+    state = get_snapshot_state()
+    if state["reconciled"]:
+        return True
+    # After a failed attempt, back off instead of adding a failing round-trip to every rerun
+    if time.monotonic() < state["retry_at"] or not state["lock"].acquire(blocking=False):
+        return False
+    try:
+        if state["reconciled"]:
+            return True
+        try:
+            df = load_data_from_warehouse()
+        except Exception:
+            df = pd.DataFrame()
+        if df.empty:
+            backoff = SNAPSHOT_RECONCILE_BACKOFF_SECONDS * 2 ** state["failures"]
+            state["failures"] += 1
+            state["retry_at"] = time.monotonic() + min(backoff, SNAPSHOT_RECONCILE_MAX_BACKOFF_SECONDS)
+            return False
+        save_snapshot_if_changed(df)
+        state["reconciled"] = True
+        state["failures"] = 0
+        return True
+    finally:
+        state["lock"].release()
+
+def load_data_from_warehouse():
+    """Load data from Unity Catalog (through the query cache) with proper data type handling"""
+    if DATA_LOAD_MODE == "incremental":
+        return get_incremental_loader().refresh(get_table_watermark())
     query = f"SELECT * FROM {table_name} WHERE `_fivetran_deleted` = false LIMIT 1000"
-    df = execute_query(query)
-    
+    return cached_query(query, postprocess=prepare_loaded_data)
+
+def prepare_loaded_data(df):
+    """Normalize column names and coerce every column to its schema-driven compact dtype"""
     if not df.empty:
         # Convert column names to lowercase for consistency
         df.columns = [col.lower() for col in df.columns]
-        
-        # CRITICAL: Fix boolean columns that may be stored as concatenated strings
-        boolean_columns = ['_fivetran_deleted']
-        
-        for col in boolean_columns:
-            if col in df.columns:
-                df[col] = safe_convert_boolean(df[col], col)
-        
-        # CRITICAL: Ensure numeric columns are properly typed and handle NaN values
-        numeric_columns = [
-            'energy_consumption_kwh', 'peak_demand_kw', 'voltage_level', 'power_factor',
-            'temperature_fahrenheit', 'humidity_percent', 'wind_speed_mph', 'billing_cycle_day',
-            'outage_events', 'social_media_sentiment', 'customer_complaints', 'predicted_demand_mw'
-        ]
-        
-        for col in numeric_columns:
-            if col in df.columns:
-                df[col] = safe_numeric_conversion(df[col], col)
-        
-        # Handle date columns
-        date_columns = ['timestamp', '_fivetran_synced']
-        for col in date_columns:
-            if col in df.columns:
-                try:
-                    df[col] = pd.to_datetime(df[col], errors='coerce')
-                except:
-                    pass
+        df = coerce_columns(df, build_column_plan(df.columns, get_table_schema()))
     
     return df
 
+# --- Aggregation helpers (SQL pushdown with pandas fallback) ---
+def empty_aggregates(source):
+    """Common shape returned by both aggregation paths"""
+    return {
+        "source": source,
+        "row_count": 0,
+        "numeric": {},       # column -> {count, mean, sum, std, min, max, 25%, 50%, 75%}
+        "distinct": {},      # column -> distinct count (approximate when pushed down)
+        "top_values": {},    # column -> pd.Series of counts, most frequent first
+        "correlations": pd.DataFrame(),
+        "histograms": {}     # column -> DataFrame of bin_start, bin_end, count (streaming only)
+    }
+
+def build_aggregate_query(numeric_columns, categorical_columns):
+    """Compile the scalar metrics (moments, quantiles, distincts, correlations) into one SELECT"""
+    # Mirror load_data(): unparseable or missing numerics count as 0
+    def numeric_expr(col):
+        return f"coalesce(try_cast({quote_identifier(col)} AS DOUBLE), 0)"
+
+    expressions = ["count(*) AS row_count"]
+    for i, col in enumerate(numeric_columns):
+        expr = numeric_expr(col)
+        expressions += [
+            f"count({expr}) AS n{i}_count",
+            f"avg({expr}) AS n{i}_mean",
+            f"sum({expr}) AS n{i}_sum",
+            f"stddev_samp({expr}) AS n{i}_std",
+            f"min({expr}) AS n{i}_min",
+            f"max({expr}) AS n{i}_max",
+            f"approx_percentile({expr}, array(0.25, 0.5, 0.75)) AS n{i}_quantiles"
+        ]
+    for i, col in enumerate(categorical_columns):
+        expressions.append(f"approx_count_distinct({quote_identifier(col)}) AS c{i}_distinct")
+    for i, col1 in enumerate(numeric_columns):
+        for j in range(i + 1, len(numeric_columns)):
+            col2 = numeric_columns[j]
+            expressions.append(f"corr({numeric_expr(col1)}, {numeric_expr(col2)}) AS r{i}_{j}")
+
+    return (
+        f"SELECT {', '.join(expressions)} FROM {table_name} "
+        f"WHERE `_fivetran_deleted` = false"
+    )
+
+def build_mape_query():
+    """MAPE of predicted_demand_mw against peak_demand_kw (in MW) over the whole table, skipping zero actuals"""
+    actual = "try_cast(`peak_demand_kw` AS DOUBLE) / 1000"
+    forecast = "try_cast(`predicted_demand_mw` AS DOUBLE)"
+    return (
+        f"SELECT avg(abs({forecast} - {actual}) / abs({actual})) * 100 AS mape_pct FROM {table_name} "
+        f"WHERE `_fivetran_deleted` = false AND {forecast} IS NOT NULL AND {actual} <> 0"
+    )
+
+def build_top_values_query(categorical_columns, top_k):
+    """Compile per-column GROUP BY ... ORDER BY count DESC LIMIT k into one UNION ALL query"""
+    branches = []
+    for col in categorical_columns:
+        ident = quote_identifier(col)
+        branches.append(
+            f"(SELECT '{col}' AS column_name, CAST({ident} AS STRING) AS value, count(*) AS value_count "
+            f"FROM {table_name} WHERE `_fivetran_deleted` = false AND {ident} IS NOT NULL "
+            f"GROUP BY {ident} ORDER BY value_count DESC LIMIT {int(top_k)})"
+        )
+    return " UNION ALL ".join(branches)
+
+def compute_aggregates_pushdown(numeric_columns, categorical_columns, top_k=3):
+    """Run the aggregate queries in Databricks and return only the small result sets"""
+    aggregates = empty_aggregates("warehouse")
+    result = cached_query(build_aggregate_query(numeric_columns, categorical_columns))
+    if result.empty:
+        return None
+    row = result.iloc[0]
+    aggregates["row_count"] = int(row["row_count"] or 0)
+
+    for i, col in enumerate(numeric_columns):
+        quantiles = row[f"n{i}_quantiles"]
+        quantiles = list(quantiles) if quantiles is not None else [None, None, None]
+        aggregates["numeric"][col] = {
+            "count": int(row[f"n{i}_count"] or 0),
+            "mean": row[f"n{i}_mean"],
+            "sum": row[f"n{i}_sum"],
+            "std": row[f"n{i}_std"],
+            "min": row[f"n{i}_min"],
+            "max": row[f"n{i}_max"],
+            "25%": quantiles[0],
+            "50%": quantiles[1],
+            "75%": quantiles[2]
+        }
+    for i, col in enumerate(categorical_columns):
+        aggregates["distinct"][col] = int(row[f"c{i}_distinct"] or 0)
+
+    if len(numeric_columns) >= 2:
+        correlations = pd.DataFrame(1.0, index=numeric_columns, columns=numeric_columns)
+        for i, col1 in enumerate(numeric_columns):
+            for j in range(i + 1, len(numeric_columns)):
+                value = row[f"r{i}_{j}"]
+                value = float(value) if value is not None else float("nan")
+                correlations.iloc[i, j] = value
+                correlations.iloc[j, i] = value
+        aggregates["correlations"] = correlations
+
+    if categorical_columns:
+        top = cached_query(build_top_values_query(categorical_columns, top_k))
+        if not top.empty:
+            for col, group in top.groupby("column_name", sort=False):
+                counts = pd.Series(group["value_count"].astype(int).values, index=group["value"].values, name=col)
+                aggregates["top_values"][col] = counts.sort_values(ascending=False)
+
+    return aggregates
+
+def get_column_profile(data, numeric_columns, categorical_columns, top_k=3):
+    """profiling.profile_columns memoized per data version in the process-wide cache"""
+    numeric_columns = [col for col in numeric_columns if col in data.columns]
+    categorical_columns = [col for col in categorical_columns if col in data.columns]
+    key = make_cache_key(
+        "column_profile",
+        {"numeric": numeric_columns, "categorical": categorical_columns, "top_k": top_k},
+        dataset_version(data)
+    )
+    cache = get_query_cache()
+    profile = cache.get(key)
+    if profile is None:
+        profile = profiling.profile_columns(data, numeric_columns, categorical_columns, top_k)
+        cache.put(key, profile, get_watermark_state()["value"])
+    return profile
+
+def compute_aggregates_local(data, numeric_columns, categorical_columns, top_k=3):
+    """Pandas fallback producing the same structure from an in-memory DataFrame"""
+    aggregates = empty_aggregates("local")
+    aggregates["row_count"] = len(data)
+
+    profile = get_column_profile(data, numeric_columns, categorical_columns, top_k)
+    for col in numeric_columns:
+        stats = profile["columns"].get(col)
+        if stats and stats["count"]:
+            aggregates["numeric"][col] = stats
+    for col in categorical_columns:
+        stats = profile["columns"].get(col)
+        if stats:
+            aggregates["distinct"][col] = stats["distinct"]
+            aggregates["top_values"][col] = stats["top_values"]
+    aggregates["correlations"] = profile["correlations"]
+
+    return aggregates
+
+# --- Streaming aggregation (bounded memory over the full table) ---
+class StreamingHistogram:
+    """Fixed number of equal-width bins whose width doubles whenever a value falls outside the range"""
+
+    def __init__(self, max_bins=64):
+        self.max_bins = max_bins
+        self.origin = None
+        self.width = None
+        self.counts = np.zeros(max_bins, dtype=np.int64)
+
+    def _grow_to(self, low, high):
+        # Merge adjacent bins pairwise (doubling the width) until [low, high] fits
+        while low < self.origin or high >= self.origin + self.width * self.max_bins:
+            merged = self.counts.reshape(-1, 2).sum(axis=1)
+            self.counts = np.zeros(self.max_bins, dtype=np.int64)
+            if low < self.origin:
+                # Extend to the left: existing range moves into the upper half
+                self.origin -= self.width * self.max_bins
+                self.counts[self.max_bins // 2:] = merged
+            else:
+                self.counts[:self.max_bins // 2] = merged
+            self.width *= 2
+
+    def update(self, values):
+        values = values[np.isfinite(values)]
+        if values.size == 0:
+            return
+        low, high = values.min(), values.max()
+        if self.origin is None:
+            self.origin = float(low)
+            self.width = max(float(high - low), 1e-9) / self.max_bins * 1.0001
+        self._grow_to(low, high)
+        idx = np.clip(((values - self.origin) // self.width).astype(np.int64), 0, self.max_bins - 1)
+        self.counts += np.bincount(idx, minlength=self.max_bins)
+
+    def to_frame(self):
+        """Non-empty bins as a DataFrame with bin_start, bin_end and count"""
+        if self.origin is None:
+            return pd.DataFrame(columns=["bin_start", "bin_end", "count"])
+        starts = self.origin + self.width * np.arange(self.max_bins)
+        frame = pd.DataFrame({"bin_start": starts, "bin_end": starts + self.width, "count": self.counts})
+        nonzero = np.flatnonzero(self.counts)
+        return frame.iloc[nonzero[0]:nonzero[-1] + 1].reset_index(drop=True)
+
+class TableProfileAccumulator:
+    """Running aggregates over DataFrame batches, producing the same structure as get_table_aggregates.
+
+    Moments, sums, min/max and correlations are exact (batched Welford / Chan co-moment merge).
+    Quantiles come from a fixed-size reservoir sample, value counts from a pruned counter that is
+    exact while a column has at most topk_capacity distinct values, and distinct counts from a
+    K-minimum-values sketch.
+    """
+
+    def __init__(self, numeric_columns, categorical_columns, sample_size=20000,
+                 topk_capacity=5000, histogram_bins=64, seed=0):
+        self.numeric_columns = list(numeric_columns)
+        self.categorical_columns = list(categorical_columns)
+        self.sample_size = sample_size
+        self.topk_capacity = topk_capacity
+        self.rng = np.random.default_rng(seed)
+        k = len(self.numeric_columns)
+        self.row_count = 0
+        self.n = 0
+        self.mean = np.zeros(k)
+        self.comoment = np.zeros((k, k))
+        self.sum = np.zeros(k)
+        self.min = np.full(k, np.inf)
+        self.max = np.full(k, -np.inf)
+        self.sample = np.empty((0, k))
+        self.histograms = {col: StreamingHistogram(histogram_bins) for col in self.numeric_columns}
+        self.value_counts = {col: pd.Series(dtype="int64") for col in self.categorical_columns}
+        self.kmv = {col: np.empty(0, dtype=np.uint64) for col in self.categorical_columns}
+        self.kmv_size = 1024
+
+    def _update_numeric(self, values):
+        batch_n = values.shape[0]
+        batch_mean = values.mean(axis=0)
+        centered = values - batch_mean
+        batch_comoment = centered.T @ centered
+        total = self.n + batch_n
+        delta = batch_mean - self.mean
+        self.comoment += batch_comoment + np.outer(delta, delta) * self.n * batch_n / total
+        self.mean += delta * batch_n / total
+        self.n = total
+        self.sum += values.sum(axis=0)
+        self.min = np.minimum(self.min, values.min(axis=0))
+        self.max = np.maximum(self.max, values.max(axis=0))
+        for i, col in enumerate(self.numeric_columns):
+            self.histograms[col].update(values[:, i])
+
+        # Vectorized reservoir sampling: row t (1-based, global) replaces a random slot with prob m/t
+        seen_before = self.n - batch_n
+        fill = max(0, min(self.sample_size - len(self.sample), batch_n))
+        if fill:
+            self.sample = np.vstack([self.sample, values[:fill]])
+        if fill < batch_n:
+            positions = np.arange(seen_before + fill + 1, self.n + 1)
+            slots = (self.rng.random(positions.size) * positions).astype(np.int64)
+            chosen = slots < self.sample_size
+            self.sample[slots[chosen]] = values[fill:][chosen]
+
+    def _update_categorical(self, col, series):
+        series = series.dropna()
+        if series.empty:
+            return
+        counts = self.value_counts[col].add(series.astype(str).value_counts(), fill_value=0).astype("int64")
+        if len(counts) > self.topk_capacity:
+            counts = counts.nlargest(self.topk_capacity)
+        self.value_counts[col] = counts
+        hashes = pd.util.hash_pandas_object(series, index=False).to_numpy(dtype=np.uint64)
+        self.kmv[col] = np.unique(np.concatenate([self.kmv[col], hashes]))[:self.kmv_size]
+
+    def update(self, batch):
+        """Fold one batch of rows into the running aggregates"""
+        if batch.empty:
+            return
+        batch.columns = [col.lower() for col in batch.columns]
+        self.row_count += len(batch)
+        if self.numeric_columns:
+            # Mirror load_data(): unparseable or missing numerics count as 0
+            values = np.column_stack([
+                pd.to_numeric(batch[col], errors='coerce').fillna(0).to_numpy(dtype=np.float64)
+                if col in batch.columns else np.zeros(len(batch))
+                for col in self.numeric_columns
+            ])
+            self._update_numeric(values)
+        for col in self.categorical_columns:
+            if col in batch.columns:
+                self._update_categorical(col, batch[col])
+
+    def distinct_estimate(self, col):
+        hashes = self.kmv[col]
+        if len(hashes) < self.kmv_size:
+            return len(hashes)
+        return int((self.kmv_size - 1) / (float(hashes[-1]) / 2.0 ** 64))
+
+    def correlations(self):
+        """Pearson correlation matrix from the accumulated co-moments"""
+        std = np.sqrt(np.diag(self.comoment))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            corr = self.comoment / np.outer(std, std)
+        np.fill_diagonal(corr, 1.0)
+        return pd.DataFrame(corr, index=self.numeric_columns, columns=self.numeric_columns)
+
+    def to_aggregates(self, top_k=3):
+        aggregates = empty_aggregates("streaming")
+        aggregates["row_count"] = self.row_count
+        if self.n:
+            variance = np.diag(self.comoment) / (self.n - 1) if self.n > 1 else np.full(len(self.numeric_columns), np.nan)
+            quantiles = np.quantile(self.sample, [0.25, 0.5, 0.75], axis=0)
+            for i, col in enumerate(self.numeric_columns):
+                aggregates["numeric"][col] = {
+                    "count": int(self.n),
+                    "mean": float(self.mean[i]),
+                    "sum": float(self.sum[i]),
+                    "std": float(np.sqrt(variance[i])),
+                    "min": float(self.min[i]),
+                    "max": float(self.max[i]),
+                    "25%": float(quantiles[0, i]),
+                    "50%": float(quantiles[1, i]),
+                    "75%": float(quantiles[2, i])
+                }
+                aggregates["histograms"][col] = self.histograms[col].to_frame()
+            if len(self.numeric_columns) >= 2:
+                aggregates["correlations"] = self.correlations()
+        for col in self.categorical_columns:
+            aggregates["distinct"][col] = self.distinct_estimate(col)
+            counts = self.value_counts[col]
+            if not counts.empty:
+                aggregates["top_values"][col] = counts.sort_values(ascending=False, kind="stable").head(top_k)
+        return aggregates
+
+def compute_aggregates_streaming(numeric_columns, categorical_columns, top_k=3):
+    """Scan the full table in batches, keeping only bounded accumulator state in memory"""
+    columns = list(dict.fromkeys(numeric_columns + categorical_columns))
+    if not columns:
+        return None
+    accumulator = TableProfileAccumulator(
+        numeric_columns, categorical_columns,
+        sample_size=STREAM_SAMPLE_SIZE, topk_capacity=STREAM_TOPK_CAPACITY
+    )
+    query = (
+        f"SELECT {', '.join(quote_identifier(col) for col in columns)} FROM {table_name} "
+        f"WHERE `_fivetran_deleted` = false"
+    )
+    # A full scan is expensive, so share the result across sessions until the watermark moves
+    watermark = get_table_watermark()
+    key = make_cache_key(query, {"top_k": top_k}, watermark, "streaming_aggregates")
+    cache = get_query_cache()
+    aggregates = cache.get(key)
+    if aggregates is not None:
+        return aggregates
+
+    for batch in iter_query_batches(query):
+        accumulator.update(batch)
+    if accumulator.row_count == 0:
+        return None
+    aggregates = accumulator.to_aggregates(top_k)
+    cache.put(key, aggregates, watermark)
+    return aggregates
+
+def get_table_aggregates(data, numeric_columns, categorical_columns, top_k=3):
+    """Summary statistics for the dashboard, pushed down to Databricks when possible"""
+    numeric_columns = list(dict.fromkeys(numeric_columns))
+    categorical_columns = list(dict.fromkeys(categorical_columns))
+    if AGGREGATION_MODE == "pushdown" and DATABRICKS_HOST and UC_TABLE:
+        try:
+            aggregates = compute_aggregates_pushdown(numeric_columns, categorical_columns, top_k)
+            if aggregates:
+                return aggregates
+        except Exception as e:
+            st.warning(f"Aggregation pushdown failed, falling back to local statistics: {str(e)}")
+    elif AGGREGATION_MODE == "streaming" and DATABRICKS_HOST and UC_TABLE:
+        try:
+            aggregates = compute_aggregates_streaming(numeric_columns, categorical_columns, top_k)
+            if aggregates:
+                return aggregates
+        except Exception as e:
+            st.warning(f"Streaming aggregation failed, falling back to local statistics: {str(e)}")
+    return compute_aggregates_local(data, numeric_columns, categorical_columns, top_k)
+
+def with_table_mape(aggregates, data):
+    """Aggregates plus the full-table MAPE when they came from the warehouse (local ones use the sample's)"""
+    if aggregates["source"] == "local" or not {'predicted_demand_mw', 'peak_demand_kw'} <= set(data.columns):
+        return aggregates
+    result = cached_query(build_mape_query())
+    mape = result.iloc[0, 0] if not result.empty else None
+    # Copy rather than mutate: streamed aggregates are shared through the process-wide cache
+    return {**aggregates, "mape": float(mape) if mape is not None and pd.notna(mape) else None}
+
+AGGREGATION_SOURCE_LABELS = {
+    "warehouse": "Databricks SQL pushdown",
+    "streaming": "streamed full-table scan",
+    "local": "local pandas fallback"
+}
+
+def aggregate_stat(aggregates, column, stat, default=0):
+    """Look up a single statistic, treating missing columns and NULLs as the default"""
+    value = aggregates["numeric"].get(column, {}).get(stat)
+    if value is None or pd.isna(value):
+        return default
+    return value
+
+def aggregates_summary_frame(aggregates, columns):
+    """describe()-style summary table (one row per column) built from aggregates"""
+    stats = ["count", "mean", "std", "min", "25%", "50%", "75%", "max"]
+    rows = {col: [aggregates["numeric"][col][stat] for stat in stats]
+            for col in columns if col in aggregates["numeric"]}
+    summary_df = pd.DataFrame.from_dict(rows, orient="index", columns=stats).astype(float)
+    summary_df.columns = ['Count', 'Mean', 'Std Dev', 'Min', '25%', '50% (Median)', '75%', 'Max']
+    return summary_df
+
+# --- Incremental refresh ---
+class IncrementalTableLoader:
+    """In-memory copy of the table kept current by merging rows newer than the last `_fivetran_synced` seen"""
+
+    def __init__(self, key_columns=("meter_id", "timestamp")):
+        self.key_columns = list(key_columns)
+        self.frame = None
+        self.watermark = None
+        self._lock = threading.Lock()
+        self.last_refresh = {}
+
+    def _full_load(self):
+        df = prepare_loaded_data(execute_query(f"SELECT * FROM {table_name} WHERE `_fivetran_deleted` = false"))
+        return df.reset_index(drop=True)
+
+    def _fetch_delta(self):
+        # >= rather than > so rows written in the same sync batch as the watermark are not missed;
+        # the keyed merge makes re-reading them idempotent
+        query = (
+            f"SELECT * FROM {table_name} "
+            f"WHERE `_fivetran_synced` >= CAST(:watermark AS TIMESTAMP)"
+        )
+        return prepare_loaded_data(execute_query(query, {"watermark": self.watermark.isoformat()}))
+
+    def _merge(self, delta):
+        """Upsert changed rows and apply `_fivetran_deleted` tombstones, keyed by key_columns"""
+        if '_fivetran_synced' in delta.columns:
+            delta = delta.sort_values('_fivetran_synced', kind='stable')
+        delta = delta.drop_duplicates(self.key_columns, keep='last')
+        if '_fivetran_deleted' in delta.columns:
+            deleted = delta['_fivetran_deleted'].fillna(False).astype(bool)
+        else:
+            deleted = pd.Series(False, index=delta.index)
+
+        existing_keys = pd.MultiIndex.from_frame(self.frame[self.key_columns])
+        changed_keys = pd.MultiIndex.from_frame(delta[self.key_columns])
+        unchanged = self.frame[~existing_keys.isin(changed_keys)]
+        upserts = delta[~deleted].reindex(columns=self.frame.columns)
+        merged = pd.concat([unchanged, upserts], ignore_index=True)
+        # concat falls back to object when category sets differ; restore the compact dtypes
+        for col, dtype in self.frame.dtypes.items():
+            if isinstance(dtype, pd.CategoricalDtype) and not isinstance(merged[col].dtype, pd.CategoricalDtype):
+                merged[col] = merged[col].astype("category")
+        return merged, int((~deleted).sum()), int(deleted.sum()), len(self.frame) - len(unchanged)
+
+    def _is_current(self, target_watermark):
+        """True if the table's high-water mark has not moved past what is already merged"""
+        if self.watermark is None or target_watermark is None:
+            return False
+        try:
+            return pd.Timestamp(target_watermark) <= self.watermark
+        except (TypeError, ValueError):
+            return False
+
+    def refresh(self, target_watermark=None):
+        """Bring the in-memory frame up to date and return it (shared, treat as read-only)"""
+        with self._lock:
+            start = time.monotonic()
+            if self.frame is not None and self._is_current(target_watermark):
+                return self.frame
+
+            if (self.frame is None or self.frame.empty or self.watermark is None
+                    or not all(col in self.frame.columns for col in self.key_columns)):
+                self.frame = self._full_load()
+                self.last_refresh = {"mode": "full", "rows_fetched": len(self.frame)}
+            else:
+                delta = self._fetch_delta()
+                if delta.empty:
+                    self.last_refresh = {"mode": "delta", "rows_fetched": 0}
+                else:
+                    self.frame, upserted, tombstones, replaced = self._merge(delta)
+                    self.last_refresh = {
+                        "mode": "delta", "rows_fetched": len(delta), "upserted": upserted,
+                        "tombstones": tombstones, "rows_replaced_or_deleted": replaced
+                    }
+                    if '_fivetran_synced' in delta.columns and delta['_fivetran_synced'].notna().any():
+                        self.watermark = max(self.watermark, delta['_fivetran_synced'].max())
+
+            if self.last_refresh["mode"] == "full":
+                synced = self.frame['_fivetran_synced'] if '_fivetran_synced' in self.frame.columns else pd.Series(dtype='datetime64[ns]')
+                self.watermark = synced.max() if synced.notna().any() else None
+            self.last_refresh["rows_in_memory"] = len(self.frame)
+            self.last_refresh["watermark"] = str(self.watermark)
+            self.last_refresh["seconds"] = round(time.monotonic() - start, 3)
+            return self.frame
+
+@st.cache_resource
+def get_incremental_loader():
+    """Process-wide incremental loader shared by all Streamlit sessions"""
+    return IncrementalTableLoader()
+
+FOCUS_AREAS = [
+    "Overall Performance",
+    "Optimization Opportunities",
+    "Financial Impact",
+    "Strategic Recommendations"
+]
+
 def get_focus_area_info(focus_area):
     """Get business challenge and agent solution for each focus area"""
     
@@ -379,43 +2116,157 @@ def get_focus_area_info(focus_area):
     
     return focus_info.get(focus_area, {"challenge": "", "solution": ""})
 
-def safe_mean(series):
-    """Safely calculate mean, handling NaN values and empty series"""
-    try:
-        if series.empty:
-            return 0
-        numeric_series = pd.to_numeric(series, errors='coerce')
-        return numeric_series.dropna().mean() if not numeric_series.dropna().empty else 0
-    except:
-        return 0
-
-def safe_unique_count(series):
-    """Safely count unique values, handling NaN"""
-    try:
-        if series.empty:
-            return 0
-        return series.dropna().nunique()
-    except:
-        return 0
+# --- Metrics snapshot (computed once per data version, read by every tab) ---
+def compute_mape(data):
+    """Mean absolute percentage error of predicted_demand_mw against peak_demand_kw (in MW)"""
+    if 'predicted_demand_mw' not in data.columns or 'peak_demand_kw' not in data.columns:
+        return None
+    # Zero actual peaks are left out of the percentage error instead of turning it into inf
+    sums = forecasting.accuracy_terms(data['peak_demand_kw'].astype('float64') / 1000, data['predicted_demand_mw'], quantiles=()).sum()
+    mape = forecasting.accuracy_metrics(sums.to_frame().T)["mape_pct"].iloc[0]
+    return float(mape) if pd.notna(mape) else None
+
+def top_correlations(correlations, columns, k=3):
+    """Strongest k pairwise correlations (by absolute value) among the given columns"""
+    columns = [col for col in columns if col in correlations.index]
+    if len(columns) < 2:
+        return []
+    return profiling.top_correlation_pairs(correlations.loc[columns, columns], k)
+
+def dataset_version(data):
+    """Cheap fingerprint of the loaded data: row count plus latest `_fivetran_synced`"""
+    synced = data['_fivetran_synced'].max() if '_fivetran_synced' in data.columns and not data.empty else None
+    return f"{len(data)}|{synced}"
+
+def build_metrics_snapshot(data, aggregates, summary_columns, version=None):
+    """Everything the dashboard tabs display, computed from one set of aggregates"""
+    if "mape" in aggregates:
+        mape, mape_source = aggregates["mape"], aggregates["source"]
+    else:
+        mape, mape_source = compute_mape(data), "local"
+    return {
+        "version": version or dataset_version(data),
+        "source": aggregates["source"],
+        "row_count": aggregates["row_count"],
+        "kpis": {
+            "avg_consumption": aggregate_stat(aggregates, 'energy_consumption_kwh', 'mean'),
+            "total_consumption": aggregate_stat(aggregates, 'energy_consumption_kwh', 'sum'),
+            "avg_peak": aggregate_stat(aggregates, 'peak_demand_kw', 'mean'),
+            "max_peak": aggregate_stat(aggregates, 'peak_demand_kw', 'max'),
+            "avg_predicted": aggregate_stat(aggregates, 'predicted_demand_mw', 'mean'),
+            "prediction_std": aggregate_stat(aggregates, 'predicted_demand_mw', 'std'),
+            "total_outages": aggregate_stat(aggregates, 'outage_events', 'sum'),
+            "avg_outages": aggregate_stat(aggregates, 'outage_events', 'mean')
+        },
+        "summary_df": aggregates_summary_frame(aggregates, summary_columns).round(3),
+        "top_correlations": top_correlations(aggregates["correlations"], INSIGHT_NUMERIC_METRICS),
+        "mape": mape,
+        "mape_source": mape_source,
+        "forecast_efficiency": 100 - mape if mape is not None else 85.0,  # Higher is better; default assumption
+        "aggregates": aggregates
+    }
 
-def safe_sum(series):
-    """Safely calculate sum, handling NaN values"""
-    try:
-        if series.empty:
-            return 0
-        numeric_series = pd.to_numeric(series, errors='coerce')
-        return numeric_series.dropna().sum() if not numeric_series.dropna().empty else 0
-    except:
-        return 0
+def _encode_snapshot_value(value):
+    if isinstance(value, pd.DataFrame):
+        return {"__frame__": value.to_json(orient="split", double_precision=15)}
+    if isinstance(value, pd.Series):
+        return {"__series__": value.to_json(orient="split", double_precision=15)}
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+def _decode_snapshot_value(obj):
+    if "__frame__" in obj:
+        return pd.read_json(StringIO(obj["__frame__"]), orient="split")
+    if "__series__" in obj:
+        return pd.read_json(StringIO(obj["__series__"]), orient="split", typ="series")
+    return obj
+
+def metrics_snapshot_to_json(metrics):
+    return json.dumps(metrics, default=_encode_snapshot_value)
+
+def metrics_snapshot_from_json(text):
+    return json.loads(text, object_hook=_decode_snapshot_value)
+
+def load_persisted_metrics(version):
+    """Read a previously materialized snapshot for this data version from the Delta summary table"""
+    result = execute_query(
+        f"SELECT snapshot_json FROM {METRICS_SUMMARY_TABLE} "
+        f"WHERE source_table = :source_table AND data_version = :data_version "
+        f"ORDER BY computed_at DESC LIMIT 1",
+        {"source_table": table_name, "data_version": version}
+    )
+    if result.empty:
+        return None
+    return metrics_snapshot_from_json(result.iloc[0, 0])
+
+def persist_metrics(metrics):
+    """Materialize a snapshot into the Delta summary table so other app processes can reuse it"""
+    created = execute_statement(
+        f"CREATE TABLE IF NOT EXISTS {METRICS_SUMMARY_TABLE} "
+        f"(source_table STRING, data_version STRING, computed_at TIMESTAMP, snapshot_json STRING) USING DELTA"
+    )
+    if created:
+        execute_statement(
+            f"INSERT INTO {METRICS_SUMMARY_TABLE} VALUES "
+            f"(:source_table, :data_version, current_timestamp(), :snapshot_json)",
+            {"source_table": table_name, "data_version": metrics["version"],
+             "snapshot_json": metrics_snapshot_to_json(metrics)}
+        )
 
-def generate_insights_with_agent_workflow(data, focus_area, model_name, progress_placeholder=None):
+def get_metrics_snapshot(data, numeric_columns, categorical_columns, summary_columns, local_only=False):
+    """Metrics snapshot for the current data version, shared across sessions until the data changes"""
+    # The table watermark covers changes the loaded sample does not show (pushdown/streaming read the full table).
+    # Snapshot first paint must not touch the warehouse, so it uses the watermark the snapshot was written at.
+    if local_only:
+        watermark = (get_snapshot_state()["meta"] or {}).get("watermark")
+    else:
+        watermark = get_table_watermark()
+    version = f"{dataset_version(data)}|{watermark}|{'local' if local_only else AGGREGATION_MODE}"
+    key = make_cache_key("metrics_snapshot", {"summary_columns": list(summary_columns)}, version)
+    cache = get_query_cache()
+    metrics = cache.get(key)
+    if metrics is not None:
+        return metrics
+
+    persist = bool(METRICS_SUMMARY_TABLE) and not local_only
+    if persist:
+        try:
+            metrics = load_persisted_metrics(version)
+        except Exception:
+            metrics = None
+    if metrics is None:
+        if local_only:
+            aggregates = compute_aggregates_local(data, numeric_columns, categorical_columns)
+        else:
+            aggregates = with_table_mape(get_table_aggregates(data, numeric_columns, categorical_columns), data)
+        metrics = build_metrics_snapshot(data, aggregates, summary_columns, version)
+        if persist:
+            persist_metrics(metrics)
+    cache.put(key, metrics, get_watermark_state()["value"])
+    return metrics
+
+# Real pipeline stages behind the agent workflow steps, in display order
+# (five-step workflows have no separate prompt-build step)
+AGENT_STAGES = ["data_prep", "stats", "correlation", "prompt", "llm", "report"]
+
+def timed_call(func, *args):
+    """Run func and return (result, elapsed seconds)"""
+    started = time.monotonic()
+    result = func(*args)
+    return result, time.monotonic() - started
+
+# Key utilities demand forecasting metrics and categorical dimensions summarized for the LLM
+INSIGHT_NUMERIC_METRICS = ["energy_consumption_kwh", "peak_demand_kw", "voltage_level", "power_factor",
+                           "temperature_fahrenheit", "humidity_percent", "wind_speed_mph", "billing_cycle_day",
+                           "outage_events", "social_media_sentiment", "customer_complaints", "predicted_demand_mw"]
+INSIGHT_CATEGORICAL_COLUMNS = ["meter_id", "customer_id", "weather_condition", "customer_type", "service_territory", "rate_schedule"]
+
+def generate_insights_with_agent_workflow(data, focus_area, model_name, progress_placeholder=None, metrics=None, on_token=None):
     """Generate insights using AI agent workflow - Demand Forecasting focused version"""
     
     try:
-        # FIRST: Generate the actual insights (behind the scenes)
-        insights = generate_insights(data, focus_area, model_name)
-        
-        # THEN: Prepare for animation
+        workflow_started = time.monotonic()
         session_key = f'{focus_area.lower().replace(" ", "_")}_completed_steps'
         st.session_state[session_key] = []
         
@@ -437,25 +2288,27 @@ def generate_insights_with_agent_workflow(data, focus_area, model_name, progress
                     for completed_step, completed_result in st.session_state[session_key]:
                         st.markdown(f'<div class="agent-completed">✅ {completed_step}: {completed_result}</div>', unsafe_allow_html=True)
         
-        # Calculate real data for enhanced context with safe operations
-        total_records = len(data)
+        # Stage 1 - data prep: metrics snapshot and the headline figures used in the step descriptions
+        metrics = ensure_metrics(data, metrics)
+        aggregates = metrics["aggregates"]
+        total_records = aggregates["row_count"]
         key_metrics = ["energy_consumption_kwh", "peak_demand_kw", "voltage_level", "predicted_demand_mw"]
         available_metrics = [col for col in key_metrics if col in data.columns]
         
-        # Calculate enhanced demand forecasting data insights with safe operations
-        avg_consumption = safe_mean(data['energy_consumption_kwh']) if 'energy_consumption_kwh' in data.columns else 0
-        avg_peak_demand = safe_mean(data['peak_demand_kw']) if 'peak_demand_kw' in data.columns else 0
-        unique_meters = safe_unique_count(data['meter_id']) if 'meter_id' in data.columns else 0
-        unique_territories = safe_unique_count(data['service_territory']) if 'service_territory' in data.columns else 0
-        avg_predicted_demand = safe_mean(data['predicted_demand_mw']) if 'predicted_demand_mw' in data.columns else 0
-        total_outages = safe_sum(data['outage_events']) if 'outage_events' in data.columns else 0
+        # Read enhanced demand forecasting data insights from the precomputed aggregates
+        avg_consumption = aggregate_stat(aggregates, 'energy_consumption_kwh', 'mean')
+        avg_peak_demand = aggregate_stat(aggregates, 'peak_demand_kw', 'mean')
+        unique_meters = aggregates["distinct"].get('meter_id', 0)
+        unique_territories = aggregates["distinct"].get('service_territory', 0)
+        avg_predicted_demand = aggregate_stat(aggregates, 'predicted_demand_mw', 'mean')
+        total_outages = aggregate_stat(aggregates, 'outage_events', 'sum')
         
         # Define enhanced agent workflows for each focus area
         if focus_area == "Overall Performance":
             steps = [
                 ("Demand Forecasting Data Initialization", 15, f"Loading comprehensive demand forecasting dataset with enhanced validation across {total_records} meter readings and {unique_meters} active smart meters", f"Connected to {len(available_metrics)} demand metrics across {len(data.columns)} total energy data dimensions"),
                 ("Energy Consumption Assessment", 35, f"Advanced calculation of demand forecasting indicators with consumption analysis (avg: {avg_consumption:.1f} kWh)", f"Computed demand metrics: {avg_consumption:.1f} kWh avg consumption, {avg_peak_demand:.1f} kW peak demand, {avg_predicted_demand:.1f} MW predicted demand"),
-                ("Grid Performance Pattern Recognition", 55, f"Sophisticated identification of demand patterns with consumption correlation analysis across {unique_territories} service territories", f"Detected significant patterns in {safe_unique_count(data['weather_condition']) if 'weather_condition' in data.columns else 'N/A'} weather conditions with grid correlation analysis completed"),
+                ("Grid Performance Pattern Recognition", 55, f"Sophisticated identification of demand patterns with consumption correlation analysis across {unique_territories} service territories", f"Detected significant patterns in {aggregates['distinct'].get('weather_condition', 'N/A')} weather conditions with grid correlation analysis completed"),
                 ("AI Demand Intelligence Processing", 75, f"Processing comprehensive demand data through {model_name} with advanced reasoning for grid optimization insights", f"Enhanced AI analysis of demand forecasting effectiveness across {total_records} meter readings completed"),
                 ("Demand Forecasting Report Compilation", 100, f"Professional demand forecasting analysis with evidence-based recommendations and actionable grid insights ready", f"Comprehensive demand performance report with {len(available_metrics)} energy metrics analysis and grid optimization recommendations generated")
             ]
@@ -465,7 +2318,7 @@ def generate_insights_with_agent_workflow(data, focus_area, model_name, progress
             prediction_accuracy = abs(avg_predicted_demand * 1000 - avg_peak_demand) / avg_peak_demand if avg_peak_demand > 0 else 0
             
             steps = [
-                ("Demand Optimization Data Preparation", 12, f"Advanced loading of demand forecasting data with enhanced validation across {total_records} records for grid efficiency identification", f"Prepared {unique_meters} active meters, {unique_territories} territories for optimization analysis with {total_outages} outage events"),
+                ("Demand Optimization Data Preparation", 12, f"Advanced loading of demand forecasting data with enhanced validation across {total_records} records for grid efficiency identification", f"Prepared {unique_meters} active meters, {unique_territories} territories for optimization analysis with {total_outages:,.0f} outage events"),
                 ("Grid Performance Inefficiency Detection", 28, f"Sophisticated analysis of demand forecasting strategies and grid performance with evidence-based inefficiency identification", f"Identified optimization opportunities across {unique_territories} service territories with demand and grid management gaps"),
                 ("Energy Consumption Correlation Analysis", 45, f"Enhanced examination of relationships between weather conditions, customer types, and demand performance rates", f"Analyzed correlations between energy characteristics and demand outcomes across {total_records} meter readings"),
                 ("Smart Meter Integration Optimization", 65, f"Comprehensive evaluation of demand forecasting integration with existing Itron, Sensus, and Landis+Gyr smart meter systems", f"Assessed integration opportunities across {len(data.columns)} data points and demand forecasting system optimization needs"),
@@ -480,7 +2333,7 @@ def generate_insights_with_agent_workflow(data, focus_area, model_name, progress
             steps = [
                 ("Demand Financial Data Integration", 15, f"Advanced loading of demand financial data and grid cost metrics with enhanced validation across {total_records} meter readings", f"Integrated demand financial data: {avg_consumption:.1f} kWh avg consumption, {avg_peak_demand:.1f} kW avg peak across {unique_meters} meters"),
                 ("Energy Cost-Benefit Calculation", 30, f"Sophisticated ROI metrics calculation with demand analysis and grid efficiency cost savings", f"Computed comprehensive cost analysis: energy expenses, outage costs, and ${cost_savings:,.0f} estimated demand optimization potential"),
-                ("Grid Efficiency Impact Assessment", 50, f"Enhanced analysis of energy revenue impact with demand metrics and grid correlation analysis", f"Assessed grid implications: {total_outages} total outages with {unique_meters} meters requiring optimization"),
+                ("Grid Efficiency Impact Assessment", 50, f"Enhanced analysis of energy revenue impact with demand metrics and grid correlation analysis", f"Assessed grid implications: {total_outages:,.0f} total outages with {unique_meters} meters requiring optimization"),
                 ("Energy Operations Efficiency Analysis", 70, f"Comprehensive evaluation of operational cost efficiency across demand activities with grid lifecycle cost optimization", f"Analyzed operational efficiency: {unique_territories} service territories with energy cost reduction opportunities identified"),
                 ("AI Demand Financial Modeling", 90, f"Advanced demand forecasting financial projections and ROI calculations using {model_name} with comprehensive energy cost-benefit analysis", f"Enhanced financial impact analysis and forecasting across {len(available_metrics)} energy cost metrics completed"),
                 ("Energy Economics Report Generation", 100, f"Professional demand financial impact analysis with detailed grid ROI calculations and energy cost forecasting ready", f"Comprehensive energy financial report with ${cost_savings:,.0f} cost optimization analysis and demand efficiency strategy generated")
@@ -500,10 +2353,55 @@ def generate_insights_with_agent_workflow(data, focus_area, model_name, progress
                 ("Digital Grid Report Generation", 100, f"Professional digital grid transformation roadmap with competitive analysis and demand technology implementation plan ready for CTO executive review", f"Comprehensive strategic report with {unique_meters}-meter implementation plan and grid competitive advantage analysis generated")
             ]
         
-        # NOW: Animate the progress with pre-calculated results
-        for step_name, progress_percent, details, results in steps:
-            update_progress(step_name, progress_percent, details, results)
-            time.sleep(1.2)
+        data_prep_seconds = time.monotonic() - workflow_started
+
+        # Each displayed step completes when its real pipeline stage does
+        step_stages = AGENT_STAGES if len(steps) == len(AGENT_STAGES) else [stage for stage in AGENT_STAGES if stage != "prompt"]
+        step_for_stage = dict(zip(step_stages, steps))
+        shown_percent = [0]
+
+        def start_stage(stage):
+            if stage in step_for_stage:
+                step_name, _, details, _ = step_for_stage[stage]
+                update_progress(step_name, shown_percent[0], details, None)
+
+        def complete_stage(stage, seconds):
+            if stage in step_for_stage:
+                step_name, progress_percent, _, results = step_for_stage[stage]
+                shown_percent[0] = max(shown_percent[0], progress_percent)
+                update_progress(step_name, shown_percent[0], None, f"{results} ({seconds:.2f}s)")
+
+        complete_stage("data_prep", data_prep_seconds)
+
+        # Stages 2 and 3 are independent: the statistics and correlation summaries run on worker
+        # threads while anomaly detection, which needs the process caches, runs on this thread.
+        # Progress is drawn here, as each stage completes.
+        start_stage("stats")
+        with ThreadPoolExecutor(max_workers=2, thread_name_prefix="agent-stage") as executor:
+            futures = {
+                executor.submit(timed_call, summarize_statistics, metrics): "stats",
+                executor.submit(timed_call, summarize_correlations, metrics): "correlation"
+            }
+            detected, anomaly_seconds = timed_call(get_anomalies, data)
+            anomaly_info = summarize_detected_anomalies(detected)
+            results = {}
+            for future in as_completed(futures):
+                stage = futures[future]
+                results[stage], seconds = future.result()
+                complete_stage(stage, max(seconds, anomaly_seconds) if stage == "stats" else seconds)
+        data_summary, correlation_info = results["stats"], results["correlation"]
+
+        # Stage 4 - prompt build
+        prompt, seconds = timed_call(build_insights_prompt, focus_area, data_summary, correlation_info, anomaly_info)
+        complete_stage("prompt", seconds)
+
+        # Stage 5 - LLM call (streams into the report when on_token is given)
+        start_stage("llm")
+        insights, seconds = timed_call(call_serving_endpoint, prompt, model_name, on_token)
+        if not insights:
+            return insights
+        complete_stage("llm", seconds)
+        complete_stage("report", time.monotonic() - workflow_started)
         
         return insights
         
@@ -512,91 +2410,69 @@ def generate_insights_with_agent_workflow(data, focus_area, model_name, progress
             progress_placeholder.error(f"❌ Enhanced Agent Analysis failed: {str(e)}")
         return f"Enhanced Agent Analysis failed: {str(e)}"
 
-def generate_insights(data, focus_area, model_name):
-    """Generate insights using the selected Databricks model"""
+def ensure_metrics(data, metrics=None):
+    """Metrics snapshot to summarize, computed locally from data when none was passed in"""
+    if metrics is None:
+        metrics = build_metrics_snapshot(
+            data, compute_aggregates_local(data, INSIGHT_NUMERIC_METRICS, INSIGHT_CATEGORICAL_COLUMNS), []
+        )
+    return metrics
+
+def summarize_statistics(metrics):
+    """Data summary section of the prompt: record count, key metric ranges and top categorical values"""
+    aggregates = metrics["aggregates"]
     data_summary = f"Table: {table_name}\n"
     data_summary += f"Description: {table_description}\n"
-    data_summary += f"Records analyzed: {len(data)}\n"
-
-    # Calculate basic statistics for numeric columns only
-    numeric_stats = {}
-    # Define key utilities demand forecasting metrics that should be numeric
-    key_metrics = ["energy_consumption_kwh", "peak_demand_kw", "voltage_level", "power_factor", 
-                   "temperature_fahrenheit", "humidity_percent", "wind_speed_mph", "billing_cycle_day", 
-                   "outage_events", "social_media_sentiment", "customer_complaints", "predicted_demand_mw"]
-    
-    # Filter to only columns that exist and are actually numeric
-    available_metrics = []
-    for col in key_metrics:
-        if col in data.columns:
-            try:
-                # Test if the column is actually numeric by trying to calculate mean
-                test_mean = safe_mean(data[col])
-                if not pd.isna(test_mean):
-                    available_metrics.append(col)
-            except:
-                # Skip columns that can't be converted to numeric
-                continue
+    data_summary += f"Records analyzed: {aggregates['row_count']}\n"
+
+    # Only key metrics that exist and were aggregated as numeric
+    available_metrics = [col for col in INSIGHT_NUMERIC_METRICS if col in aggregates["numeric"]]
     
     for col in available_metrics:
-        try:
-            numeric_data = pd.to_numeric(data[col], errors='coerce').dropna()
-            if not numeric_data.empty:
-                numeric_stats[col] = {
-                    "mean": numeric_data.mean(),
-                    "min": numeric_data.min(),
-                    "max": numeric_data.max(),
-                    "std": numeric_data.std()
-                }
-                data_summary += f"- {col} (avg: {numeric_data.mean():.2f}, min: {numeric_data.min():.2f}, max: {numeric_data.max():.2f})\n"
-        except Exception as e:
-            # Skip columns that cause errors
-            continue
+        stats = aggregates["numeric"][col]
+        if stats["count"] and not pd.isna(stats["mean"]):
+            data_summary += f"- {col} (avg: {stats['mean']:.2f}, min: {stats['min']:.2f}, max: {stats['max']:.2f})\n"
 
     # Get top values for categorical columns
-    categorical_stats = {}
-    categorical_options = ["meter_id", "customer_id", "weather_condition", "customer_type", "service_territory", "rate_schedule"]
-    for cat_col in categorical_options:
-        if cat_col in data.columns:
-            try:
-                top = data[cat_col].value_counts().head(3)
-                categorical_stats[cat_col] = top.to_dict()
-                data_summary += f"\nTop {cat_col} values:\n" + "\n".join(f"- {k}: {v}" for k, v in top.items())
-            except:
-                # Skip columns that cause errors
-                continue
+    for cat_col in INSIGHT_CATEGORICAL_COLUMNS:
+        top = aggregates["top_values"].get(cat_col)
+        if top is not None and not top.empty:
+            top = top.head(3)
+            data_summary += f"\nTop {cat_col} values:\n" + "\n".join(f"- {k}: {v}" for k, v in top.items())
 
-    # Calculate correlations if enough numeric columns available
-    correlation_info = ""
-    if len(available_metrics) >= 2:
-        try:
-            # Create a dataframe with only the numeric columns
-            numeric_df = data[available_metrics].apply(pd.to_numeric, errors='coerce').dropna()
-            
-            if not numeric_df.empty and len(numeric_df) > 1:
-                correlations = numeric_df.corr()
-                
-                # Get the top 3 strongest correlations (absolute value)
-                corr_pairs = []
-                for i in range(len(correlations.columns)):
-                    for j in range(i+1, len(correlations.columns)):
-                        col1 = correlations.columns[i]
-                        col2 = correlations.columns[j]
-                        corr_value = correlations.iloc[i, j]
-                        if not pd.isna(corr_value):
-                            corr_pairs.append((col1, col2, abs(corr_value), corr_value))
-
-                # Sort by absolute correlation value
-                corr_pairs.sort(key=lambda x: x[2], reverse=True)
-
-                # Add top correlations to the summary
-                if corr_pairs:
-                    correlation_info = "Top correlations between utilities demand metrics:\n"
-                    for col1, col2, _, corr_value in corr_pairs[:3]:
-                        correlation_info += f"- {col1} and {col2}: r = {corr_value:.2f}\n"
-        except Exception as e:
-            correlation_info = "Could not calculate correlations between demand metrics.\n"
+    return data_summary
 
+def summarize_correlations(metrics):
+    """Correlation section of the prompt from the top correlations in the metrics snapshot"""
+    available_metrics = [col for col in INSIGHT_NUMERIC_METRICS if col in metrics["aggregates"]["numeric"]]
+    correlation_info = ""
+    corr_pairs = [(col1, col2, corr_value) for col1, col2, corr_value in metrics["top_correlations"]
+                  if col1 in available_metrics and col2 in available_metrics]
+    if corr_pairs:
+        correlation_info = "Top correlations between utilities demand metrics:\n"
+        for col1, col2, corr_value in corr_pairs:
+            correlation_info += f"- {col1} and {col2}: r = {corr_value:.2f}\n"
+    return correlation_info
+
+def summarize_detected_anomalies(detected, examples=3):
+    """Anomaly section of the prompt from get_anomalies(): per-detector counts and the most severe readings"""
+    summary = detected["summary"]
+    if summary.empty:
+        return ""
+    anomaly_info = f"Detected anomalies ({len(detected['anomalies'])} flagged readings out of {detected['readings']}):\n"
+    for row in summary.itertuples(index=False):
+        anomaly_info += (f"- {row.detector}: {row.anomalies} readings across {row.meters} meters "
+                         f"({row.pct_of_readings:.2f}%), worst score {row.worst_score:.1f}; most affected meters: {row.top_meters}\n")
+    worst = detected["anomalies"].head(examples)
+    if not worst.empty:
+        anomaly_info += "Most severe readings:\n" + "\n".join(
+            f"- {row.meter_id} at {row.timestamp}: {row.metric} = {row.value:.2f} (expected {row.expected:.2f}, {row.detector})"
+            for row in worst.itertuples(index=False)
+        ) + "\n"
+    return anomaly_info
+
+def build_insights_prompt(focus_area, data_summary, correlation_info, anomaly_info=""):
+    """Full analyst prompt for a focus area from the data summary, correlation and anomaly sections"""
     # Define specific instructions for each focus area tailored to utilities demand forecasting
     focus_area_instructions = {
         "Overall Performance": """
@@ -679,6 +2555,8 @@ def generate_insights(data, focus_area, model_name):
 
     {correlation_info}
 
+    {anomaly_info}
+
     ANALYSIS INSTRUCTIONS:
     {selected_focus_instructions}
 
@@ -694,20 +2572,120 @@ def generate_insights(data, focus_area, model_name):
     - Frame all insights in the context of utilities demand forecasting and energy management
     '''
 
-    return call_serving_endpoint(prompt, model_name)
+    return prompt
+
+def generate_all_insights(data, model_name, metrics=None, focus_areas=FOCUS_AREAS):
+    """Generate reports for several focus areas concurrently.
+
+    The data summary is built once and the prompts are dispatched together; the endpoint
+    client's semaphore caps in-flight requests per endpoint. Yields
+    (focus_area, insights, error, seconds) as each report finishes.
+    """
+    metrics = ensure_metrics(data, metrics)
+    data_summary = summarize_statistics(metrics)
+    correlation_info = summarize_correlations(metrics)
+    anomaly_info = summarize_detected_anomalies(get_anomalies(data))
+    prompts = {area: build_insights_prompt(area, data_summary, correlation_info, anomaly_info) for area in focus_areas}
+    serving = serving_resources()
+
+    def run(area):
+        started = time.monotonic()
+        try:
+            return area, request_completion(prompts[area], model_name, serving=serving), None, time.monotonic() - started
+        except Exception as e:
+            return area, None, str(e), time.monotonic() - started
+
+    with ThreadPoolExecutor(max_workers=max(1, len(prompts)), thread_name_prefix="focus-area") as executor:
+        futures = [executor.submit(run, area) for area in prompts]
+        for future in as_completed(futures):
+            yield future.result()
+
+def chart_frame(data, required, optional=()):
+    """Only the columns a chart encodes, dropping rows with missing required values only if there are any"""
+    columns = list(required) + [col for col in optional if col in data.columns]
+    frame = data[columns]
+    missing = frame[list(required)].isna().any(axis=1)
+    return frame[~missing] if missing.any() else frame
+
+# Scatter plots with more rows than this are drawn as one point per occupied grid cell
+CHART_MAX_POINTS = 2000
+CHART_GRID_BINS = 40
+
+def histogram_frame(values, maxbins=15):
+    """Equal-width bins of a numeric series: bin_start, bin_end, count"""
+    values = pd.to_numeric(values, errors='coerce').dropna().to_numpy(dtype=np.float64)
+    if values.size == 0:
+        return pd.DataFrame(columns=["bin_start", "bin_end", "count"])
+    counts, edges = np.histogram(values, bins=np.histogram_bin_edges(values, bins=maxbins))
+    return pd.DataFrame({"bin_start": edges[:-1], "bin_end": edges[1:], "count": counts})
+
+def box_stats_frame(frame, group, value):
+    """Per-group quartiles and 1.5 IQR whiskers (the numbers a boxplot draws)"""
+    grouped = frame.groupby(group, observed=True)[value]
+    stats = grouped.quantile([0.25, 0.5, 0.75]).unstack()
+    stats.columns = ["q1", "median", "q3"]
+    iqr = stats["q3"] - stats["q1"]
+    bounds = frame[[group, value]].join(
+        pd.DataFrame({"low": stats["q1"] - 1.5 * iqr, "high": stats["q3"] + 1.5 * iqr}), on=group
+    )
+    inside = bounds[(bounds[value] >= bounds["low"]) & (bounds[value] <= bounds["high"])]
+    whiskers = inside.groupby(group, observed=True)[value].agg(lower="min", upper="max")
+    return stats.join(whiskers).join(grouped.size().rename("count")).reset_index()
+
+def group_summary_frame(frame, group, value=None):
+    """Row count (and mean of value) per group"""
+    grouped = frame.groupby(group, observed=True)
+    if value is None:
+        return grouped.size().rename("count").reset_index()
+    return grouped[value].agg(mean="mean", count="size").reset_index()
+
+def scatter_frame(frame, x, y, color=None, max_points=CHART_MAX_POINTS, bins=CHART_GRID_BINS):
+    """Raw points when there are few; otherwise one point per occupied bins x bins grid cell
+    (and color group) at the cell's mean position, with the number of readings it stands for"""
+    if len(frame) <= max_points:
+        return frame.assign(count=1)
+    cells = {}
+    for axis in (x, y):
+        values = frame[axis].to_numpy(dtype=np.float64)
+        low, high = np.nanmin(values), np.nanmax(values)
+        width = (high - low) / bins or 1.0
+        cells[f"_{axis}_cell"] = np.minimum(((values - low) / width).astype(np.int64), bins - 1)
+    keys = list(cells)
+    if color is not None and not pd.api.types.is_numeric_dtype(frame[color]):
+        keys.append(color)
+    aggregations = {x: (x, "mean"), y: (y, "mean"), "count": (x, "size")}
+    if color is not None and color not in keys:
+        aggregations[color] = (color, "mean")
+    return frame.assign(**cells).groupby(keys, observed=True, sort=False, dropna=False).agg(**aggregations).reset_index().drop(columns=list(cells))
+
+def point_size(points):
+    """Fixed marker size for raw points, sized by readings per cell for grid-binned scatters"""
+    if points["count"].max() <= 1:
+        return alt.value(60)
+    return alt.Size('count:Q', title='Readings', scale=alt.Scale(range=[20, 400]))
+
+def chart_tooltip(frame):
+    """Tooltip fields for every column of a prepared chart frame"""
+    return [f"{col}:{'Q' if pd.api.types.is_numeric_dtype(frame[col]) else 'N'}" for col in frame.columns]
 
 def create_metrics_charts(data):
-    """Create metric visualizations for the utilities demand forecasting data"""
+    """Create metric visualizations for the utilities demand forecasting data.
+
+    Chart data is binned, summarized or grid-downsampled here, so each Vega-Lite spec carries
+    a bounded number of rows however large the dataset is.
+    """
     charts = []
     
     # Energy Consumption Distribution
     if 'energy_consumption_kwh' in data.columns:
-        consumption_data = data.dropna(subset=['energy_consumption_kwh'])
-        if not consumption_data.empty:
-            consumption_chart = alt.Chart(consumption_data).mark_bar().encode(
-                alt.X('energy_consumption_kwh:Q', bin=alt.Bin(maxbins=15), title='Energy Consumption (kWh)'),
-                alt.Y('count()', title='Number of Readings'),
-                color=alt.value('#1f77b4')
+        consumption_bins = histogram_frame(data['energy_consumption_kwh'])
+        if not consumption_bins.empty:
+            consumption_chart = alt.Chart(consumption_bins).mark_bar().encode(
+                alt.X('bin_start:Q', bin='binned', title='Energy Consumption (kWh)'),
+                alt.X2('bin_end:Q'),
+                alt.Y('count:Q', title='Number of Readings'),
+                color=alt.value('#1f77b4'),
+                tooltip=['bin_start:Q', 'bin_end:Q', 'count:Q']
             ).properties(
                 title='Energy Consumption Distribution',
                 width=380,
@@ -717,12 +2695,18 @@ def create_metrics_charts(data):
     
     # Peak Demand by Customer Type
     if 'peak_demand_kw' in data.columns and 'customer_type' in data.columns:
-        demand_data = data.dropna(subset=['peak_demand_kw', 'customer_type'])
+        demand_data = chart_frame(data, ['peak_demand_kw', 'customer_type'])
         if not demand_data.empty:
-            peak_demand_chart = alt.Chart(demand_data).mark_boxplot().encode(
-                alt.X('customer_type:N', title='Customer Type'),
-                alt.Y('peak_demand_kw:Q', title='Peak Demand (kW)'),
-                color=alt.Color('customer_type:N', legend=None)
+            box_stats = box_stats_frame(demand_data, 'customer_type', 'peak_demand_kw')
+            box_base = alt.Chart(box_stats).encode(alt.X('customer_type:N', title='Customer Type'))
+            peak_demand_chart = alt.layer(
+                box_base.mark_rule().encode(alt.Y('lower:Q', title='Peak Demand (kW)'), alt.Y2('upper:Q')),
+                box_base.mark_bar(size=28).encode(
+                    alt.Y('q1:Q'), alt.Y2('q3:Q'),
+                    color=alt.Color('customer_type:N', legend=None),
+                    tooltip=chart_tooltip(box_stats)
+                ),
+                box_base.mark_tick(color='white', size=28).encode(alt.Y('median:Q'))
             ).properties(
                 title='Peak Demand by Customer Type',
                 width=380,
@@ -732,13 +2716,16 @@ def create_metrics_charts(data):
     
     # Weather Impact on Energy Consumption
     if 'temperature_fahrenheit' in data.columns and 'energy_consumption_kwh' in data.columns:
-        weather_data = data.dropna(subset=['temperature_fahrenheit', 'energy_consumption_kwh'])
+        weather_data = chart_frame(data, ['temperature_fahrenheit', 'energy_consumption_kwh'], ['weather_condition', 'customer_type'])
         if not weather_data.empty:
-            weather_chart = alt.Chart(weather_data).mark_point(size=60, opacity=0.7).encode(
+            weather_points = scatter_frame(weather_data, 'temperature_fahrenheit', 'energy_consumption_kwh',
+                                           'weather_condition' if 'weather_condition' in weather_data.columns else None)
+            weather_chart = alt.Chart(weather_points).mark_point(opacity=0.7).encode(
                 alt.X('temperature_fahrenheit:Q', title='Temperature (°F)'),
                 alt.Y('energy_consumption_kwh:Q', title='Energy Consumption (kWh)'),
-                color=alt.Color('weather_condition:N', title='Weather Condition') if 'weather_condition' in weather_data.columns else alt.value('#2ca02c'),
-                tooltip=['temperature_fahrenheit:Q', 'energy_consumption_kwh:Q'] + (['weather_condition:N', 'customer_type:N'] if all(col in weather_data.columns for col in ['weather_condition', 'customer_type']) else [])
+                color=alt.Color('weather_condition:N', title='Weather Condition') if 'weather_condition' in weather_points.columns else alt.value('#2ca02c'),
+                size=point_size(weather_points),
+                tooltip=chart_tooltip(weather_points)
             ).properties(
                 title='Weather Impact on Energy Consumption',
                 width=380,
@@ -748,13 +2735,14 @@ def create_metrics_charts(data):
     
     # Service Territory Distribution
     if 'service_territory' in data.columns:
-        territory_data = data.dropna(subset=['service_territory'])
+        territory_data = chart_frame(data, ['service_territory'])
         if not territory_data.empty:
-            territory_chart = alt.Chart(territory_data).mark_bar().encode(
+            territory_counts = group_summary_frame(territory_data, 'service_territory')
+            territory_chart = alt.Chart(territory_counts).mark_bar().encode(
                 alt.X('service_territory:N', title='Service Territory'),
-                alt.Y('count()', title='Number of Meters'),
+                alt.Y('count:Q', title='Number of Meters'),
                 color=alt.Color('service_territory:N', legend=None),
-                tooltip=['service_territory:N', 'count()']
+                tooltip=['service_territory:N', 'count:Q']
             ).properties(
                 title='Smart Meter Distribution by Territory',
                 width=380,
@@ -764,16 +2752,20 @@ def create_metrics_charts(data):
     
     # Predicted vs Actual Demand Analysis
     if 'predicted_demand_mw' in data.columns and 'peak_demand_kw' in data.columns:
-        demand_comparison_data = data.dropna(subset=['predicted_demand_mw', 'peak_demand_kw']).copy()
+        demand_comparison_data = chart_frame(data, ['predicted_demand_mw', 'peak_demand_kw'], ['customer_type'])
         if not demand_comparison_data.empty:
-            # Convert peak demand from kW to MW for comparison
-            demand_comparison_data['peak_demand_mw'] = demand_comparison_data['peak_demand_kw'] / 1000
+            # Convert peak demand from kW to MW for comparison (adds one column, no full-frame copy)
+            demand_comparison_data = demand_comparison_data.assign(peak_demand_mw=demand_comparison_data['peak_demand_kw'] / 1000)
+            demand_points = scatter_frame(demand_comparison_data[[col for col in demand_comparison_data.columns if col != 'peak_demand_kw']],
+                                          'peak_demand_mw', 'predicted_demand_mw',
+                                          'customer_type' if 'customer_type' in demand_comparison_data.columns else None)
             
-            demand_accuracy_chart = alt.Chart(demand_comparison_data).mark_point(size=60, opacity=0.7).encode(
+            demand_accuracy_chart = alt.Chart(demand_points).mark_point(opacity=0.7).encode(
                 alt.X('peak_demand_mw:Q', title='Actual Peak Demand (MW)'),
                 alt.Y('predicted_demand_mw:Q', title='Predicted Demand (MW)'),
-                color=alt.Color('customer_type:N', title='Customer Type') if 'customer_type' in demand_comparison_data.columns else alt.value('#ff7f0e'),
-                tooltip=['peak_demand_mw:Q', 'predicted_demand_mw:Q'] + (['customer_type:N'] if 'customer_type' in demand_comparison_data.columns else [])
+                color=alt.Color('customer_type:N', title='Customer Type') if 'customer_type' in demand_points.columns else alt.value('#ff7f0e'),
+                size=point_size(demand_points),
+                tooltip=chart_tooltip(demand_points)
             ).properties(
                 title='Demand Prediction Accuracy',
                 width=380,
@@ -783,13 +2775,16 @@ def create_metrics_charts(data):
     
     # Voltage Stability Analysis
     if 'voltage_level' in data.columns and 'power_factor' in data.columns:
-        voltage_data = data.dropna(subset=['voltage_level', 'power_factor'])
+        voltage_data = chart_frame(data, ['voltage_level', 'power_factor'], ['outage_events', 'service_territory'])
         if not voltage_data.empty:
-            voltage_chart = alt.Chart(voltage_data).mark_point(size=60, opacity=0.7).encode(
+            voltage_points = scatter_frame(voltage_data, 'voltage_level', 'power_factor',
+                                           'outage_events' if 'outage_events' in voltage_data.columns else None)
+            voltage_chart = alt.Chart(voltage_points).mark_point(opacity=0.7).encode(
                 alt.X('voltage_level:Q', title='Voltage Level (V)'),
                 alt.Y('power_factor:Q', title='Power Factor'),
-                color=alt.Color('outage_events:Q', title='Outage Events', scale=alt.Scale(scheme='reds')) if 'outage_events' in voltage_data.columns else alt.value('#d62728'),
-                tooltip=['voltage_level:Q', 'power_factor:Q'] + (['outage_events:Q', 'service_territory:N'] if all(col in voltage_data.columns for col in ['outage_events', 'service_territory']) else [])
+                color=alt.Color('outage_events:Q', title='Outage Events', scale=alt.Scale(scheme='reds')) if 'outage_events' in voltage_points.columns else alt.value('#d62728'),
+                size=point_size(voltage_points),
+                tooltip=chart_tooltip(voltage_points)
             ).properties(
                 title='Voltage Stability Analysis',
                 width=380,
@@ -799,13 +2794,16 @@ def create_metrics_charts(data):
     
     # Customer Satisfaction Analysis
     if 'social_media_sentiment' in data.columns and 'customer_complaints' in data.columns:
-        satisfaction_data = data.dropna(subset=['social_media_sentiment', 'customer_complaints'])
+        satisfaction_data = chart_frame(data, ['social_media_sentiment', 'customer_complaints'], ['customer_type'])
         if not satisfaction_data.empty:
-            satisfaction_chart = alt.Chart(satisfaction_data).mark_point(size=60, opacity=0.7).encode(
+            satisfaction_points = scatter_frame(satisfaction_data, 'social_media_sentiment', 'customer_complaints',
+                                                'customer_type' if 'customer_type' in satisfaction_data.columns else None)
+            satisfaction_chart = alt.Chart(satisfaction_points).mark_point(opacity=0.7).encode(
                 alt.X('social_media_sentiment:Q', title='Social Media Sentiment'),
                 alt.Y('customer_complaints:Q', title='Customer Complaints'),
-                color=alt.Color('customer_type:N', title='Customer Type') if 'customer_type' in satisfaction_data.columns else alt.value('#9467bd'),
-                tooltip=['social_media_sentiment:Q', 'customer_complaints:Q'] + (['customer_type:N'] if 'customer_type' in satisfaction_data.columns else [])
+                color=alt.Color('customer_type:N', title='Customer Type') if 'customer_type' in satisfaction_points.columns else alt.value('#9467bd'),
+                size=point_size(satisfaction_points),
+                tooltip=chart_tooltip(satisfaction_points)
             ).properties(
                 title='Customer Satisfaction Analysis',
                 width=380,
@@ -815,13 +2813,14 @@ def create_metrics_charts(data):
     
     # Weather Conditions Impact
     if 'weather_condition' in data.columns and 'energy_consumption_kwh' in data.columns:
-        weather_impact_data = data.dropna(subset=['weather_condition', 'energy_consumption_kwh'])
+        weather_impact_data = chart_frame(data, ['weather_condition', 'energy_consumption_kwh'])
         if not weather_impact_data.empty:
-            weather_impact_chart = alt.Chart(weather_impact_data).mark_bar().encode(
+            weather_means = group_summary_frame(weather_impact_data, 'weather_condition', 'energy_consumption_kwh')
+            weather_impact_chart = alt.Chart(weather_means).mark_bar().encode(
                 alt.X('weather_condition:N', title='Weather Condition'),
-                alt.Y('mean(energy_consumption_kwh):Q', title='Average Energy Consumption (kWh)'),
+                alt.Y('mean:Q', title='Average Energy Consumption (kWh)'),
                 color=alt.Color('weather_condition:N', legend=None),
-                tooltip=['weather_condition:N', 'mean(energy_consumption_kwh):Q']
+                tooltip=['weather_condition:N', 'mean:Q', 'count:Q']
             ).properties(
                 title='Energy Consumption by Weather Condition',
                 width=380,
@@ -831,6 +2830,352 @@ def create_metrics_charts(data):
     
     return charts
 
+# --- Built-in forecasting (see forecasting.py) ---
+FORECAST_RESOLUTIONS = {"Hourly": "1h", "Daily": "1D"}
+
+def get_builtin_forecast(data, target, model, resolution, horizon):
+    """Forecast every meter's series, memoized per data version in the process-wide cache"""
+    freq = FORECAST_RESOLUTIONS[resolution]
+    key = make_cache_key("builtin_forecast", {"target": target, "model": model, "freq": freq, "horizon": horizon}, dataset_version(data))
+    cache = get_query_cache()
+    result = cache.get(key)
+    if result is None:
+        started = time.monotonic()
+        panel = forecasting.build_panel(data, target, freq=freq)
+        if panel.shape[0] and panel.shape[1]:
+            _, predictions = forecasting.forecast_panel(panel, model, horizon)
+            forecast = forecasting.forecast_frame(panel, predictions)
+            # Recent actuals summed over meters, on the same grid, for context in the chart
+            recent = min(panel.shape[1], 3 * horizon)
+            history = pd.DataFrame({"timestamp": panel.times[-recent:], "value": np.nansum(panel.values[:, -recent:], axis=0)})
+        else:
+            forecast = pd.DataFrame(columns=["meter_id", "timestamp", "forecast"])
+            history = pd.DataFrame(columns=["timestamp", "value"])
+        result = {"forecast": forecast, "history": history, "meters": panel.shape[0], "seconds": time.monotonic() - started}
+        cache.put(key, result, get_watermark_state()["value"])
+    return result
+
+@st.cache_data(ttl=WATERMARK_CHECK_SECONDS, show_spinner=False)
+def latest_forecast_run(target, model, level="meter_id"):
+    """Run id of the newest batch_forecast.py run for (level, target, model), re-checked every WATERMARK_CHECK_SECONDS"""
+    result = execute_query(
+        f"SELECT max_by(run_id, generated_at) AS run_id FROM {FORECAST_TABLE} "
+        f"WHERE level = :level AND target = :target AND model = :model",
+        {"level": level, "target": target, "model": model}
+    )
+    return str(result.iloc[0, 0]) if not result.empty and pd.notna(result.iloc[0, 0]) else None
+
+def load_published_forecast(target, model, level="meter_id"):
+    """Latest batch_forecast.py run for a target and model from FORECAST_TABLE (empty if none).
+
+    Cached per run id rather than the source table's watermark, so a newly published run
+    shows up without waiting for the readings table to change.
+    """
+    run_id = latest_forecast_run(target, model, level)
+    if run_id is None:
+        return pd.DataFrame()
+    params = {"level": level, "target": target, "model": model, "run_id": run_id}
+    key = make_cache_key("published_forecast", params)
+    cache = get_query_cache()
+    published = cache.get(key)
+    if published is None:
+        published = execute_query(
+            f"SELECT key AS meter_id, timestamp, forecast, model, generated_at FROM {FORECAST_TABLE} "
+            f"WHERE level = :level AND target = :target AND model = :model AND run_id = :run_id",
+            params
+        )
+        if not published.empty:
+            cache.put(key, published, get_watermark_state()["value"])
+    return published
+
+# --- Forecast accuracy (predicted_demand_mw vs actual peak demand, by window and slice) ---
+ACCURACY_WINDOWS = {"Hourly": "1h", "Daily": "1D", "Weekly": "7D"}
+
+def accuracy_frame(data):
+    """Actual (peak_demand_kw in MW) and forecast (predicted_demand_mw) per reading, with its slices"""
+    slices = [col for col in forecasting.ACCURACY_DIMENSIONS if col in data.columns]
+    return pd.DataFrame({
+        "timestamp": data["timestamp"],
+        "actual": data["peak_demand_kw"].astype("float64") / 1000,
+        "forecast": data["predicted_demand_mw"].astype("float64"),
+        **{col: data[col] for col in slices}
+    }).dropna(subset=["timestamp"])
+
+def changed_windows(window_starts, synced, previous):
+    """Windows to recompute after the data changed, or None when everything must be rebuilt.
+
+    Only incremental loads are diffed: a window is touched when it holds a re-synced row or its
+    row count changed; returns (touched, emptied) where emptied windows lost every row.
+    """
+    if previous is None or DATA_LOAD_MODE != "incremental" or synced is None or previous["synced"] is None:
+        return None
+    row_counts = window_starts.value_counts()
+    resynced = set(window_starts[(synced > previous["synced"]).to_numpy()])
+    recounted = set(row_counts.index[row_counts.ne(previous["row_counts"].reindex(row_counts.index))])
+    emptied = set(previous["row_counts"].index.difference(row_counts.index))
+    return resynced | recounted | emptied, emptied
+
+def window_state(window_starts, synced):
+    """What changed_windows needs to diff the next load against this one"""
+    return {"row_counts": window_starts.value_counts(),
+            "synced": synced.max() if synced is not None and not synced.empty else None}
+
+@st.cache_resource
+def get_accuracy_registry():
+    """Process-wide accuracy trackers, one per window size"""
+    return {"trackers": {}, "lock": threading.Lock()}
+
+def get_accuracy_tracker(data, window):
+    """Accuracy tracker for the current data version, never changed once returned.
+
+    With incremental loading only the windows holding re-synced rows or a changed row count
+    are recomputed; otherwise the sums are rebuilt from the loaded data.
+    """
+    registry = get_accuracy_registry()
+    version = dataset_version(data)
+    with registry["lock"]:
+        entry = registry["trackers"].get(window)
+        if entry is not None and entry["version"] == version:
+            return entry["tracker"]
+        frame = accuracy_frame(data)
+        window_starts = pd.to_datetime(frame["timestamp"]).dt.floor(pd.Timedelta(window))
+        synced = data.loc[frame.index, "_fivetran_synced"] if "_fivetran_synced" in data.columns else None
+        changes = changed_windows(window_starts, synced, entry)
+        if changes is None:
+            tracker = forecasting.AccuracyTracker(window).update(frame)
+        else:
+            touched, emptied = changes
+            tracker = entry["tracker"]
+            if touched:
+                # Other sessions may be reading the published tracker, so update a copy and publish
+                # that; windows that lost every row (e.g. to tombstones) drop out entirely
+                tracker = tracker.copy().replace_windows(frame[window_starts.isin(touched).to_numpy()], removed=emptied)
+        registry["trackers"][window] = {"tracker": tracker, "version": version, **window_state(window_starts, synced)}
+        return tracker
+
+# --- Peak demand index (coincident system and per-territory peaks) ---
+PEAK_INTERVAL = "1h"
+
+@st.cache_resource
+def get_peak_registry():
+    """Process-wide peak index, maintained across data versions"""
+    return {"entry": None, "lock": threading.Lock()}
+
+def get_peak_index(data):
+    """Peak index for the current data version, never changed once returned; incremental loads
+    only recompute changed intervals"""
+    registry = get_peak_registry()
+    version = dataset_version(data)
+    with registry["lock"]:
+        entry = registry["entry"]
+        if entry is not None and entry["version"] == version:
+            return entry["index"]
+        frame = data.dropna(subset=["timestamp"])
+        interval_starts = pd.to_datetime(frame["timestamp"]).dt.floor(pd.Timedelta(PEAK_INTERVAL))
+        synced = frame["_fivetran_synced"] if "_fivetran_synced" in frame.columns else None
+        changes = changed_windows(interval_starts, synced, entry)
+        if changes is None:
+            index = peaks.PeakIndex(PEAK_INTERVAL).rebuild(frame)
+        else:
+            touched, emptied = changes
+            index = entry["index"]
+            if touched:
+                # Other sessions may be reading the published index, so update a copy and publish that
+                index = index.copy().replace_intervals(frame[interval_starts.isin(touched).to_numpy()], removed=emptied)
+        registry["entry"] = {"index": index, "version": version, **window_state(interval_starts, synced)}
+        return index
+
+# --- Anomaly detection (see anomalies.py) ---
+ANOMALY_INPUT_COLUMNS = ["meter_id", "timestamp", "energy_consumption_kwh", "voltage_level", "power_factor",
+                         "outage_events", "service_territory", "customer_type"]
+
+def detect_table_anomalies(columns):
+    """Stream the full table ordered by meter through the batched detectors; (anomalies, readings)"""
+    query = (
+        f"SELECT {', '.join(quote_identifier(col) for col in columns)} FROM {table_name} "
+        f"WHERE coalesce(`_fivetran_deleted`, false) = false ORDER BY `meter_id`, `timestamp`"
+    )
+    batches = (batch.rename(columns=str.lower) for batch in iter_query_batches(query))
+    detected, readings = anomalies.detect_anomalies_in_batches(batches)
+    if not readings:
+        # No connection or an empty scan: not a result worth caching for the whole table
+        raise RuntimeError("the table scan returned no readings")
+    return detected, readings
+
+def get_anomalies(data):
+    """Anomaly table and per-detector summary, memoized in the process-wide cache.
+
+    Scores the full table (per table watermark) unless ANOMALY_SCOPE=loaded or the session is
+    still showing the local snapshot; then, or if the table scan fails, the loaded readings
+    are scored (per data version).
+    """
+    columns = [col for col in ANOMALY_INPUT_COLUMNS if col in data.columns]
+    full_table = (ANOMALY_SCOPE == "table" and DATABRICKS_HOST and UC_TABLE
+                  and not st.session_state.get("serving_snapshot", False))
+    cache = get_query_cache()
+    if full_table:
+        # A full scan is expensive, so share the result across sessions until the watermark moves
+        watermark = get_table_watermark()
+        key = make_cache_key("anomalies", {"columns": columns, "scope": "table"}, watermark)
+        result = cache.get(key)
+        if result is not None:
+            return result
+        started = time.monotonic()
+        try:
+            detected, readings = detect_table_anomalies(columns)
+        except Exception as e:
+            st.warning(f"Full-table anomaly scan failed, scoring the loaded readings instead: {str(e)}")
+        else:
+            result = {
+                "anomalies": detected,
+                "summary": anomalies.summarize_anomalies(detected, readings),
+                "readings": readings,
+                "scope": "table",
+                "seconds": time.monotonic() - started
+            }
+            cache.put(key, result, watermark)
+            return result
+
+    key = make_cache_key("anomalies", {"columns": columns, "scope": "loaded"}, dataset_version(data))
+    result = cache.get(key)
+    if result is None:
+        started = time.monotonic()
+        detected = anomalies.detect_anomalies(data)
+        result = {
+            "anomalies": detected,
+            "summary": anomalies.summarize_anomalies(detected, len(data)),
+            "readings": len(data),
+            "scope": "loaded",
+            "seconds": time.monotonic() - started
+        }
+        cache.put(key, result, get_watermark_state()["value"])
+    return result
+
+# --- Data Explorer (server-side keyset pagination, queries built in explorer.py) ---
+# Page changes rerun only the explorer, not the whole script (st.fragment needs Streamlit 1.37+)
+explorer_fragment = getattr(st, "fragment", None) or (lambda func: func)
+FRAGMENT_RERUN = {"scope": "fragment"} if hasattr(st, "fragment") else {}
+
+def build_explorer_query(sort_column, descending, filters, cursor, page_size):
+    """explorer.build_page_query against this table and its Unity Catalog column types"""
+    return explorer.build_page_query(table_name, get_table_schema(), sort_column, descending, filters, cursor, page_size)
+
+def fetch_page_rows(pool, query, params):
+    """Raw rows of a page query on a pooled connection. Makes no st.* calls and lets errors
+    propagate, so it can run on a prefetch thread; the caller passes the pool in."""
+    with pool.connection(factory=open_connection) as connection:
+        with connection.cursor() as cursor:
+            cursor.execute(query, params)
+            return fetch_dataframe(cursor)
+
+def finish_explorer_page(raw, order_columns):
+    """Typed page and the cursor after its last row (or None) from raw page rows, on the script thread"""
+    if raw.empty:
+        return raw, None
+    raw.columns = [col.lower() for col in raw.columns]
+    # The cursor comes from the raw values so compact display dtypes never shift the keyset boundary
+    cursor = tuple(None if pd.isna(value) else value for value in raw.iloc[-1][order_columns])
+    return prepare_loaded_data(raw.copy()), cursor
+
+@st.cache_resource
+def get_prefetch_executor():
+    """Background workers that fetch the next explorer page while the current one is on screen"""
+    return ThreadPoolExecutor(max_workers=2, thread_name_prefix="explorer-prefetch")
+
+@explorer_fragment
+def render_data_explorer(columns):
+    """Keyset-paginated, filterable and sortable view of the full table"""
+    if st.session_state.get("serving_snapshot"):
+        st.info("The Data Explorer opens once the app has refreshed from Databricks.")
+        return
+    # st.tabs runs every tab body on every script run, so nothing is queried until the user opens it
+    if not st.session_state.get("explorer_open"):
+        if not st.button("Browse the table", type="primary"):
+            return
+        st.session_state.explorer_open = True
+    col1, col2, col3 = st.columns([2, 1, 1])
+    sort_options = [col for col in columns if col not in ("_fivetran_deleted",)]
+    sort_column = col1.selectbox(
+        "Sort by", sort_options,
+        index=sort_options.index("timestamp") if "timestamp" in sort_options else 0
+    )
+    descending = col2.toggle("Descending", value=False)
+    rows_per_page = col3.selectbox("Rows per page", [10, 25, 50, 100], index=0)
+
+    filters = []
+    with st.expander("Filters", expanded=False):
+        for i in range(2):
+            fcol1, fcol2, fcol3 = st.columns([2, 1, 2])
+            column = fcol1.selectbox("Column", ["(none)"] + list(columns), key=f"explorer_filter_column_{i}")
+            operator = fcol2.selectbox("Operator", list(explorer.FILTER_OPERATORS), key=f"explorer_filter_op_{i}")
+            value = fcol3.text_input("Value", key=f"explorer_filter_value_{i}")
+            if column != "(none)" and value.strip():
+                filters.append((column, operator, value.strip()))
+
+    # Any change in sort, filters or page size starts browsing from the first page again
+    signature = (sort_column, descending, tuple(filters), rows_per_page)
+    state = st.session_state.setdefault("explorer_state", {"signature": None})
+    if state["signature"] != signature:
+        state.update({"signature": signature, "cursors": [None], "page": 0})
+        st.session_state.explorer_prefetch = {}
+
+    watermark = get_table_watermark()
+    page_cache = QueryResultCache(
+        max_entries=EXPLORER_PAGE_CACHE_PAGES, ttl=QUERY_CACHE_TTL_SECONDS, store=st.session_state.explorer_pages
+    )
+    prefetch = st.session_state.setdefault("explorer_prefetch", {})
+
+    def load_page(cursor):
+        query, params, order_columns = build_explorer_query(sort_column, descending, filters, cursor, rows_per_page)
+        key = make_cache_key(query, params, watermark, "explorer")
+        page = page_cache.get(key)
+        if page is None:
+            raw = None
+            future = prefetch.pop(key, None)
+            if future is not None:
+                try:
+                    raw = future.result()
+                except Exception:
+                    raw = None  # Refetch in the foreground, which retries and reports the error
+            if raw is None:
+                raw = execute_query(query, params)
+            page = finish_explorer_page(raw, order_columns)
+            page_cache.put(key, page, watermark)
+        return page
+
+    def start_prefetch(cursor):
+        query, params, _ = build_explorer_query(sort_column, descending, filters, cursor, rows_per_page)
+        key = make_cache_key(query, params, watermark, "explorer")
+        if key not in prefetch and page_cache.get(key) is None:
+            prefetch[key] = get_prefetch_executor().submit(fetch_page_rows, get_connection_pool(), query, params)
+
+    page_number = state["page"]
+    frame, next_cursor = load_page(state["cursors"][page_number])
+
+    nav1, nav2, nav3, nav4 = st.columns([1, 1, 1, 3])
+    if nav1.button("⏮ First", disabled=page_number == 0):
+        state["page"] = 0
+        st.rerun(**FRAGMENT_RERUN)
+    if nav2.button("◀ Prev", disabled=page_number == 0):
+        state["page"] -= 1
+        st.rerun(**FRAGMENT_RERUN)
+    has_next = next_cursor is not None and len(frame) == rows_per_page
+    if nav3.button("Next ▶", disabled=not has_next):
+        del state["cursors"][page_number + 1:]
+        state["cursors"].append(next_cursor)
+        state["page"] += 1
+        st.rerun(**FRAGMENT_RERUN)
+
+    if frame.empty:
+        st.info("No rows match the current filters.")
+        return
+    st.dataframe(frame, use_container_width=True)
+    first_row = page_number * rows_per_page + 1
+    nav4.caption(f"Page {page_number + 1} · rows {first_row:,}–{first_row + len(frame) - 1:,} · sorted by {sort_column}")
+
+    if has_next:
+        start_prefetch(next_cursor)
+
 # Load data with error handling
 try:
     data = load_data()
@@ -841,25 +3186,44 @@ except Exception as e:
     st.error(f"Error loading data: {str(e)}")
     st.stop()
 
+@(st.fragment(run_every=SNAPSHOT_POLL_SECONDS) if hasattr(st, "fragment") else (lambda func: func))
+def render_snapshot_status():
+    """Snapshot caption that keeps polling, so every session serving the snapshot reruns once
+    any session has reconciled; retries run only after the page has painted"""
+    if st.session_state.get("snapshot_painted") and reconcile_snapshot():
+        st.rerun()
+    snapshot_meta = get_snapshot_state()["meta"] or {}
+    st.caption(
+        f"⚡ Showing local snapshot from {snapshot_meta.get('written_at', 'unknown')} "
+        f"(synced through {snapshot_meta.get('watermark') or 'unknown'}); refreshing from Databricks…"
+    )
+
+serving_snapshot = st.session_state.get("serving_snapshot", False)
+st.session_state.snapshot_painted = False
+if serving_snapshot:
+    render_snapshot_status()
+
 # Identify column types based on actual data
 categorical_cols = [col for col in ["meter_id", "customer_id", "weather_condition", "customer_type", "service_territory", "rate_schedule"] if col in data.columns]
 numeric_cols = [col for col in ["energy_consumption_kwh", "peak_demand_kw", "voltage_level", "power_factor", "temperature_fahrenheit", "humidity_percent", "wind_speed_mph", "billing_cycle_day", "outage_events", "social_media_sentiment", "customer_complaints", "predicted_demand_mw"] if col in data.columns]
 date_cols = [col for col in ["timestamp", "_fivetran_synced"] if col in data.columns]
 
 sample_cols = data.columns.tolist()
-numeric_candidates = [col for col in sample_cols if data[col].dtype in ['float64', 'int64'] and 'id' not in col.lower()]
+numeric_candidates = [col for col in sample_cols if pd.api.types.is_numeric_dtype(data[col]) and not pd.api.types.is_bool_dtype(data[col]) and 'id' not in col.lower()]
 date_candidates = [col for col in sample_cols if 'date' in col.lower() or 'timestamp' in col.lower()]
-cat_candidates = [col for col in sample_cols if data[col].dtype == 'object' and data[col].nunique() < 1000]
+cat_candidates = [col for col in sample_cols if (data[col].dtype == 'object' or isinstance(data[col].dtype, pd.CategoricalDtype)) and data[col].nunique() < 1000]
+
+# Metrics snapshot over the full table (pushed down to Databricks, pandas fallback offline),
+# computed once per data version and read by every tab.
+# While serving a disk snapshot the warehouse may still be starting, so stay local until reconciled.
+metrics = get_metrics_snapshot(
+    data, numeric_cols + numeric_candidates, categorical_cols, numeric_candidates, local_only=serving_snapshot
+)
+aggregates = metrics["aggregates"]
+kpis = metrics["kpis"]
 
 # Calculate key variables that will be used throughout the application
-if 'predicted_demand_mw' in data.columns and 'peak_demand_kw' in data.columns:
-    # Calculate forecast efficiency as prediction accuracy percentage
-    actual_demand_mw = data['peak_demand_kw'] / 1000
-    predicted_demand_mw = data['predicted_demand_mw']
-    mape = (abs(predicted_demand_mw - actual_demand_mw) / actual_demand_mw * 100).mean()
-    forecast_efficiency = 100 - mape  # Higher is better
-else:
-    forecast_efficiency = 85.0  # Default assumption
+forecast_efficiency = metrics["forecast_efficiency"]
 
 # Four tabs - Metrics first, then AI Insights
 tabs = st.tabs(["📊 Metrics", "✨ AI Insights", "📁 Insights History", "🔍 Data Explorer"])
@@ -873,27 +3237,27 @@ with tabs[0]:
     
     with col1:
         if 'energy_consumption_kwh' in data.columns:
-            avg_consumption = safe_mean(data['energy_consumption_kwh'])
-            total_consumption = safe_sum(data['energy_consumption_kwh'])
+            avg_consumption = kpis["avg_consumption"]
+            total_consumption = kpis["total_consumption"]
             st.metric("Avg Energy Consumption", f"{avg_consumption:.1f} kWh", delta=f"Total: {total_consumption:,.0f} kWh")
     
     with col2:
         if 'peak_demand_kw' in data.columns:
-            avg_peak = safe_mean(data['peak_demand_kw'])
-            max_peak = data['peak_demand_kw'].max() if not data['peak_demand_kw'].empty else 0
+            avg_peak = kpis["avg_peak"]
+            max_peak = kpis["max_peak"]
             st.metric("Avg Peak Demand", f"{avg_peak:.1f} kW", delta=f"Max: {max_peak:.1f} kW")
     
     with col3:
         if 'predicted_demand_mw' in data.columns:
-            avg_predicted = safe_mean(data['predicted_demand_mw'])
-            prediction_std = data['predicted_demand_mw'].std() if not data['predicted_demand_mw'].empty else 0
+            avg_predicted = kpis["avg_predicted"]
+            prediction_std = kpis["prediction_std"]
             st.metric("Avg Predicted Demand", f"{avg_predicted:.1f} MW", delta=f"±{prediction_std:.1f} MW std")
     
     with col4:
         if 'outage_events' in data.columns:
-            total_outages = safe_sum(data['outage_events'])
-            avg_outages = safe_mean(data['outage_events'])
-            st.metric("Total Outage Events", f"{total_outages:,}", delta=f"Avg: {avg_outages:.1f} per meter")
+            total_outages = kpis["total_outages"]
+            avg_outages = kpis["avg_outages"]
+            st.metric("Total Outage Events", f"{total_outages:,.0f}", delta=f"Avg: {avg_outages:.1f} per meter")
     
     st.markdown("---")
     
@@ -939,18 +3303,171 @@ with tabs[0]:
         st.caption(f"Displaying {num_charts} performance charts")
     else:
         st.info("No suitable data found for creating visualizations.")
+
+    # Accuracy of the table's predicted_demand_mw over time, overall and per slice
+    if {'timestamp', 'predicted_demand_mw', 'peak_demand_kw'} <= set(data.columns):
+        with st.expander("🎯 Forecast Accuracy Over Time", expanded=False):
+            acol1, acol2, acol3 = st.columns(3)
+            accuracy_window = acol1.selectbox("Window", list(ACCURACY_WINDOWS), index=1)
+            accuracy_slice = acol2.selectbox(
+                "Slice by", ["overall"] + [col for col in forecasting.ACCURACY_DIMENSIONS if col in data.columns]
+            )
+            rolling_windows = acol3.slider("Rolling windows", 1, 14, 1)
+            tracker = get_accuracy_tracker(data, ACCURACY_WINDOWS[accuracy_window])
+            accuracy = tracker.metrics(accuracy_slice, rolling_windows)
+            if accuracy.empty:
+                st.info("No readings with both an actual and a predicted demand yet.")
+            else:
+                if accuracy_slice == "overall":
+                    drift = accuracy.melt("window_start", ["mape_pct", "smape_pct"], "metric", "value")
+                else:
+                    # Chart the five busiest slices; the table below covers all of them
+                    busiest = accuracy.groupby(accuracy_slice, observed=True)["n"].sum().nlargest(5).index
+                    drift = accuracy[accuracy[accuracy_slice].isin(busiest)].rename(columns={"mape_pct": "value"})
+                    drift = drift.assign(metric=drift[accuracy_slice].astype(str))
+                st.altair_chart(alt.Chart(drift).mark_line(point=True).encode(
+                    alt.X('window_start:T', title='Window'),
+                    alt.Y('value:Q', title='Error (%)'),
+                    color=alt.Color('metric:N', title=None),
+                    tooltip=['window_start:T', 'metric:N', 'value:Q']
+                ).properties(height=300), use_container_width=True)
+                if accuracy_slice == "overall":
+                    latest = accuracy.sort_values("window_start", ascending=False)
+                else:
+                    latest = accuracy.sort_values("window_start").groupby(accuracy_slice, observed=True).tail(1).sort_values("n", ascending=False)
+                st.dataframe(latest.head(50), use_container_width=True)
+                st.caption(
+                    ("Most recent windows" if accuracy_slice == "overall" else f"Latest {accuracy_window.lower()} window per slice")
+                    + (f", summed over the last {rolling_windows} windows" if rolling_windows > 1 else "")
+                    + ". Readings with a zero actual peak are excluded from MAPE and counted in zero_actuals."
+                )
+
+    # Coincident (system-wide) and per-territory peak hours from a maintained sorted index
+    if {'timestamp', 'peak_demand_kw'} <= set(data.columns):
+        with st.expander("⚡ Peak Demand Index", expanded=False):
+            peak_index = get_peak_index(data)
+            if peak_index.loads.empty:
+                st.info("No peak demand readings yet.")
+            else:
+                pcol1, pcol2, pcol3 = st.columns(3)
+                peak_scope = pcol1.selectbox("Scope", peak_index.scopes())
+                peak_month = pcol2.selectbox(
+                    "Month", [None] + peak_index.months(),
+                    format_func=lambda month: "All time" if month is None else f"{month // 100}-{month % 100:02d}"
+                )
+                peak_n = pcol3.slider("Top N intervals", 5, 200, 50, step=5)
+                started = time.perf_counter()
+                top_intervals = peak_index.top_peaks(peak_n, peak_scope, peak_month)
+                lookup_ms = (time.perf_counter() - started) * 1000
+                st.altair_chart(alt.Chart(top_intervals).mark_bar().encode(
+                    alt.X('rank:O', title='Rank'),
+                    alt.Y('load_kw:Q', title='Summed peak demand (kW)'),
+                    tooltip=['rank:O', 'interval_start:T', 'load_kw:Q']
+                ).properties(height=280), use_container_width=True)
+                st.dataframe(top_intervals, use_container_width=True)
+                st.caption(
+                    f"{peak_scope} · {PEAK_INTERVAL} intervals · looked up in {lookup_ms:.1f} ms from "
+                    f"{len(peak_index.buckets):,} sorted month buckets"
+                )
+                events = peak_index.peak_events(peak_scope)
+                st.markdown(f"**Peak events** (consecutive intervals at or above the {peaks.EVENT_QUANTILE:.0%} load quantile)")
+                st.dataframe(events.head(50), use_container_width=True)
+
+    # Outages, voltage sags, poor power factor and consumption spikes, scored against each meter's own history
+    if {'meter_id', 'timestamp'} <= set(data.columns):
+        with st.expander("🚨 Meter Anomalies", expanded=False):
+            detected = get_anomalies(data)
+            flagged = detected["anomalies"]
+            if flagged.empty:
+                st.info("No anomalies detected in the full table." if detected["scope"] == "table"
+                        else "No anomalies detected in the loaded readings.")
+            else:
+                st.dataframe(detected["summary"], use_container_width=True)
+                anomaly_detector = st.selectbox("Detector", ["All"] + list(detected["summary"]["detector"]))
+                if anomaly_detector != "All":
+                    flagged = flagged[flagged["detector"] == anomaly_detector]
+                daily = (flagged.assign(day=pd.to_datetime(flagged["timestamp"]).dt.floor("1D"))
+                         .groupby(["day", "detector"], observed=True).size().reset_index(name="anomalies"))
+                st.altair_chart(alt.Chart(daily).mark_bar().encode(
+                    alt.X('day:T', title='Day'),
+                    alt.Y('anomalies:Q', title='Flagged readings', stack=True),
+                    color=alt.Color('detector:N', title=None),
+                    tooltip=['day:T', 'detector:N', 'anomalies:Q']
+                ).properties(height=260), use_container_width=True)
+                st.dataframe(flagged.head(500), use_container_width=True)
+                st.caption(
+                    f"{len(detected['anomalies']):,} flagged readings out of {detected['readings']:,} "
+                    f"({'full table' if detected['scope'] == 'table' else 'loaded readings'}) · "
+                    f"scored in {detected['seconds']:.2f}s · showing the {min(len(flagged), 500)} most severe"
+                    + ("" if anomaly_detector == "All" else f" {anomaly_detector} readings")
+                    + ". Scores are z-scores (rolling or median/MAD) against the meter's own readings."
+                )
+
+    # Built-in forecast from the meter time series (independent of the table's predicted_demand_mw)
+    if {'meter_id', 'timestamp'} <= set(data.columns):
+        with st.expander("🔮 Built-in Demand Forecast", expanded=False):
+            fcol1, fcol2, fcol3, fcol4 = st.columns(4)
+            forecast_target = fcol1.selectbox(
+                "Series", [col for col in ['energy_consumption_kwh', 'peak_demand_kw'] if col in data.columns]
+            )
+            forecast_model = fcol2.selectbox("Model", list(forecasting.FORECAST_MODELS), index=2)
+            forecast_resolution = fcol3.selectbox("Resolution", list(FORECAST_RESOLUTIONS))
+            forecast_horizon = fcol4.number_input("Horizon (steps)", min_value=1, max_value=168, value=24)
+            if forecast_target and st.button("Run Forecast"):
+                with st.spinner("Forecasting every meter..."):
+                    forecast = get_builtin_forecast(data, forecast_target, forecast_model, forecast_resolution, int(forecast_horizon))
+                if forecast["forecast"].empty:
+                    st.info("Not enough meter history to forecast.")
+                else:
+                    history = forecast["history"]
+                    totals = pd.concat([
+                        history.assign(series="Actual (all meters)"),
+                        forecast["forecast"].groupby("timestamp", as_index=False)["forecast"].sum()
+                        .rename(columns={"forecast": "value"}).assign(series="Forecast (all meters)")
+                    ])
+                    st.altair_chart(alt.Chart(totals).mark_line().encode(
+                        alt.X('timestamp:T', title='Time'),
+                        alt.Y('value:Q', title=forecast_target),
+                        color=alt.Color('series:N', title=None),
+                        tooltip=['timestamp:T', 'series:N', 'value:Q']
+                    ).properties(height=320), use_container_width=True)
+                    st.caption(
+                        f"{forecast['meters']:,} meters · fit + predict {forecast['seconds']:.2f}s "
+                        f"({forecast['seconds'] / max(forecast['meters'], 1) * 1e6:,.0f} µs per meter)"
+                    )
+                    st.download_button(
+                        "📥 Download Meter Forecasts", forecast["forecast"].to_csv(index=False),
+                        file_name=f"{forecast_target}_{forecast_model}_forecast.csv", mime="text/csv"
+                    )
+            if FORECAST_TABLE and forecast_target:
+                published = load_published_forecast(forecast_target, forecast_model)
+                if published.empty:
+                    st.caption(
+                        f"No {forecast_model} batch forecast published to {FORECAST_TABLE} yet "
+                        f"(run batch_forecast.py --model {forecast_model})."
+                    )
+                else:
+                    st.markdown("**Published batch forecast (all meters)**")
+                    published_totals = published.groupby("timestamp", as_index=False)["forecast"].sum()
+                    st.altair_chart(alt.Chart(published_totals).mark_line().encode(
+                        alt.X('timestamp:T', title='Time'),
+                        alt.Y('forecast:Q', title=forecast_target),
+                        tooltip=['timestamp:T', 'forecast:Q']
+                    ).properties(height=240), use_container_width=True)
+                    st.caption(
+                        f"{published['meter_id'].nunique():,} meters · model {published['model'].iloc[0]} · "
+                        f"generated {published['generated_at'].max()}"
+                    )
     
     # Enhanced Summary statistics table
     st.subheader("📈 Summary Statistics")
+    st.caption(
+        f"Computed over {metrics['row_count']:,} records "
+        f"({AGGREGATION_SOURCE_LABELS.get(aggregates['source'], aggregates['source'])})"
+    )
     if numeric_candidates:
-        # Create enhanced summary statistics
-        summary_stats = data[numeric_candidates].describe()
-        
-        # Transpose for better readability and add formatting
-        summary_df = summary_stats.T.round(3)
-        
-        # Add meaningful column names and formatting
-        summary_df.columns = ['Count', 'Mean', 'Std Dev', 'Min', '25%', '50% (Median)', '75%', 'Max']
+        # Enhanced summary statistics (one row per metric) from the metrics snapshot
+        summary_df = metrics["summary_df"]
         
         # Create two columns for better organization
         col1, col2 = st.columns(2)
@@ -1024,9 +3541,9 @@ with tabs[0]:
                     insights.append(f"• **⚠️ Low Power Factor**: {pf_mean:.3f}")
             
             if 'outage_events' in summary_df.index:
-                outage_total = safe_sum(data['outage_events'])
+                outage_total = kpis["total_outages"]
                 outage_median = summary_df.loc['outage_events', '50% (Median)']
-                insights.append(f"• **Total Outages**: {outage_total:,} events")
+                insights.append(f"• **Total Outages**: {outage_total:,.0f} events")
                 insights.append(f"• **Median Outages per Meter**: {outage_median:.1f}")
             
             if 'social_media_sentiment' in summary_df.index:
@@ -1040,34 +3557,29 @@ with tabs[0]:
             
             # Add categorical insights
             if 'customer_type' in data.columns:
-                type_distribution = data['customer_type'].value_counts()
+                type_distribution = aggregates["top_values"].get('customer_type', pd.Series(dtype='int64'))
                 if not type_distribution.empty:
                     top_type = type_distribution.index[0]
                     top_count = type_distribution.iloc[0]
                     insights.append(f"• **Top Customer Type**: {top_type} ({top_count} meters)")
             
             if 'weather_condition' in data.columns:
-                weather_distribution = data['weather_condition'].value_counts()
+                weather_distribution = aggregates["top_values"].get('weather_condition', pd.Series(dtype='int64'))
                 if not weather_distribution.empty:
                     top_weather = weather_distribution.index[0]
                     top_weather_count = weather_distribution.iloc[0]
                     insights.append(f"• **Most Common Weather**: {top_weather} ({top_weather_count} readings)")
             
             if 'service_territory' in data.columns:
-                territory_distribution = data['service_territory'].value_counts()
+                territory_distribution = aggregates["top_values"].get('service_territory', pd.Series(dtype='int64'))
                 if not territory_distribution.empty:
                     top_territory = territory_distribution.index[0]
                     insights.append(f"• **Largest Service Territory**: {top_territory}")
             
-            # Calculate demand prediction accuracy if possible
-            if 'predicted_demand_mw' in data.columns and 'peak_demand_kw' in data.columns:
-                # Convert peak demand to MW for comparison
-                actual_demand_mw = data['peak_demand_kw'] / 1000
-                predicted_demand_mw = data['predicted_demand_mw']
-                
-                # Calculate mean absolute percentage error (MAPE)
-                mape = (abs(predicted_demand_mw - actual_demand_mw) / actual_demand_mw * 100).mean()
-                insights.append(f"• **Prediction Accuracy (MAPE)**: {mape:.1f}%")
+            # Demand prediction accuracy (MAPE) from the metrics snapshot, if available
+            if metrics["mape"] is not None:
+                scope = "" if metrics.get("mape_source", "local") != "local" else f" (from the {len(data):,} loaded readings)"
+                insights.append(f"• **Prediction Accuracy (MAPE)**: {metrics['mape']:.1f}%{scope}")
             
             for insight in insights:
                 st.markdown(insight)
@@ -1093,12 +3605,7 @@ with tabs[1]:
     st.subheader("✨ AI-Powered Demand Forecasting with Agent Workflows")
     st.markdown("**Experience behind-the-scenes AI agent processing for each demand forecasting analysis focus area**")
     
-    focus_area = st.radio("Focus Area", [
-        "Overall Performance", 
-        "Optimization Opportunities", 
-        "Financial Impact", 
-        "Strategic Recommendations"
-    ])
+    focus_area = st.radio("Focus Area", FOCUS_AREAS)
     
     # Show business challenge and solution
     focus_info = get_focus_area_info(focus_area)
@@ -1117,20 +3624,26 @@ with tabs[1]:
     agent_running_key = f"{focus_area}_agent_running"
     if agent_running_key not in st.session_state:
         st.session_state[agent_running_key] = False
+    if "all_focus_areas_running" not in st.session_state:
+        st.session_state.all_focus_areas_running = False
     
     with col1:
         if st.button("🚀 Start Demand Forecasting Agent"):
             st.session_state[agent_running_key] = True
             st.rerun()
+        if st.button("⚡ Run All Focus Areas"):
+            st.session_state.all_focus_areas_running = True
+            st.rerun()
     
     with col2:
         if st.button("⏹ Stop Agent"):
             st.session_state[agent_running_key] = False
+            st.session_state.all_focus_areas_running = False
             st.rerun()
     
     with col3:
         st.markdown("**Status**")
-        if st.session_state[agent_running_key]:
+        if st.session_state[agent_running_key] or st.session_state.all_focus_areas_running:
             st.markdown('<div class="agent-status-active">✅ Active</div>', unsafe_allow_html=True)
         else:
             st.markdown("⏸ Ready")
@@ -1141,12 +3654,10 @@ with tabs[1]:
     # Run agent if active
     if st.session_state[agent_running_key]:
         with st.spinner("Demand Forecasting Agent Running..."):
-            insights = generate_insights_with_agent_workflow(data, focus_area, selected_model, progress_placeholder)
-            
-            if insights:
-                # Show completion message
-                st.success(f"🎉 {focus_area} Demand Forecasting Agent completed with real utilities data analysis!")
-                
+            # Completion message and report area are laid out up front so tokens can stream into the report
+            success_placeholder = st.empty()
+            report_area = st.empty()
+            with report_area.container():
                 # Show report in expandable section
                 with st.expander(f"📋 Generated {focus_area} Report (Real Utilities Data)", expanded=True):
                     st.markdown(f"""
@@ -1158,7 +3669,21 @@ with tabs[1]:
                     </div>
                     """, unsafe_allow_html=True)
                     
-                    st.markdown(insights)
+                    report_placeholder = st.empty()
+
+            def render_partial_report(text):
+                report_placeholder.markdown(text + " ▌")
+
+            insights = generate_insights_with_agent_workflow(
+                data, focus_area, selected_model, progress_placeholder, metrics, on_token=render_partial_report
+            )
+            
+            if not insights:
+                report_area.empty()
+            else:
+                # Show completion message
+                success_placeholder.success(f"🎉 {focus_area} Demand Forecasting Agent completed with real utilities data analysis!")
+                report_placeholder.markdown(insights)
                 
                 # Save to history
                 timestamp = pd.Timestamp.now().strftime("%Y-%m-%d %H:%M")
@@ -1180,6 +3705,49 @@ with tabs[1]:
                 # Stop the agent after completion
                 st.session_state[agent_running_key] = False
 
+    # Run all focus areas concurrently, filling in each report as it finishes
+    if st.session_state.all_focus_areas_running:
+        with st.spinner("Running all demand forecasting focus areas..."):
+            generated_at = pd.Timestamp.now()
+            report_placeholders = {}
+            for area in FOCUS_AREAS:
+                with st.expander(f"📋 Generated {area} Report (Real Utilities Data)", expanded=True):
+                    st.markdown(f"""
+                    <div class="agent-report-header">
+                        <strong>{area} Report - AI-Generated Demand Forecasting Analysis</strong><br>
+                        <small>Generated: {generated_at.strftime('%Y-%m-%d %H:%M:%S')}</small><br>
+                        <small>Data Source: Live Databricks Utilities Demand Analysis</small><br>
+                        <small>AI Model: {selected_model}</small>
+                    </div>
+                    """, unsafe_allow_html=True)
+                    report_placeholders[area] = st.empty()
+                    report_placeholders[area].info("⏳ Waiting for serving endpoint...")
+
+            started = time.monotonic()
+            completed = []
+            for area, insights, error, seconds in generate_all_insights(data, selected_model, metrics):
+                if insights:
+                    report_placeholders[area].markdown(insights)
+                    st.session_state.insights_history.append({
+                        "timestamp": pd.Timestamp.now().strftime("%Y-%m-%d %H:%M"),
+                        "focus": area,
+                        "insights": insights,
+                        "model": selected_model
+                    })
+                    completed.append(f"{area} ({seconds:.1f}s)")
+                else:
+                    report_placeholders[area].error(f"❌ {area} report failed: {error or 'empty response'}")
+                with progress_placeholder.container():
+                    done = len(completed)
+                    st.progress(done / len(FOCUS_AREAS))
+                    st.write(f"**{done} of {len(FOCUS_AREAS)} focus-area reports completed**")
+                    for item in completed:
+                        st.markdown(f'<div class="agent-completed">✅ {item}</div>', unsafe_allow_html=True)
+
+            if completed:
+                st.success(f"🎉 {len(completed)} focus-area reports generated in {time.monotonic() - started:.1f}s")
+            st.session_state.all_focus_areas_running = False
+
 # Insights History tab
 with tabs[2]:
     st.subheader("📁 Insights History")
@@ -1193,9 +3761,69 @@ with tabs[2]:
 # Data Explorer tab
 with tabs[3]:
     st.subheader("🔍 Data Explorer")
-    rows_per_page = st.slider("Rows per page", 5, 50, 10)
-    page = st.number_input("Page", min_value=1, value=1)
-    start = (page - 1) * rows_per_page
-    end = min(start + rows_per_page, len(data))
-    st.dataframe(data.iloc[start:end], use_container_width=True)
-    st.caption(f"Showing rows {start + 1}–{end} of {len(data)}")
\ No newline at end of file
+    st.caption(f"Browsing {table_name} directly in Databricks")
+    render_data_explorer(list(data.columns))
+
+# Performance diagnostics sidebar (process-wide counters shared by all sessions)
+with st.sidebar:
+    st.markdown("### ⚙️ Performance Diagnostics")
+    with st.expander("Databricks Connection Pool", expanded=False):
+        pool_stats = get_connection_pool().stats()
+        col1, col2 = st.columns(2)
+        col1.metric("Pool Hit Rate", f"{pool_stats['hit_rate']:.0%}")
+        col2.metric("Avg Wait", f"{pool_stats['avg_wait_ms']:.0f} ms")
+        st.caption(
+            f"{pool_stats['in_use_connections']} in use / {pool_stats['idle_connections']} idle "
+            f"of {pool_stats['max_size']} max · {pool_stats['waits']} waits · "
+            f"{pool_stats['timeouts']} timeouts · {pool_stats['reconnects']} reconnects"
+        )
+        st.json({k: round(v, 3) if isinstance(v, float) else v for k, v in pool_stats.items()})
+    if DATA_LOAD_MODE == "incremental":
+        with st.expander("Incremental Refresh", expanded=False):
+            st.json(get_incremental_loader().last_refresh)
+    with st.expander("Dataset Memory", expanded=False):
+        memory_report = dataset_memory_report(data)
+        st.metric("Shared Dataset", f"{memory_report['bytes'].sum() / 1024 / 1024:.2f} MB", delta=f"{len(data):,} rows", delta_color="off")
+        st.dataframe(memory_report, use_container_width=True)
+    with st.expander("Serving Endpoints", expanded=False):
+        endpoint_names = {url: name for name, url in ENDPOINT_URLS.items()}
+        clients = dict(get_endpoint_client_registry()["clients"])
+        if not clients:
+            st.caption("No serving endpoint calls yet.")
+        for url, client in clients.items():
+            client_stats = client.stats()
+            st.markdown(f"**{endpoint_names.get(url, url)}**")
+            col1, col2 = st.columns(2)
+            col1.metric("p50 / p95", f"{client_stats['p50_latency_s']:.1f}s / {client_stats['p95_latency_s']:.1f}s",
+                        delta=f"TTFT p50 {client_stats['p50_ttft_s']:.1f}s", delta_color="off")
+            col2.metric("Errors", f"{sum(client_stats['errors'].values())}", delta=f"{client_stats['retries']} retries", delta_color="off")
+            st.json({k: round(v, 3) if isinstance(v, float) else v for k, v in client_stats.items()})
+        if AUTO_ENDPOINT in MODELS:
+            st.markdown("**Auto routing**")
+            st.json(get_routing_stats().stats())
+    with st.expander("LLM Response Cache", expanded=False):
+        if LLM_CACHE_ENABLED:
+            completion_stats = get_completion_cache().stats()
+            col1, col2 = st.columns(2)
+            col1.metric("Cache Hit Rate", f"{completion_stats['hit_rate']:.0%}")
+            col2.metric("Cached Reports", f"{completion_stats['entries']}/{completion_stats['max_entries']}")
+            st.caption(f"Persisted to {LLM_CACHE_DIR}" if LLM_CACHE_DIR else "In memory only (set LLM_CACHE_DIR to persist)")
+            st.json({k: round(v, 3) if isinstance(v, float) else v for k, v in completion_stats.items()})
+        else:
+            st.caption("Disabled (LLM_CACHE_ENABLED=false).")
+    with st.expander("Query Result Cache", expanded=False):
+        cache_stats = get_query_cache().stats()
+        col1, col2 = st.columns(2)
+        col1.metric("Cache Hit Rate", f"{cache_stats['hit_rate']:.0%}")
+        col2.metric("Cached", f"{cache_stats['size_mb']:.1f} MB")
+        st.caption(
+            f"{cache_stats['entries']}/{cache_stats['max_entries']} entries · "
+            f"watermark {get_watermark_state()['value'] or 'unknown'} · "
+            f"{len(st.session_state.data_cache)} entries in this session"
+        )
+        st.json({k: round(v, 3) if isinstance(v, float) else v for k, v in cache_stats.items()})
+
+# Reconcile with the warehouse only after the snapshot-backed page has been painted
+st.session_state.snapshot_painted = True
+if serving_snapshot and reconcile_snapshot():
+    st.rerun()
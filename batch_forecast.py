@@ -0,0 +1,266 @@
+"""Batch demand forecasting job, run separately from the Streamlit app.
+
+Reads recent readings from the Unity Catalog table, fits every meter (or service territory)
+across a process pool and publishes the predictions to FORECAST_TABLE, which the app's
+Metrics tab reads. The panel is placed in shared memory once; workers attach to it and
+write their rows of the prediction array in place, so no DataFrames are pickled. Finished
+partitions are checkpointed and skipped when an interrupted run is restarted.
+
+    python batch_forecast.py --level meter_id --model ridge_lags --horizon 24
+    python batch_forecast.py --synthetic 20000 --workers 8 --no-publish
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+from datetime import datetime, timezone
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+import forecasting
+
+UC_CATALOG = os.environ.get("UC_CATALOG", "")
+UC_SCHEMA = os.environ.get("UC_SCHEMA", "")
+UC_TABLE = os.environ.get("UC_TABLE", "")
+FORECAST_TABLE = os.environ.get("FORECAST_TABLE", "").strip()
+CHECKPOINT_DIR = os.environ.get("FORECAST_CHECKPOINT_DIR", os.path.join(os.getcwd(), ".forecast_checkpoints"))
+# Rows per INSERT statement when publishing predictions
+PUBLISH_BATCH_ROWS = 500
+
+
+def connect():
+    """Databricks SQL connection from the same environment variables the app uses"""
+    from databricks import sql
+    return sql.connect(
+        server_hostname=os.environ["DATABRICKS_HOST"],
+        http_path=os.environ["DATABRICKS_SQL_HTTP_PATH"],
+        access_token=os.environ["DATABRICKS_TOKEN"]
+    )
+
+
+def load_readings(connection, level, target, lookback_days):
+    """Recent readings of one target plus the weather covariates, keyed by level"""
+    columns = ", ".join(f"`{col}`" for col in [level, "timestamp", target] + forecasting.WEATHER_COVARIATES)
+    query = (
+        f"SELECT {columns} FROM `{UC_CATALOG}`.`{UC_SCHEMA}`.`{UC_TABLE}` "
+        f"WHERE `timestamp` >= current_timestamp() - make_interval(0, 0, 0, :days) "
+        f"AND NOT coalesce(`_fivetran_deleted`, false)"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(query, {"days": int(lookback_days)})
+        try:
+            return cursor.fetchall_arrow().to_pandas()
+        except Exception:
+            rows = cursor.fetchall()
+            return pd.DataFrame([list(row) for row in rows], columns=[d[0] for d in cursor.description])
+
+
+class SharedArray:
+    """A NumPy array in a named shared memory block, described by a small picklable spec"""
+
+    def __init__(self, shape, dtype=np.float64, source=None):
+        nbytes = max(1, int(np.prod(shape)) * np.dtype(dtype).itemsize)
+        self.shm = shared_memory.SharedMemory(create=True, size=nbytes)
+        self.array = np.ndarray(shape, dtype=dtype, buffer=self.shm.buf)
+        if source is not None:
+            self.array[...] = source
+        self.spec = (self.shm.name, tuple(shape), np.dtype(dtype).str)
+
+    def release(self):
+        self.shm.close()
+        self.shm.unlink()
+
+
+def attach(spec):
+    """Worker-side view of a SharedArray; returns (shared memory handle, array)"""
+    name, shape, dtype = spec
+    # Pool workers share the parent's resource tracker, and the parent unlinks the block when done
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+
+def fit_partition(specs, start, stop, model, horizon, freq, checkpoint_path):
+    """Fit and predict rows [start, stop) of the shared panel into the shared output array"""
+    started = time.perf_counter()
+    handles = []
+    try:
+        arrays = {}
+        for key, spec in specs.items():
+            shm, array = attach(spec)
+            handles.append(shm)
+            arrays[key] = array
+        panel = forecasting.MeterPanel(
+            np.arange(start, stop), None, arrays["values"][start:stop],
+            {name[len("covariate:"):]: array[start:stop] for name, array in arrays.items() if name.startswith("covariate:")},
+            freq
+        )
+        predictions = forecasting.FORECAST_MODELS[model]().fit(panel).predict(horizon)
+        arrays["output"][start:stop] = predictions
+        if checkpoint_path:
+            tmp_path = f"{checkpoint_path}.{os.getpid()}.tmp.npy"
+            np.save(tmp_path, predictions)
+            os.replace(tmp_path, checkpoint_path)
+    finally:
+        for shm in handles:
+            shm.close()
+    return start, stop, time.perf_counter() - started
+
+
+def partitions(n_rows, size):
+    return [(start, min(start + size, n_rows)) for start in range(0, n_rows, size)]
+
+
+def run_forecast(panel, model, horizon, workers, partition_rows, checkpoint_dir=None):
+    """Fit every panel row across a process pool; returns (m x horizon predictions, stats)"""
+    shared = {"values": SharedArray(panel.shape, source=panel.values),
+              "output": SharedArray((panel.shape[0], horizon))}
+    for name, values in panel.covariates.items():
+        shared[f"covariate:{name}"] = SharedArray(values.shape, source=values)
+    specs = {key: array.spec for key, array in shared.items()}
+    stats = {"partitions": 0, "resumed": 0, "worker_seconds": 0.0}
+    started = time.perf_counter()
+    try:
+        pending = []
+        for start, stop in partitions(panel.shape[0], partition_rows):
+            checkpoint_path = os.path.join(checkpoint_dir, f"part-{start:09d}-{stop:09d}.npy") if checkpoint_dir else None
+            if checkpoint_path and os.path.exists(checkpoint_path):
+                shared["output"].array[start:stop] = np.load(checkpoint_path)
+                stats["resumed"] += 1
+                continue
+            pending.append((start, stop, checkpoint_path))
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(fit_partition, specs, start, stop, model, horizon, panel.freq, path)
+                       for start, stop, path in pending]
+            for future in as_completed(futures):
+                _, _, seconds = future.result()
+                stats["partitions"] += 1
+                stats["worker_seconds"] += seconds
+        predictions = shared["output"].array.copy()
+    finally:
+        for array in shared.values():
+            array.release()
+    stats["wall_seconds"] = time.perf_counter() - started
+    return predictions, stats
+
+
+def run_id_for(panel, level, target, model, horizon):
+    """Deterministic id for a run's inputs, so a restarted run finds its own checkpoints"""
+    fingerprint = json.dumps({
+        "level": level, "target": target, "model": model, "horizon": horizon,
+        "shape": panel.shape, "end": str(panel.times[-1]), "freq": str(panel.freq),
+        "checksum": float(np.nansum(panel.values))
+    }, sort_keys=True)
+    return hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()[:16]
+
+
+def publish(connection, forecasts, level, target, model, run_id):
+    """Atomically replace the predictions for (level, target, model) in FORECAST_TABLE with this run.
+
+    Rows are staged under the run id in a side table, then swapped in with one
+    INSERT ... REPLACE WHERE, so readers never see two runs mixed together and
+    re-publishing the same run (or restarting a crashed publish) leaves no duplicates.
+    """
+    staging_table = f"{FORECAST_TABLE[:-1]}_staging`" if FORECAST_TABLE.endswith("`") else f"{FORECAST_TABLE}_staging"
+    columns = ("(level STRING, key STRING, timestamp TIMESTAMP, target STRING, model STRING, "
+               "forecast DOUBLE, run_id STRING, generated_at TIMESTAMP)")
+    # One timestamp for the whole run, so every row of it carries the same generated_at
+    generated_at = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S.%f")
+    run = {"level": level, "target": target, "model": model, "run_id": run_id}
+    with connection.cursor() as cursor:
+        for table in (FORECAST_TABLE, staging_table):
+            cursor.execute(f"CREATE TABLE IF NOT EXISTS {table} {columns} USING DELTA")
+        # Rows left behind by an interrupted publish of this same run
+        cursor.execute(f"DELETE FROM {staging_table} WHERE run_id = :run_id", {"run_id": run_id})
+        rows = forecasts[["meter_id", "timestamp", "forecast"]].itertuples(index=False)
+        batch = []
+
+        def flush():
+            placeholders, params = [], {**run, "generated_at": generated_at}
+            for i, (key, timestamp, forecast) in enumerate(batch):
+                placeholders.append(
+                    f"(:level, :k{i}, CAST(:t{i} AS TIMESTAMP), :target, :model, "
+                    f"CAST(:f{i} AS DOUBLE), :run_id, CAST(:generated_at AS TIMESTAMP))"
+                )
+                params.update({f"k{i}": str(key), f"t{i}": str(timestamp),
+                               f"f{i}": None if pd.isna(forecast) else float(forecast)})
+            cursor.execute(f"INSERT INTO {staging_table} VALUES {', '.join(placeholders)}", params)
+            batch.clear()
+
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= PUBLISH_BATCH_ROWS:
+                flush()
+        if batch:
+            flush()
+        cursor.execute(
+            f"INSERT INTO {FORECAST_TABLE} REPLACE WHERE level = :level AND target = :target AND model = :model "
+            f"SELECT * FROM {staging_table} WHERE run_id = :run_id",
+            run
+        )
+        cursor.execute(f"DELETE FROM {staging_table} WHERE run_id = :run_id", {"run_id": run_id})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fit demand forecasts for every meter or territory in parallel")
+    parser.add_argument("--level", default="meter_id", choices=["meter_id", "service_territory"])
+    parser.add_argument("--target", default="energy_consumption_kwh", choices=["energy_consumption_kwh", "peak_demand_kw"])
+    parser.add_argument("--model", default="ridge_lags", choices=list(forecasting.FORECAST_MODELS))
+    parser.add_argument("--horizon", type=int, default=24)
+    parser.add_argument("--freq", default="1h", help="panel resolution, e.g. 1h or 1D")
+    parser.add_argument("--lookback-days", type=int, default=56)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--partition-rows", type=int, default=500, help="meters per worker task")
+    parser.add_argument("--synthetic", type=int, default=0, help="forecast N synthetic meters instead of reading Databricks")
+    parser.add_argument("--no-publish", action="store_true", help="skip writing to FORECAST_TABLE")
+    parser.add_argument("--no-checkpoint", action="store_true")
+    args = parser.parse_args()
+
+    connection = None
+    started = time.perf_counter()
+    if args.synthetic:
+        readings = forecasting.synthetic_readings(args.synthetic, 24 * 28)
+        readings = readings.rename(columns={"meter_id": args.level, "energy_consumption_kwh": args.target})
+    else:
+        connection = connect()
+        readings = load_readings(connection, args.level, args.target, args.lookback_days)
+    panel = forecasting.build_panel(
+        readings, args.target, freq=args.freq, meter_column=args.level,
+        how="sum" if args.level == "service_territory" else "mean"
+    )
+    print(f"Loaded {len(readings):,} readings into a {panel.shape[0]:,} x {panel.shape[1]:,} panel "
+          f"in {time.perf_counter() - started:.1f}s")
+    if panel.shape[0] == 0:
+        return
+
+    run_id = run_id_for(panel, args.level, args.target, args.model, args.horizon)
+    checkpoint_dir = None if args.no_checkpoint else os.path.join(CHECKPOINT_DIR, run_id)
+    if checkpoint_dir:
+        os.makedirs(checkpoint_dir, exist_ok=True)
+    predictions, stats = run_forecast(panel, args.model, args.horizon, args.workers, args.partition_rows, checkpoint_dir)
+    print(f"Fitted {panel.shape[0]:,} series with {args.workers} workers in {stats['wall_seconds']:.2f}s "
+          f"({stats['partitions']} partitions, {stats['resumed']} resumed from checkpoint, "
+          f"{stats['worker_seconds'] / max(stats['wall_seconds'], 1e-9):.1f} worker-seconds per wall-second)")
+
+    forecasts = forecasting.forecast_frame(panel, predictions)
+    if args.no_publish or args.synthetic:
+        print(forecasts.head(10).to_string(index=False))
+    elif not FORECAST_TABLE:
+        print("FORECAST_TABLE is not set; predictions were not published.")
+    else:
+        publish(connection, forecasts, args.level, args.target, args.model, run_id)
+        print(f"Published {len(forecasts):,} predictions to {FORECAST_TABLE} (run {run_id})")
+        if checkpoint_dir:
+            # The run is safely in the table; its checkpoints are no longer needed to resume it
+            shutil.rmtree(checkpoint_dir, ignore_errors=True)
+    if connection is not None:
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
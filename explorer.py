@@ -0,0 +1,64 @@
+"""Keyset-paginated page queries for the Data Explorer, as parameterized Databricks SQL.
+
+Kept free of Streamlit and Databricks so the query builder can be tested on any SQL engine.
+"""
+
+# Every page is ordered by the chosen sort column and then this unique key, which is also the keyset cursor
+KEY_COLUMNS = ["timestamp", "meter_id"]
+FILTER_OPERATORS = {"=": "=", "≠": "<>", ">": ">", "≥": ">=", "<": "<", "≤": "<=", "contains": "ILIKE"}
+
+
+def quote_identifier(name):
+    """Backtick-quote a column name for Databricks SQL"""
+    return "`" + str(name).replace("`", "``") + "`"
+
+
+def build_page_query(table, schema, sort_column, descending, filters, cursor, page_size):
+    """Parameterized page query: pushed-down filters, then rows strictly after the keyset cursor.
+
+    schema maps lowercase column names to SQL types for the bound parameters. Returns
+    (query, params, order_columns). NULLs sort last in every ordering column, and the cursor
+    may hold None for them.
+    """
+    order_columns = [sort_column] + [col for col in KEY_COLUMNS if col != sort_column]
+
+    def typed_param(name, column):
+        return f"CAST(:{name} AS {schema.get(column, 'string')})"
+
+    clauses, params = ["coalesce(`_fivetran_deleted`, false) = false"], {}
+    for i, (column, operator, value) in enumerate(filters):
+        if operator == "contains":
+            clauses.append(f"CAST({quote_identifier(column)} AS STRING) ILIKE :f{i}")
+            params[f"f{i}"] = f"%{value}%"
+        else:
+            clauses.append(f"{quote_identifier(column)} {FILTER_OPERATORS[operator]} {typed_param(f'f{i}', column)}")
+            params[f"f{i}"] = str(value)
+
+    if cursor is not None:
+        # (a, b, c) > (x, y, z) expanded into equality prefixes so it works on every warehouse.
+        # With NULLS LAST, every NULL comes after a value and nothing comes after a NULL.
+        comparison = "<" if descending else ">"
+
+        def equal(i, col):
+            if cursor[i] is None:
+                return f"{quote_identifier(col)} IS NULL"
+            return f"{quote_identifier(col)} = {typed_param(f'k{i}', col)}"
+
+        terms = []
+        for i, col in enumerate(order_columns):
+            if cursor[i] is None:
+                continue
+            after = (f"({quote_identifier(col)} {comparison} {typed_param(f'k{i}', col)} "
+                     f"OR {quote_identifier(col)} IS NULL)")
+            terms.append("(" + " AND ".join([equal(j, c) for j, c in enumerate(order_columns[:i])] + [after]) + ")")
+        clauses.append("(" + " OR ".join(terms) + ")" if terms else "false")
+        params.update({f"k{i}": str(value) for i, value in enumerate(cursor) if value is not None})
+
+    direction = "DESC" if descending else "ASC"
+    query = f"""
+    SELECT * FROM {table}
+    WHERE {" AND ".join(clauses)}
+    ORDER BY {", ".join(f"{quote_identifier(col)} {direction} NULLS LAST" for col in order_columns)}
+    LIMIT {int(page_size)}
+    """
+    return query, params, order_columns
@@ -0,0 +1,462 @@
+"""Vectorized CPU demand forecasting across many smart meter time series at once.
+
+Readings are pivoted into a dense meters x periods panel and every model fits and
+predicts all meters with whole-array NumPy operations, so thousands of meters are
+handled in one batch. Run ``python forecasting.py`` for a fit/predict throughput
+benchmark on synthetic meter data.
+"""
+import argparse
+import copy
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+WEATHER_COVARIATES = ["temperature_fahrenheit", "humidity_percent", "wind_speed_mph"]
+# Seasonal period (in panel steps) for common reading frequencies
+SEASON_BY_FREQ = {pd.Timedelta(hours=1): 24, pd.Timedelta(days=1): 7, pd.Timedelta(weeks=1): 52}
+
+
+class MeterPanel:
+    """Dense meters x periods arrays of one target and its covariates on a regular time grid"""
+
+    def __init__(self, meters, times, values, covariates, freq):
+        self.meters = meters
+        self.times = times
+        self.values = values
+        self.covariates = covariates
+        self.freq = freq
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    def default_season(self):
+        """Seasonal period implied by the grid frequency (1 when there is none)"""
+        return SEASON_BY_FREQ.get(pd.Timedelta(self.freq), 1)
+
+    def future_times(self, horizon):
+        return pd.date_range(self.times[-1], periods=horizon + 1, freq=self.freq)[1:]
+
+
+def infer_frequency(timestamps):
+    """Most common spacing between distinct timestamps, as a pandas frequency"""
+    distinct = np.unique(timestamps.to_numpy(dtype="datetime64[ns]"))
+    if len(distinct) < 2:
+        return pd.Timedelta(hours=1)
+    steps, counts = np.unique(np.diff(distinct), return_counts=True)
+    return pd.Timedelta(steps[np.argmax(counts)])
+
+
+def build_panel(frame, target="energy_consumption_kwh", covariates=WEATHER_COVARIATES, freq=None,
+                meter_column="meter_id", time_column="timestamp", max_periods=24 * 7 * 8, how="mean"):
+    """Pivot long meter readings into a MeterPanel; readings sharing a grid slot are averaged
+    (how="sum" adds the target up instead, e.g. to forecast service territory totals).
+
+    Only the most recent max_periods grid steps are kept, which bounds the panel size for sparse data.
+    """
+    covariates = [col for col in covariates if col in frame.columns]
+    columns = [meter_column, time_column, target] + covariates
+    df = frame[columns].dropna(subset=[meter_column, time_column])
+    times = pd.to_datetime(df[time_column])
+    freq = pd.Timedelta(freq) if freq is not None else infer_frequency(times)
+    end = times.max().floor(freq)
+    start = max(times.min().floor(freq), end - (max_periods - 1) * freq)
+    grid = pd.date_range(start, end, freq=freq)
+    recent = (times >= start).to_numpy()
+    df, times = df[recent], times[recent]
+    meter_codes, meters = pd.factorize(df[meter_column], sort=True)
+    slots = ((times - start) // freq).to_numpy(dtype=np.int64)
+    flat = meter_codes * len(grid) + slots
+    size = len(meters) * len(grid)
+
+    def dense(column, how="mean"):
+        values = pd.to_numeric(df[column], errors="coerce").to_numpy(dtype=np.float64)
+        present = ~np.isnan(values)
+        sums = np.bincount(flat[present], weights=values[present], minlength=size)
+        counts = np.bincount(flat[present], minlength=size)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            dense_values = sums / counts if how == "mean" else np.where(counts > 0, sums, np.nan)
+        return dense_values.reshape(len(meters), len(grid))
+
+    return MeterPanel(meters, grid, dense(target, how), {col: dense(col) for col in covariates}, freq)
+
+
+def nanmean(values, axis):
+    """np.nanmean without the all-NaN slice warning (those slices are NaN)"""
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        return np.nanmean(values, axis=axis)
+
+
+def forward_fill(values):
+    """Carry the last observation forward along each row; leading gaps take the row mean"""
+    present = ~np.isnan(values)
+    index = np.where(present, np.arange(values.shape[1]), 0)
+    np.maximum.accumulate(index, axis=1, out=index)
+    filled = values[np.arange(values.shape[0])[:, None], index]
+    row_mean = nanmean(values, axis=1)
+    row_mean = np.where(np.isnan(row_mean), 0.0, row_mean)
+    return np.where(np.isnan(filled), row_mean[:, None], filled)
+
+
+def seasonal_profile(values, season, window_seasons=None):
+    """Per-meter mean of each seasonal phase over the last window_seasons seasons (m x season).
+
+    Phase 0 is aligned with the first period after the panel ends.
+    """
+    periods = values.shape[1]
+    seasons = periods // season if window_seasons is None else min(window_seasons, periods // season)
+    if seasons == 0:
+        return np.repeat(forward_fill(values)[:, -1:], season, axis=1)
+    recent = values[:, periods - seasons * season:].reshape(values.shape[0], seasons, season)
+    profile = nanmean(recent, axis=1)
+    fallback = forward_fill(values)[:, -1:]
+    return np.where(np.isnan(profile), fallback, profile)
+
+
+def tile_profile(profile, horizon):
+    """Repeat an m x season profile out to horizon steps"""
+    season = profile.shape[1]
+    return np.tile(profile, (1, -(-horizon // season)))[:, :horizon]
+
+
+class SeasonalNaiveForecaster:
+    """Each future step repeats the value one season earlier"""
+
+    def __init__(self, season=None):
+        self.season = season
+
+    def fit(self, panel):
+        season = self.season or panel.default_season()
+        self.profile_ = seasonal_profile(panel.values, season, window_seasons=1)
+        return self
+
+    def predict(self, horizon, future_covariates=None):
+        return tile_profile(self.profile_, horizon)
+
+
+class SeasonalMeanForecaster:
+    """Each future step is the mean of the same seasonal phase over the last few seasons"""
+
+    def __init__(self, season=None, window_seasons=4):
+        self.season = season
+        self.window_seasons = window_seasons
+
+    def fit(self, panel):
+        season = self.season or panel.default_season()
+        self.profile_ = seasonal_profile(panel.values, season, self.window_seasons)
+        return self
+
+    def predict(self, horizon, future_covariates=None):
+        return tile_profile(self.profile_, horizon)
+
+
+class RidgeLagForecaster:
+    """Per-meter ridge regression on recent lags, the seasonal lag and weather covariates.
+
+    All meters are fitted together: the normal equations are accumulated as m x f x f arrays
+    from shifted views of the panel (no per-meter design matrices) and solved in one batched
+    call. Forecasts are produced recursively. Future covariates default to their seasonal profile.
+    """
+
+    def __init__(self, lags=(1, 2, 3), season=None, alpha=1.0, use_covariates=True):
+        self.lags = tuple(lags)
+        self.season = season
+        self.alpha = alpha
+        self.use_covariates = use_covariates
+
+    def _lags(self, season):
+        return sorted(set(self.lags) | ({season} if season > 1 else set()))
+
+    def fit(self, panel):
+        season = self.season or panel.default_season()
+        lags = self._lags(season)
+        max_lag = lags[-1]
+        # Standardize each meter's series so one alpha suits meters of any size
+        target = forward_fill(panel.values)
+        self.mean_ = target.mean(axis=1, keepdims=True)
+        self.scale_ = target.std(axis=1, keepdims=True)
+        self.scale_[self.scale_ == 0] = 1.0
+        target = (target - self.mean_) / self.scale_
+        observed = ~np.isnan(panel.values[:, max_lag:])
+
+        covariates = {}
+        if self.use_covariates:
+            for name, values in panel.covariates.items():
+                filled = forward_fill(values)
+                mean = filled.mean(axis=1, keepdims=True)
+                scale = filled.std(axis=1, keepdims=True)
+                scale[scale == 0] = 1.0
+                covariates[name] = (filled, mean, scale)
+
+        periods = panel.shape[1]
+        features = [target[:, max_lag - lag:periods - lag] for lag in lags]
+        features += [((filled - mean) / scale)[:, max_lag:] for filled, mean, scale in covariates.values()]
+        features.append(np.ones_like(target[:, max_lag:]))
+        response = target[:, max_lag:]
+        weights = observed.astype(np.float64)
+
+        n_features = len(features)
+        gram = np.zeros((panel.shape[0], n_features, n_features))
+        moment = np.zeros((panel.shape[0], n_features))
+        for i in range(n_features):
+            weighted = features[i] * weights
+            moment[:, i] = np.einsum("mn,mn->m", weighted, response)
+            for j in range(i, n_features):
+                gram[:, i, j] = gram[:, j, i] = np.einsum("mn,mn->m", weighted, features[j])
+        penalty = self.alpha * np.eye(n_features)
+        # Intercept is effectively unpenalized; the tiny ridge keeps meters without usable history solvable
+        penalty[-1, -1] = 1e-9
+        self.coef_ = np.linalg.solve(gram + penalty, moment[:, :, None])[:, :, 0]
+
+        self.lags_ = lags
+        # Meters with fewer periods than the longest lag start from their (standardized) mean
+        self.history_ = np.pad(target, ((0, 0), (max(0, max_lag - periods), 0)))[:, -max_lag:]
+        self.covariates_ = covariates
+        self.covariate_profiles_ = {
+            name: seasonal_profile(filled, max(season, 1)) for name, (filled, _, _) in covariates.items()
+        }
+        return self
+
+    def predict(self, horizon, future_covariates=None):
+        future_covariates = future_covariates or {}
+        future = []
+        for name, (_, mean, scale) in self.covariates_.items():
+            values = future_covariates.get(name)
+            if values is None:
+                values = tile_profile(self.covariate_profiles_[name], horizon)
+            future.append((np.asarray(values, dtype=np.float64)[:, :horizon] - mean) / scale)
+
+        max_lag = self.lags_[-1]
+        history = np.concatenate([self.history_, np.zeros((self.history_.shape[0], horizon))], axis=1)
+        for step in range(horizon):
+            position = max_lag + step
+            row = [history[:, position - lag] for lag in self.lags_]
+            row += [values[:, step] for values in future]
+            row.append(np.ones(history.shape[0]))
+            history[:, position] = np.einsum("mf,mf->m", np.column_stack(row), self.coef_)
+        return history[:, max_lag:] * self.scale_ + self.mean_
+
+
+FORECAST_MODELS = {
+    "seasonal_naive": SeasonalNaiveForecaster,
+    "seasonal_mean": SeasonalMeanForecaster,
+    "ridge_lags": RidgeLagForecaster,
+}
+
+
+def forecast_panel(panel, model="ridge_lags", horizon=24, **model_options):
+    """Fit one model across every meter of the panel; returns (fitted model, m x horizon forecasts)"""
+    forecaster = FORECAST_MODELS[model](**model_options).fit(panel)
+    return forecaster, forecaster.predict(horizon)
+
+
+def forecast_meters(frame, model="ridge_lags", horizon=24, target="energy_consumption_kwh",
+                    covariates=WEATHER_COVARIATES, freq=None, **model_options):
+    """Long-format forecasts (meter_id, timestamp, forecast) for every meter in a readings frame"""
+    panel = build_panel(frame, target, covariates, freq)
+    if panel.shape[0] == 0 or panel.shape[1] == 0:
+        return pd.DataFrame(columns=["meter_id", "timestamp", "forecast"])
+    _, predictions = forecast_panel(panel, model, horizon, **model_options)
+    return forecast_frame(panel, predictions)
+
+
+def forecast_frame(panel, predictions):
+    """Long-format (meter_id, timestamp, forecast) rows for an m x horizon forecast array"""
+    horizon = predictions.shape[1]
+    return pd.DataFrame({
+        "meter_id": np.repeat(np.asarray(panel.meters), horizon),
+        "timestamp": np.tile(panel.future_times(horizon), panel.shape[0]),
+        "forecast": predictions.ravel()
+    })
+
+
+# Slices the accuracy engine reports by, besides the overall series
+ACCURACY_DIMENSIONS = ["meter_id", "service_territory", "customer_type", "weather_condition"]
+PINBALL_QUANTILES = (0.1, 0.5, 0.9)
+
+
+def accuracy_terms(actual, forecast, quantiles=PINBALL_QUANTILES):
+    """Per-row additive terms behind every accuracy metric (zero actuals are left out of APE)"""
+    actual = np.asarray(actual, dtype=np.float64)
+    forecast = np.asarray(forecast, dtype=np.float64)
+    valid = np.isfinite(actual) & np.isfinite(forecast)
+    error = np.where(valid, forecast - actual, 0.0)
+    absolute = np.abs(error)
+    has_pct = valid & (actual != 0)
+    denominator = np.abs(actual) + np.abs(forecast)
+    has_sym = valid & (denominator > 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        terms = {
+            "n": valid.astype(np.float64),
+            "n_pct": has_pct.astype(np.float64),
+            "ape": np.where(has_pct, absolute / np.abs(actual), 0.0),
+            "n_sym": has_sym.astype(np.float64),
+            "sape": np.where(has_sym, 2 * absolute / denominator, 0.0),
+            "abs_error": absolute,
+            "sq_error": absolute * absolute,
+            "error": error,
+        }
+    for q in quantiles:
+        # Pinball loss of the point forecast read as quantile q
+        terms[f"pinball_{q:g}"] = np.where(valid, np.maximum(q * -error, (q - 1) * -error), 0.0)
+    return pd.DataFrame(terms)
+
+
+def accuracy_metrics(sums):
+    """MAPE, sMAPE, MAE, RMSE, bias and pinball losses from summed accuracy_terms"""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        n = sums["n"].where(sums["n"] > 0)
+        metrics = pd.DataFrame({
+            "n": sums["n"].astype(np.int64),
+            "zero_actuals": (sums["n"] - sums["n_pct"]).astype(np.int64),
+            "mape_pct": sums["ape"] / sums["n_pct"].where(sums["n_pct"] > 0) * 100,
+            "smape_pct": sums["sape"] / sums["n_sym"].where(sums["n_sym"] > 0) * 100,
+            "mae": sums["abs_error"] / n,
+            "rmse": np.sqrt(sums["sq_error"] / n),
+            "bias": sums["error"] / n,
+        }, index=sums.index)
+        for column in sums.columns:
+            if column.startswith("pinball_"):
+                metrics[column] = sums[column] / n
+    return metrics
+
+
+class AccuracyTracker:
+    """Additive accuracy sums per time window, overall and per slice, updatable as rows arrive.
+
+    Every metric is derived from sums, so new rows are folded in with one vectorized group-by
+    and rolling accuracy over the last k windows is a rolling sum over windows.
+    """
+
+    def __init__(self, window="1D", dimensions=ACCURACY_DIMENSIONS, quantiles=PINBALL_QUANTILES,
+                 actual="actual", forecast="forecast", time_column="timestamp"):
+        self.window = pd.Timedelta(window)
+        self.dimensions = list(dimensions)
+        self.quantiles = tuple(quantiles)
+        self.actual = actual
+        self.forecast = forecast
+        self.time_column = time_column
+        self.stats = {}
+
+    def _window_sums(self, frame):
+        terms = accuracy_terms(frame[self.actual], frame[self.forecast], self.quantiles)
+        terms["window_start"] = pd.to_datetime(frame[self.time_column]).dt.floor(self.window).to_numpy()
+        sums = {"overall": terms.groupby("window_start", sort=False).sum()}
+        for dimension in self.dimensions:
+            if dimension in frame.columns:
+                keyed = terms.assign(**{dimension: frame[dimension].to_numpy()})
+                sums[dimension] = keyed.groupby([dimension, "window_start"], observed=True, sort=False).sum()
+        return sums
+
+    def update(self, frame):
+        """Fold new rows into the running sums"""
+        for key, sums in self._window_sums(frame).items():
+            current = self.stats.get(key)
+            self.stats[key] = sums if current is None else current.add(sums, fill_value=0)
+        return self
+
+    def replace_windows(self, frame, removed=()):
+        """Recompute every window that frame touches from frame, which must hold all of those windows' rows,
+        and drop the removed windows (ones that lost every row)"""
+        windows = pd.Index(pd.to_datetime(frame[self.time_column]).dt.floor(self.window).unique()).union(
+            pd.DatetimeIndex(list(removed)))
+        for key, sums in self.stats.items():
+            self.stats[key] = sums[~sums.index.get_level_values("window_start").isin(windows)]
+        return self.update(frame)
+
+    def copy(self):
+        """Tracker over the same sums that can be updated without changing this one.
+
+        Updates replace each sums frame rather than mutating it, so sharing them is safe.
+        """
+        clone = copy.copy(self)
+        clone.stats = dict(self.stats)
+        return clone
+
+    def metrics(self, dimension="overall", rolling_windows=1):
+        """Accuracy per window (per slice value for a dimension), optionally over the last k windows"""
+        sums = self.stats.get(dimension)
+        if sums is None or sums.empty:
+            return pd.DataFrame()
+        sums = sums.sort_index()
+        if rolling_windows > 1:
+            # Roll over time rather than rows, so a slice with no readings in some windows
+            # never sums windows that lie further apart than rolling_windows
+            span = rolling_windows * self.window
+            if dimension == "overall":
+                sums = sums.rolling(span, min_periods=1).sum()
+            else:
+                sums = sums.groupby(level=0, observed=True).apply(
+                    lambda group: group.droplevel(0).rolling(span, min_periods=1).sum()
+                )
+        return accuracy_metrics(sums).reset_index()
+
+
+def synthetic_readings(n_meters=1000, n_periods=24 * 28, seed=0):
+    """Hourly readings with daily seasonality, a temperature effect, noise and a few gaps"""
+    rng = np.random.default_rng(seed)
+    hours = np.arange(n_periods)
+    base = rng.uniform(5, 50, (n_meters, 1))
+    daily = 1 + 0.4 * np.sin(2 * np.pi * (hours - rng.integers(0, 24, (n_meters, 1))) / 24)
+    temperature = 60 + 15 * np.sin(2 * np.pi * hours / 24) + rng.normal(0, 3, (n_meters, n_periods))
+    consumption = base * daily + 0.1 * (temperature - 60) + rng.normal(0, 1, (n_meters, n_periods))
+    consumption[rng.random((n_meters, n_periods)) < 0.02] = np.nan
+    return pd.DataFrame({
+        "meter_id": np.repeat([f"M{i:06d}" for i in range(n_meters)], n_periods),
+        "timestamp": np.tile(pd.date_range("2024-01-01", periods=n_periods, freq="h"), n_meters),
+        "energy_consumption_kwh": consumption.ravel(),
+        "temperature_fahrenheit": temperature.ravel(),
+        "humidity_percent": rng.uniform(30, 90, n_meters * n_periods),
+        "wind_speed_mph": rng.uniform(0, 20, n_meters * n_periods),
+    })
+
+
+def benchmark(n_meters=1000, n_periods=24 * 28, horizon=24, seed=0):
+    """Fit/predict throughput per meter and holdout MAPE for every model on synthetic data"""
+    readings = synthetic_readings(n_meters, n_periods + horizon, seed)
+    started = time.perf_counter()
+    full = build_panel(readings)
+    panel_seconds = time.perf_counter() - started
+    train = MeterPanel(
+        full.meters, full.times[:-horizon], full.values[:, :-horizon],
+        {name: values[:, :-horizon] for name, values in full.covariates.items()}, full.freq
+    )
+    actual = full.values[:, -horizon:]
+    future = {name: values[:, -horizon:] for name, values in full.covariates.items()}
+
+    rows = []
+    for name, model in FORECAST_MODELS.items():
+        started = time.perf_counter()
+        forecaster = model().fit(train)
+        fit_seconds = time.perf_counter() - started
+        started = time.perf_counter()
+        predictions = forecaster.predict(horizon, future)
+        predict_seconds = time.perf_counter() - started
+        with np.errstate(divide="ignore", invalid="ignore"):
+            errors = np.abs((actual - predictions) / actual)
+        rows.append({
+            "model": name,
+            "fit_s": fit_seconds,
+            "predict_s": predict_seconds,
+            "fit_us_per_meter": fit_seconds / n_meters * 1e6,
+            "predict_us_per_meter": predict_seconds / n_meters * 1e6,
+            "meters_per_s": n_meters / (fit_seconds + predict_seconds),
+            "holdout_mape_pct": float(np.nanmean(np.where(np.isfinite(errors), errors, np.nan)) * 100),
+        })
+    return pd.DataFrame(rows), panel_seconds
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark batch forecasting throughput on synthetic meter data")
+    parser.add_argument("--meters", type=int, default=1000)
+    parser.add_argument("--periods", type=int, default=24 * 28, help="hourly training periods per meter")
+    parser.add_argument("--horizon", type=int, default=24)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    results, panel_seconds = benchmark(args.meters, args.periods, args.horizon, args.seed)
+    print(f"{args.meters} meters x {args.periods} periods, horizon {args.horizon}; panel build {panel_seconds:.3f}s")
+    print(results.to_string(index=False, float_format=lambda value: f"{value:,.3f}"))
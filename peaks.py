@@ -0,0 +1,115 @@
+"""Peak demand index: summed load per interval, system-wide and per territory, sorted per month.
+
+Kept free of Streamlit so the index can be tested against pandas.
+"""
+import copy
+import heapq
+
+import pandas as pd
+
+# Peak events are runs of intervals at or above this quantile of a scope's interval loads
+EVENT_QUANTILE = 0.95
+
+
+class PeakIndex:
+    """Summed peak demand per interval, system-wide and per territory, with a sorted index per month.
+
+    Each (scope, month) bucket keeps its intervals sorted by load, so the worst N intervals of a
+    month are a slice and arbitrary ranges are a lazy merge of a few buckets; no rescan of readings.
+    """
+
+    SYSTEM = "System (coincident)"
+
+    def __init__(self, interval="1h", territory_column="service_territory", value_column="peak_demand_kw"):
+        self.interval = pd.Timedelta(interval)
+        self.territory_column = territory_column
+        self.value_column = value_column
+        self.loads = pd.Series(dtype="float64")
+        self.buckets = {}
+
+    def _interval_loads(self, frame):
+        starts = pd.to_datetime(frame["timestamp"]).dt.floor(self.interval)
+        values = pd.to_numeric(frame[self.value_column], errors="coerce").astype("float64")
+        system = values.groupby(starts).sum(min_count=1)
+        parts = [pd.concat({self.SYSTEM: system}, names=["scope", "interval_start"])]
+        if self.territory_column in frame.columns:
+            territories = values.groupby([frame[self.territory_column].astype(str), starts], observed=True).sum(min_count=1)
+            parts.append(territories.rename_axis(["scope", "interval_start"]))
+        return pd.concat(parts).dropna()
+
+    def _bucket_keys(self, loads):
+        starts = loads.index.get_level_values("interval_start")
+        return pd.MultiIndex.from_arrays([loads.index.get_level_values("scope"), starts.year * 100 + starts.month])
+
+    def _reindex(self, loads):
+        """Re-sort the buckets of every (scope, month) present in loads"""
+        changed = set(self._bucket_keys(loads))
+        for key in changed:
+            self.buckets.pop(key, None)
+        current = self._bucket_keys(self.loads)
+        affected = current.isin(list(changed))
+        for key, bucket in self.loads[affected].groupby(current[affected]):
+            self.buckets[key] = bucket.droplevel("scope").sort_values(ascending=False)
+
+    def rebuild(self, frame):
+        self.loads = self._interval_loads(frame)
+        self.buckets = {}
+        self._reindex(self.loads)
+        return self
+
+    def replace_intervals(self, frame, removed=()):
+        """Recompute the intervals frame covers (it must hold all of their readings) and drop removed ones"""
+        new_loads = self._interval_loads(frame)
+        replaced = set(pd.to_datetime(frame["timestamp"]).dt.floor(self.interval)) | set(removed)
+        starts = self.loads.index.get_level_values("interval_start")
+        stale = self.loads[starts.isin(replaced)]
+        self.loads = pd.concat([self.loads[~starts.isin(replaced)], new_loads]).sort_index()
+        self._reindex(pd.concat([stale, new_loads]))
+        return self
+
+    def copy(self):
+        """Index over the same loads that can be updated without changing this one.
+
+        Updates replace loads and bucket Series rather than mutating them, so sharing them is safe.
+        """
+        clone = copy.copy(self)
+        clone.buckets = dict(self.buckets)
+        return clone
+
+    def scopes(self):
+        return sorted(set(self.loads.index.get_level_values("scope")), key=lambda scope: (scope != self.SYSTEM, scope))
+
+    def months(self):
+        return sorted({month for _, month in self.buckets}, reverse=True)
+
+    def top_peaks(self, n=50, scope=SYSTEM, month=None, start=None, end=None):
+        """The n highest-load intervals for a scope, in one month or a [start, end) range"""
+        keys = [key for key in self.buckets if key[0] == scope and (month is None or key[1] == month)]
+        merged = heapq.merge(*(zip(-self.buckets[key].to_numpy(), self.buckets[key].index) for key in keys))
+        rows = []
+        for negative_load, interval_start in merged:
+            if (start is None or interval_start >= start) and (end is None or interval_start < end):
+                rows.append((len(rows) + 1, interval_start, -negative_load))
+                if len(rows) == n:
+                    break
+        return pd.DataFrame(rows, columns=["rank", "interval_start", "load_kw"])
+
+    def peak_events(self, scope=SYSTEM, quantile=EVENT_QUANTILE):
+        """Runs of consecutive intervals at or above the scope's load quantile, worst first"""
+        loads = self.loads.xs(scope, level="scope").sort_index() if scope in self.scopes() else pd.Series(dtype="float64")
+        if loads.empty:
+            return pd.DataFrame(columns=["start", "end", "intervals", "peak_interval", "peak_kw"])
+        above = loads >= loads.quantile(quantile)
+        starts = loads.index.to_series()
+        # A new event starts whenever the previous interval was below threshold or not adjacent
+        new_event = above & ~(above.shift(fill_value=False) & (starts.diff() == self.interval))
+        event_ids = new_event.cumsum()[above]
+        grouped = loads[above].groupby(event_ids)
+        events = pd.DataFrame({
+            "start": grouped.apply(lambda group: group.index.min()),
+            "end": grouped.apply(lambda group: group.index.max()) + self.interval,
+            "intervals": grouped.size(),
+            "peak_interval": grouped.idxmax(),
+            "peak_kw": grouped.max()
+        })
+        return events.sort_values("peak_kw", ascending=False).reset_index(drop=True)
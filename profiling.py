@@ -0,0 +1,125 @@
+"""Vectorized column profiling: per-column statistics, pairwise-complete correlations and their strongest pairs.
+
+Kept free of Streamlit and Databricks so the engines can be tested against pandas.
+"""
+import numpy as np
+import pandas as pd
+
+
+class PairwiseMoments:
+    """Additive pairwise-complete sums for a correlation matrix, updatable batch by batch.
+
+    For every column pair only rows where both values are present contribute, like
+    pandas' DataFrame.corr(), but all pairs are computed with a handful of matrix products.
+    """
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        k = len(self.columns)
+        self.shift = None
+        self.count = np.zeros((k, k))
+        self.sum_x = np.zeros((k, k))
+        self.sum_xx = np.zeros((k, k))
+        self.sum_xy = np.zeros((k, k))
+
+    def update(self, values):
+        """Add a 2-D float batch (rows x columns, NaN for missing)"""
+        values = np.asarray(values, dtype=np.float64)
+        present = ~np.isnan(values)
+        if self.shift is None:
+            # Shift by the first batch's means so the raw sums do not cancel catastrophically
+            with np.errstate(invalid='ignore'):
+                counts = present.sum(axis=0)
+                self.shift = np.where(counts > 0, np.nansum(values, axis=0) / np.maximum(counts, 1), 0.0)
+        shifted = np.where(present, values - self.shift, 0.0)
+        mask = present.astype(np.float64)
+        # [i, j] entries sum column i over the rows where column j is also present
+        self.count += mask.T @ mask
+        self.sum_x += shifted.T @ mask
+        self.sum_xx += (shifted * shifted).T @ mask
+        self.sum_xy += shifted.T @ shifted
+        return self
+
+    def correlation(self):
+        """Pearson correlation matrix as a DataFrame (NaN where a pair has under two observations)"""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            n = np.where(self.count >= 2, self.count, np.nan)
+            cov = self.sum_xy - self.sum_x * self.sum_x.T / n
+            var_i = self.sum_xx - self.sum_x ** 2 / n
+            corr = cov / np.sqrt(var_i * var_i.T)
+        corr = np.clip(corr, -1.0, 1.0)
+        diagonal = np.diag(self.count) >= 2
+        corr[np.diag_indices_from(corr)] = np.where(diagonal, 1.0, np.nan)
+        return pd.DataFrame(corr, index=self.columns, columns=self.columns)
+
+
+def top_correlation_pairs(correlations, k=3):
+    """Strongest k (col1, col2, r) pairs from the upper triangle of a correlation matrix, by |r|"""
+    matrix = correlations.to_numpy(dtype=np.float64)
+    rows, cols = np.triu_indices(matrix.shape[0], 1)
+    values = matrix[rows, cols]
+    finite = np.isfinite(values)
+    rows, cols, values = rows[finite], cols[finite], values[finite]
+    if k <= 0 or values.size == 0:
+        return []
+    strength = np.abs(values)
+    if values.size > k:
+        picked = np.argpartition(-strength, k - 1)[:k]
+    else:
+        picked = np.arange(values.size)
+    picked = picked[np.argsort(-strength[picked], kind="stable")]
+    names = correlations.columns
+    return [(names[rows[i]], names[cols[i]], float(values[i])) for i in picked]
+
+
+def sorted_quantiles(ordered, quantiles):
+    """Linearly interpolated quantiles (pandas' default) of an already sorted 1-D array"""
+    positions = np.asarray(quantiles) * (len(ordered) - 1)
+    lower = np.floor(positions).astype(int)
+    upper = np.minimum(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (positions - lower)
+
+
+def profile_columns(data, numeric_columns, categorical_columns, top_k=3):
+    """One pass per column: count, nulls, sum, mean, std, min, max, quartiles and distinct values
+    for numeric columns, count/nulls/distinct/top values for categorical ones, plus the numeric
+    columns' pairwise-complete correlations"""
+    profile = {"columns": {}, "correlations": pd.DataFrame()}
+    if numeric_columns:
+        # Statistics are computed in float64 even when the frame stores compact float32/int columns
+        values = data[numeric_columns].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+        # One sort per column yields min, max, quartiles and the distinct count; NaNs sort last
+        ordered = np.sort(values, axis=0)
+        counts = (~np.isnan(values)).sum(axis=0)
+        for i, col in enumerate(numeric_columns):
+            n = int(counts[i])
+            present = ordered[:n, i]
+            stats = {"count": n, "nulls": len(data) - n, "distinct": 0}
+            if n:
+                total = present.sum()
+                quartiles = sorted_quantiles(present, [0.25, 0.5, 0.75])
+                stats.update({
+                    "mean": total / n,
+                    "sum": total,
+                    "std": present.std(ddof=1) if n > 1 else np.nan,
+                    "min": present[0],
+                    "max": present[-1],
+                    "25%": quartiles[0],
+                    "50%": quartiles[1],
+                    "75%": quartiles[2],
+                    "distinct": int(np.count_nonzero(np.diff(present))) + 1
+                })
+            profile["columns"][col] = stats
+        present_columns = [col for i, col in enumerate(numeric_columns) if counts[i]]
+        if len(present_columns) >= 2:
+            profile["correlations"] = PairwiseMoments(numeric_columns).update(values).correlation().loc[present_columns, present_columns]
+    for col in categorical_columns:
+        counts = data[col].value_counts()
+        counts = counts[counts > 0]
+        profile["columns"][col] = {
+            "count": int(counts.sum()),
+            "nulls": int(len(data) - counts.sum()),
+            "distinct": len(counts),
+            "top_values": counts.head(top_k)
+        }
+    return profile
@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import anomalies
+
+KEYS = ["meter_id", "timestamp", "detector"]
+
+
+@pytest.fixture
+def readings():
+    frame, _ = anomalies.synthetic_readings(n_meters=40, n_periods=24 * 14, anomaly_rate=0.005, seed=3)
+    return frame
+
+
+def sorted_anomalies(frame):
+    frame = frame.assign(detector=frame["detector"].astype(str))
+    return frame.sort_values(KEYS).reset_index(drop=True)
+
+
+def test_rolling_z_matches_pandas(readings):
+    codes, _ = pd.factorize(readings["meter_id"], sort=True)
+    values = readings["energy_consumption_kwh"].to_numpy(dtype=np.float64).copy()
+    values[::17] = np.nan
+    scores, expected = anomalies.rolling_z(codes, values, codes.max() + 1, window=48, min_periods=12)
+
+    previous = pd.Series(values).groupby(codes).shift(1)
+    window = previous.groupby(codes).rolling(48, min_periods=12)
+    mean = window.mean().reset_index(level=0, drop=True)
+    std = window.std().reset_index(level=0, drop=True)
+    # pandas' window counts present values among the previous 48 readings, the same as rolling_z
+    reference = (pd.Series(values) - mean) / std
+    np.testing.assert_allclose(scores, reference.to_numpy(), rtol=1e-9, atol=1e-9, equal_nan=True)
+    scored = ~np.isnan(scores)
+    np.testing.assert_allclose(expected[scored], mean.to_numpy()[scored], rtol=1e-9)
+
+
+def test_robust_z_matches_pandas(readings):
+    codes, _ = pd.factorize(readings["meter_id"], sort=True)
+    values = readings["voltage_level"].to_numpy(dtype=np.float64)
+    scores, medians = anomalies.robust_z(codes, values, codes.max() + 1)
+
+    grouped = pd.Series(values).groupby(codes)
+    median = grouped.transform("median")
+    mad = (pd.Series(values) - median).abs().groupby(codes).transform("median")
+    np.testing.assert_allclose(scores, (0.6745 * (values - median) / mad).to_numpy(), rtol=1e-12)
+    np.testing.assert_allclose(medians, median.to_numpy())
+
+
+@pytest.mark.parametrize("batch_size", [997, 5000])
+def test_streamed_batches_match_in_memory_detection(readings, batch_size):
+    expected = anomalies.detect_anomalies(readings.sample(frac=1, random_state=0))
+    ordered = readings.sort_values(["meter_id", "timestamp"]).reset_index(drop=True)
+    # Batch boundaries fall mid-meter, so meters have to be carried into the next batch
+    batches = (ordered.iloc[start:start + batch_size] for start in range(0, len(ordered), batch_size))
+    streamed, scored = anomalies.detect_anomalies_in_batches(batches, batch_rows=1000)
+
+    assert scored == len(readings)
+    assert not expected.empty
+    pd.testing.assert_frame_equal(sorted_anomalies(streamed), sorted_anomalies(expected))
+    assert np.all(np.diff(np.abs(streamed["score"].to_numpy())) <= 0)
+
+
+def test_empty_stream_has_no_anomalies():
+    streamed, scored = anomalies.detect_anomalies_in_batches(iter([]))
+    assert scored == 0
+    assert list(streamed.columns) == anomalies.ANOMALY_COLUMNS
@@ -0,0 +1,78 @@
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import explorer
+
+SCHEMA = {"timestamp": "TEXT", "meter_id": "TEXT", "value": "REAL", "territory": "TEXT"}
+
+
+@pytest.fixture
+def table():
+    rng = np.random.default_rng(0)
+    n = 120
+    frame = pd.DataFrame({
+        "timestamp": pd.date_range("2024-01-01", periods=n // 4, freq="h").repeat(4).strftime("%Y-%m-%d %H:%M:%S"),
+        "meter_id": np.tile(["M1", "M2", "M3", "M4"], n // 4),
+        # Few distinct values so ties fall through to the key columns; NULLs in both sortable columns
+        "value": rng.integers(0, 5, n).astype(float),
+        "territory": rng.choice(["north", "south", "east"], n),
+        "_fivetran_deleted": rng.choice([0, 1, None], n, p=[0.8, 0.1, 0.1]),
+    })
+    frame.loc[rng.random(n) < 0.15, "value"] = np.nan
+    frame.loc[rng.random(n) < 0.15, "territory"] = None
+    connection = sqlite3.connect(":memory:")
+    frame.to_sql("readings", connection, index=False)
+    yield connection, frame
+    connection.close()
+
+
+def browse(connection, sort_column, descending, filters, page_size):
+    """Every page in order, following the cursor from each page's last row"""
+    pages, cursor = [], None
+    while True:
+        query, params, order_columns = explorer.build_page_query(
+            "readings", SCHEMA, sort_column, descending, filters, cursor, page_size
+        )
+        page = pd.read_sql_query(query, connection, params=params)
+        pages.append(page)
+        if len(page) < page_size:
+            return pd.concat(pages, ignore_index=True)
+        cursor = tuple(None if pd.isna(value) else value for value in page.iloc[-1][order_columns])
+
+
+def rows(frame, columns):
+    """Row tuples with every missing value as None (pages of only NULLs come back as object columns)"""
+    return [tuple(None if pd.isna(value) else value for value in row) for row in frame[columns].itertuples(index=False)]
+
+
+@pytest.mark.parametrize("sort_column", ["value", "territory", "timestamp", "meter_id"])
+@pytest.mark.parametrize("descending", [False, True])
+def test_keyset_pages_match_full_pandas_sort(table, sort_column, descending):
+    connection, frame = table
+    browsed = browse(connection, sort_column, descending, [], page_size=7)
+
+    order_columns = [sort_column] + [col for col in explorer.KEY_COLUMNS if col != sort_column]
+    expected = frame[frame["_fivetran_deleted"].fillna(0) == 0].sort_values(
+        order_columns, ascending=not descending, na_position="last"
+    )
+    assert rows(browsed, order_columns) == rows(expected, order_columns)
+
+
+def test_filters_are_pushed_down(table):
+    connection, frame = table
+    browsed = browse(connection, "value", False, [("value", "≥", 2), ("territory", "≠", "east")], page_size=5)
+    live = frame[frame["_fivetran_deleted"].fillna(0) == 0]
+    expected = live[(live["value"] >= 2) & (live["territory"] != "east") & live["territory"].notna()]
+    assert len(browsed) == len(expected)
+    assert sorted(zip(browsed["timestamp"], browsed["meter_id"])) == sorted(zip(expected["timestamp"], expected["meter_id"]))
+
+
+def test_cursor_after_null_sort_key_only_continues_within_nulls():
+    query, params, _ = explorer.build_page_query(
+        "t", SCHEMA, "value", False, [], (None, "2024-01-01 00:00:00", "M1"), 10
+    )
+    assert "`value` IS NULL AND (`timestamp` > CAST(:k1 AS TEXT)" in query
+    assert params == {"k1": "2024-01-01 00:00:00", "k2": "M1"}
@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+
+import forecasting
+
+
+def accuracy_readings(seed=0, n=600):
+    rng = np.random.default_rng(seed)
+    actual = rng.uniform(0, 10, n)
+    actual[rng.random(n) < 0.05] = 0.0
+    return pd.DataFrame({
+        "timestamp": pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 10 * 24, n), unit="h"),
+        "actual": actual,
+        "forecast": actual + rng.normal(0, 1, n),
+        "service_territory": rng.choice(["north", "south", "east"], n),
+        "customer_type": rng.choice(["residential", "commercial"], n),
+    })
+
+
+def assert_same_metrics(tracker, reference, **kwargs):
+    for dimension in ["overall", "service_territory", "customer_type"]:
+        pd.testing.assert_frame_equal(tracker.metrics(dimension, **kwargs), reference.metrics(dimension, **kwargs),
+                                      check_exact=False, rtol=1e-9)
+
+
+def test_overall_metrics_match_pandas():
+    readings = accuracy_readings()
+    metrics = forecasting.AccuracyTracker("1D").update(readings).metrics().set_index("window_start")
+    windows = readings["timestamp"].dt.floor("1D")
+    error = readings["forecast"] - readings["actual"]
+    nonzero = readings["actual"] != 0
+    expected_mae = error.abs().groupby(windows).mean()
+    expected_mape = (error.abs() / readings["actual"].abs())[nonzero].groupby(windows[nonzero]).mean() * 100
+    np.testing.assert_allclose(metrics["mae"], expected_mae.to_numpy())
+    np.testing.assert_allclose(metrics["mape_pct"], expected_mape.to_numpy())
+    np.testing.assert_array_equal(metrics["n"], windows.value_counts().sort_index().to_numpy())
+
+
+def test_replace_windows_matches_full_rebuild():
+    readings = accuracy_readings()
+    published = forecasting.AccuracyTracker("1D").update(readings)
+    before = {dimension: published.metrics(dimension) for dimension in ["overall", "service_territory"]}
+
+    # Re-synced rows change day 2, day 5 gains rows and day 7 loses every row
+    windows = readings["timestamp"].dt.floor("1D")
+    day = lambda i: pd.Timestamp("2024-01-01") + pd.Timedelta(days=i)
+    changed = readings[windows != day(7)].copy()
+    changed.loc[windows == day(2), "forecast"] += 3.0
+    changed = pd.concat([changed, accuracy_readings(seed=1, n=50).assign(timestamp=day(5) + pd.Timedelta(hours=6))],
+                        ignore_index=True)
+    changed_windows = changed["timestamp"].dt.floor("1D")
+    touched = changed_windows.isin([day(2), day(5)])
+
+    updated = published.copy().replace_windows(changed[touched], removed=[day(7)])
+    assert_same_metrics(updated, forecasting.AccuracyTracker("1D").update(changed))
+    assert_same_metrics(updated, forecasting.AccuracyTracker("1D").update(changed), rolling_windows=3)
+    # The published tracker other sessions may be reading is left untouched
+    for dimension, metrics in before.items():
+        pd.testing.assert_frame_equal(published.metrics(dimension), metrics)
+
+
+def test_rolling_windows_span_time_not_rows():
+    readings = accuracy_readings()
+    # Day 3 has no readings at all in this slice
+    readings = readings[readings["timestamp"].dt.floor("1D") != pd.Timestamp("2024-01-04")]
+    tracker = forecasting.AccuracyTracker("1D").update(readings)
+    rolled = tracker.metrics(rolling_windows=2).set_index("window_start")
+    windows = readings["timestamp"].dt.floor("1D")
+    counts = windows.value_counts().sort_index()
+    expected = counts.rolling("2D").sum()
+    np.testing.assert_array_equal(rolled["n"], expected.to_numpy())
+    assert rolled.loc[pd.Timestamp("2024-01-05"), "n"] == counts[pd.Timestamp("2024-01-05")]
@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import peaks
+
+SYSTEM = peaks.PeakIndex.SYSTEM
+
+
+def peak_readings(seed=0, n=4000):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        # Spans three months, several readings per hourly interval
+        "timestamp": pd.Timestamp("2024-01-15") + pd.to_timedelta(rng.integers(0, 70 * 24 * 60, n), unit="min"),
+        "peak_demand_kw": rng.uniform(1, 100, n),
+        "service_territory": rng.choice(["north", "south"], n),
+    })
+
+
+def reference_loads(readings, scope):
+    frame = readings if scope == SYSTEM else readings[readings["service_territory"] == scope]
+    return frame.groupby(frame["timestamp"].dt.floor("1h"))["peak_demand_kw"].sum()
+
+
+def top(index, n, **kwargs):
+    return index.top_peaks(n, **kwargs).set_index("interval_start")["load_kw"]
+
+
+@pytest.mark.parametrize("scope", [SYSTEM, "north", "south"])
+def test_top_peaks_match_nlargest(scope):
+    readings = peak_readings()
+    index = peaks.PeakIndex("1h").rebuild(readings)
+    loads = reference_loads(readings, scope)
+
+    pd.testing.assert_series_equal(top(index, 25, scope=scope), loads.nlargest(25), check_names=False)
+    in_february = loads[(loads.index.year == 2024) & (loads.index.month == 2)]
+    pd.testing.assert_series_equal(top(index, 10, scope=scope, month=202402), in_february.nlargest(10), check_names=False)
+    start, end = pd.Timestamp("2024-02-20"), pd.Timestamp("2024-03-05")
+    in_range = loads[(loads.index >= start) & (loads.index < end)]
+    pd.testing.assert_series_equal(top(index, 10, scope=scope, start=start, end=end), in_range.nlargest(10), check_names=False)
+
+
+def test_replace_intervals_matches_full_rebuild():
+    readings = peak_readings()
+    published = peaks.PeakIndex("1h").rebuild(readings)
+    before = top(published, 50)
+
+    intervals = readings["timestamp"].dt.floor("1h")
+    emptied = intervals.iloc[0]
+    changed = readings[intervals != emptied].copy()
+    bumped = intervals.isin(intervals.iloc[1:40])
+    changed.loc[bumped, "peak_demand_kw"] *= 3
+    touched = changed["timestamp"].dt.floor("1h").isin(intervals[bumped])
+
+    updated = published.copy().replace_intervals(changed[touched], removed=[emptied])
+    rebuilt = peaks.PeakIndex("1h").rebuild(changed)
+    pd.testing.assert_series_equal(updated.loads.sort_index(), rebuilt.loads.sort_index())
+    assert updated.buckets.keys() == rebuilt.buckets.keys()
+    for scope in [SYSTEM, "north", "south"]:
+        pd.testing.assert_series_equal(top(updated, 50, scope=scope), top(rebuilt, 50, scope=scope))
+    # The published index other sessions may be reading is left untouched
+    pd.testing.assert_series_equal(top(published, 50), before)
+
+
+def test_peak_events_cover_every_interval_above_the_quantile():
+    readings = peak_readings()
+    index = peaks.PeakIndex("1h").rebuild(readings)
+    loads = reference_loads(readings, SYSTEM)
+    above = loads[loads >= loads.quantile(0.9)]
+    events = index.peak_events(quantile=0.9)
+    assert events["intervals"].sum() == len(above)
+    assert events["peak_kw"].iloc[0] == above.max()
+    assert (events["end"] - events["start"] == events["intervals"] * pd.Timedelta("1h")).all()
@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import profiling
+
+
+@pytest.fixture
+def readings():
+    rng = np.random.default_rng(0)
+    n = 500
+    base = rng.normal(size=n)
+    frame = pd.DataFrame({
+        "a": base + rng.normal(scale=0.1, size=n),
+        "b": -2 * base + rng.normal(scale=0.5, size=n),
+        "c": rng.normal(size=n) + 1e6,
+        "d": rng.normal(size=n),
+    })
+    # Different missing rows per column, so every pair has its own complete-case subset
+    for col, rate in zip(frame.columns, [0.05, 0.1, 0.2, 0.3]):
+        frame.loc[rng.random(n) < rate, col] = np.nan
+    return frame
+
+
+def test_pairwise_moments_match_pandas_corr(readings):
+    moments = profiling.PairwiseMoments(readings.columns)
+    for batch in np.array_split(readings.to_numpy(), 3):
+        moments.update(batch)
+    pd.testing.assert_frame_equal(moments.correlation(), readings.corr(), atol=1e-10)
+
+
+def test_pairwise_moments_leave_pairs_without_overlap_undefined():
+    frame = pd.DataFrame({"a": [1.0, 2.0, np.nan, np.nan], "b": [np.nan, np.nan, 3.0, 4.0]})
+    corr = profiling.PairwiseMoments(frame.columns).update(frame.to_numpy()).correlation()
+    assert np.isnan(corr.loc["a", "b"])
+    assert corr.loc["a", "a"] == 1.0
+
+
+def test_top_correlation_pairs_match_ranked_upper_triangle(readings):
+    corr = readings.corr()
+    upper = corr.where(np.triu(np.ones(corr.shape, dtype=bool), k=1)).stack()
+    expected = upper.reindex(upper.abs().sort_values(ascending=False).index).head(3)
+    pairs = profiling.top_correlation_pairs(corr, k=3)
+    assert [(a, b) for a, b, _ in pairs] == list(expected.index)
+    np.testing.assert_allclose([r for _, _, r in pairs], expected.to_numpy())
+
+
+def test_profile_columns_match_pandas_describe(readings):
+    rng = np.random.default_rng(1)
+    data = readings.assign(
+        a=readings["a"].astype("float32"),
+        d=rng.integers(0, 5, len(readings)),
+        territory=pd.Series(rng.choice(["north", "south", "east", None], len(readings))).astype("category"),
+    )
+    numeric, categorical = ["a", "b", "c", "d"], ["territory"]
+    profile = profiling.profile_columns(data, numeric, categorical, top_k=2)
+
+    values = data[numeric].astype("float64")
+    described = values.describe()
+    for col in numeric:
+        stats = profile["columns"][col]
+        assert stats["count"] == described.loc["count", col]
+        assert stats["nulls"] == values[col].isna().sum()
+        assert stats["distinct"] == values[col].nunique()
+        assert stats["sum"] == pytest.approx(values[col].sum())
+        for stat in ["mean", "std", "min", "25%", "50%", "75%", "max"]:
+            assert stats[stat] == pytest.approx(described.loc[stat, col], rel=1e-9, abs=1e-9), (col, stat)
+    pd.testing.assert_frame_equal(profile["correlations"], values.corr(), atol=1e-10)
+
+    territory = profile["columns"]["territory"]
+    counts = data["territory"].value_counts()
+    assert territory["distinct"] == data["territory"].nunique()
+    assert territory["nulls"] == data["territory"].isna().sum()
+    pd.testing.assert_series_equal(territory["top_values"], counts.head(2))
+
+
+def test_profile_columns_handle_empty_numeric_column():
+    data = pd.DataFrame({"a": [1.0, 2.0, 4.0], "b": [np.nan] * 3})
+    profile = profiling.profile_columns(data, ["a", "b"], [])
+    assert profile["columns"]["b"] == {"count": 0, "nulls": 3, "distinct": 0}
+    assert profile["correlations"].empty